@@ -0,0 +1,2 @@
+# agent/benchmarks/__init__.py
+"""ชุด benchmark สำหรับวัดประสิทธิภาพของ agent (รันด้วย python -m agent.benchmarks.<ชื่อ>)"""
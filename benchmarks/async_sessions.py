@@ -0,0 +1,72 @@
+# agent/benchmarks/async_sessions.py
+"""วัด throughput ของ process (ทีละคำขอ) เทียบกับ aprocess (หลาย session บน event loop เดียว)
+
+ใช้ LLM จำลองที่หน่วงเวลาได้ (benchmarks/fake_llm.py) จึงไม่เรียก API จริง
+รัน: python -m agent.benchmarks.async_sessions --sessions 200 --latency 0.2
+"""
+import argparse
+import asyncio
+import time
+
+from ..core import AdvancedAgenticAI
+from ..router import Router
+from ..llm_scheduler import LLMScheduler
+from .fake_llm import FakeChatModel
+
+SIMPLE_TASK = "สวัสดี วันนี้เป็นอย่างไรบ้าง"
+# มีคำบ่งชี้งานวิเคราะห์และข้อมูลยอดขาย router จึงเลือกเส้นทาง planning
+COMPLEX_TASK = "วิเคราะห์ เปรียบเทียบ และสรุปข้อมูลยอดขายของแต่ละเดือน"
+
+
+def _tasks(sessions: int, complex_ratio: float):
+    every = int(1 / complex_ratio) if complex_ratio > 0 else 0
+    return [COMPLEX_TASK if every and i % every == 0 else f"{SIMPLE_TASK} #{i}" for i in range(sessions)]
+
+
+def _agent(latency: float, concurrency: int) -> AdvancedAgenticAI:
+    # ไม่บันทึก log การเลือกเส้นทาง (คำขอจำลองไม่ควรปนกับข้อมูล train)
+    # และไม่จำกัดการเรียกพร้อมกัน (LLM จำลองไม่มี rate limit)
+    return AdvancedAgenticAI(llm=FakeChatModel(latency=latency), router=Router(log_path=None),
+                             scheduler=LLMScheduler(initial_concurrency=concurrency, max_concurrency=concurrency))
+
+
+def run_sync(tasks, latency: float) -> float:
+    agent = _agent(latency, 1)
+    started = time.perf_counter()
+    for task in tasks:
+        agent.process(task)
+    return time.perf_counter() - started
+
+
+async def run_async(tasks, latency: float) -> float:
+    agent = _agent(latency, len(tasks))
+    started = time.perf_counter()
+    results = await asyncio.gather(*(agent.aprocess(task) for task in tasks))
+    elapsed = time.perf_counter() - started
+    failed = sum(1 for result in results if not result["success"])
+    if failed:
+        print(f"คำขอที่ล้มเหลว: {failed}")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.2, help="เวลาหน่วงต่อการเรียก LLM (วินาที)")
+    parser.add_argument("--complex-ratio", type=float, default=0.25, help="สัดส่วนคำขอที่ใช้ planning")
+    parser.add_argument("--sync-sessions", type=int, default=20, help="จำนวนคำขอที่ใช้วัดแบบ process")
+    args = parser.parse_args()
+
+    sync_tasks = _tasks(args.sync_sessions, args.complex_ratio)
+    sync_elapsed = run_sync(sync_tasks, args.latency)
+    async_elapsed = asyncio.run(run_async(_tasks(args.sessions, args.complex_ratio), args.latency))
+
+    sync_rate = len(sync_tasks) / sync_elapsed
+    async_rate = args.sessions / async_elapsed
+    print(f"process  : {len(sync_tasks):5d} คำขอ {sync_elapsed:7.2f}s ({sync_rate:8.1f} คำขอ/วินาที)")
+    print(f"aprocess : {args.sessions:5d} คำขอ {async_elapsed:7.2f}s ({async_rate:8.1f} คำขอ/วินาที)")
+    print(f"throughput เพิ่มขึ้น {async_rate / sync_rate:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
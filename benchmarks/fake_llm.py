@@ -0,0 +1,169 @@
+# agent/benchmarks/fake_llm.py
+"""LLM จำลองสำหรับ benchmark: หน่วงเวลาตามที่กำหนด ไม่เรียก API จริง"""
+import asyncio
+import json
+import random
+import re
+import threading
+import time
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+
+_TOKENS = re.compile(r'\S+\s*|\s+')
+
+
+class FakeMessage:
+    """ข้อความตอบกลับ (มี .content และ .usage_metadata เหมือน AIMessage)"""
+
+    def __init__(self, content: str, usage_metadata: Dict[str, int] = None):
+        self.content = content
+        self.usage_metadata = usage_metadata
+
+
+class FakeRateLimitError(Exception):
+    """จำลองข้อผิดพลาด 429 ของ API (retry_after = วินาทีที่ขอให้รอ เหมือน header Retry-After)"""
+
+    status_code = 429
+
+    def __init__(self, message: str, retry_after: float = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class FakeChatModel:
+    """ChatModel จำลองที่มี invoke, ainvoke, stream, astream และการเรียกแบบเดิม llm(messages)
+
+    - latency: เวลาหน่วงต่อการเรียก (วินาที) สำหรับ stream คือเวลาก่อนได้ token แรก
+    - jitter: สัดส่วนความแปรปรวนของ latency (สุ่มด้วย seed จึงทำซ้ำได้)
+    - token_delay หรือ tokens_per_second: อัตราการส่ง token เมื่อใช้ stream/astream
+    - script: รายการ (regex, คำตอบ) ตรวจกับ prompt ตามลำดับ คำตอบเป็น str หรือ callable(prompt)
+    - prompt ของ planner (ที่ไม่ตรงกับ script) จะได้แผน JSON ที่มี plan_steps ขั้นตอนอิสระ
+      ใช้เครื่องมือ plan_tool และ parameters จาก plan_parameters(เลขขั้นตอน)
+    - rate_limit_every: ทุก ๆ N ครั้งจะ raise FakeRateLimitError (0 = ไม่จำลอง)
+    - concurrency_limit: raise FakeRateLimitError เมื่อมีการเรียกค้างอยู่พร้อมกันเกินจำนวนนี้
+      (0 = ไม่จำกัด) โดยขอให้รอ retry_after วินาที
+    """
+
+    def __init__(self,
+                 latency: float = 0.2,
+                 token_delay: float = 0.0,
+                 plan_steps: int = 3,
+                 plan_tool: str = "get_time",
+                 plan_parameters: Callable[[int], Dict[str, Any]] = None,
+                 script: List[Tuple[str, Any]] = None,
+                 tokens_per_second: float = None,
+                 jitter: float = 0.0,
+                 rate_limit_every: int = 0,
+                 concurrency_limit: int = 0,
+                 retry_after: float = None,
+                 seed: int = 0):
+        self.latency = latency
+        self.token_delay = 1.0 / tokens_per_second if tokens_per_second else token_delay
+        self.plan_steps = plan_steps
+        self.plan_tool = plan_tool
+        self.plan_parameters = plan_parameters
+        self.script = [(re.compile(pattern, re.S), response) for pattern, response in (script or [])]
+        self.jitter = jitter
+        self.rate_limit_every = rate_limit_every
+        self.concurrency_limit = concurrency_limit
+        self.retry_after = retry_after
+        self.calls = 0
+        self.rate_limited = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def invoke(self, messages: List) -> FakeMessage:
+        delay = self._admit()
+        try:
+            time.sleep(delay)
+            return self._respond(messages)
+        finally:
+            self._finish()
+
+    async def ainvoke(self, messages: List) -> FakeMessage:
+        delay = self._admit()
+        try:
+            await asyncio.sleep(delay)
+            return self._respond(messages)
+        finally:
+            self._finish()
+
+    def stream(self, messages: List) -> Iterator[FakeMessage]:
+        delay = self._admit()
+        try:
+            time.sleep(delay)
+            for token in self._tokens(self._respond(messages).content):
+                yield FakeMessage(token)
+                time.sleep(self.token_delay)
+        finally:
+            self._finish()
+
+    async def astream(self, messages: List) -> AsyncIterator[FakeMessage]:
+        delay = self._admit()
+        try:
+            await asyncio.sleep(delay)
+            for token in self._tokens(self._respond(messages).content):
+                yield FakeMessage(token)
+                await asyncio.sleep(self.token_delay)
+        finally:
+            self._finish()
+
+    def __call__(self, messages: List) -> FakeMessage:
+        return self.invoke(messages)
+
+    def _admit(self) -> float:
+        """นับการเรียก จำลอง rate limit และคืนเวลาหน่วงของการเรียกนี้"""
+        with self._lock:
+            self.calls += 1
+            if (self.rate_limit_every and self.calls % self.rate_limit_every == 0) or \
+                    (self.concurrency_limit and self.in_flight >= self.concurrency_limit):
+                self.rate_limited += 1
+                raise FakeRateLimitError("Rate limit reached (fake)", self.retry_after)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            if not self.jitter:
+                return self.latency
+            return max(0.0, self.latency * (1 + self._random.uniform(-self.jitter, self.jitter)))
+
+    def _finish(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def _tokens(self, content: str) -> List[str]:
+        # แบ่งเป็นคำพร้อมช่องว่างตามหลัง ต่อกันแล้วได้ข้อความเดิม
+        return _TOKENS.findall(content)
+
+    def _respond(self, messages: List) -> FakeMessage:
+        prompt = "\n".join(getattr(message, "content", str(message)) for message in messages)
+        content = self._scripted(prompt)
+        if content is None:
+            if '"steps"' in prompt:
+                content = json.dumps(self._plan(), ensure_ascii=False)
+            else:
+                content = f"คำตอบจำลองสำหรับ: {prompt[-80:]}"
+        usage = {'input_tokens': len(self._tokens(prompt)), 'output_tokens': len(self._tokens(content))}
+        return FakeMessage(content, usage)
+
+    def _scripted(self, prompt: str) -> Optional[str]:
+        for pattern, response in self.script:
+            if pattern.search(prompt):
+                return response(prompt) if callable(response) else response
+        return None
+
+    def _plan(self):
+        return {
+            "goal": "งานจำลอง",
+            "steps": [
+                {
+                    "step": i + 1,
+                    "description": f"ขั้นตอนจำลอง {i + 1}",
+                    "tool": self.plan_tool,
+                    "parameters": self.plan_parameters(i + 1) if self.plan_parameters else {},
+                    "expected_output": "ผลลัพธ์จำลอง",
+                    "depends_on": []
+                }
+                for i in range(self.plan_steps)
+            ],
+            "success_criteria": "ทุกขั้นตอนสำเร็จ"
+        }
@@ -0,0 +1,133 @@
+# agent/benchmarks/fixture_server.py
+"""เว็บจำลองในเครื่องสำหรับ benchmark ของ ToolManager (ไม่ต้องใช้เครือข่าย)
+
+เส้นทาง:
+- /page/<n>?kb=<ขนาด>   หน้า HTML ที่สร้างแบบกำหนดได้ (เนื้อหาเดิมทุกครั้งสำหรับ n เดียวกัน)
+- /search?q=<คำค้น>     JSON รูปแบบเดียวกับ DuckDuckGo Instant Answer API
+ทุกเส้นทางรับ ?delay_ms=<เวลาหน่วง> และ ?max_age=<วินาที> (ไม่ระบุ = no-store)
+response ที่ cache ได้มี ETag และตอบ 304 เมื่อ If-None-Match ตรงกัน
+"""
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+def make_page(number: int, kilobytes: int) -> bytes:
+    """หน้า HTML ขนาดประมาณ kilobytes KB ที่มี script/style และย่อหน้าจำนวนมาก"""
+    rng = random.Random(number)
+    vocabulary = [f"คำ{i}" for i in range(300)] + [f"word{i}" for i in range(300)]
+    parts = [f"<html><head><title>หน้าทดสอบ {number}</title>",
+             "<style>p { margin: 0 }</style>",
+             "<script>var items = [" + ",".join(str(i) for i in range(500)) + "];</script>",
+             "</head><body>"]
+    size = sum(len(part) for part in parts)
+    while size < kilobytes * 1024:
+        paragraph = f"<p>{' '.join(rng.choices(vocabulary, k=60))}</p>\n"
+        parts.append(paragraph)
+        size += len(paragraph)
+    parts.append("</body></html>")
+    return "".join(parts).encode("utf-8")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        delay_ms = float(query.get("delay_ms", self.server.default_delay_ms))
+        if delay_ms:
+            time.sleep(delay_ms / 1000)
+
+        if url.path.startswith("/page/"):
+            number = int(url.path.rsplit("/", 1)[-1] or 0)
+            body = self.server.page(number, int(query.get("kb", 64)))
+            content_type = "text/html; charset=utf-8"
+        elif url.path == "/search":
+            term = query.get("q", "")
+            body = json.dumps({
+                "RelatedTopics": [
+                    {"Text": f"{term} ผลลัพธ์ {i}", "FirstURL": f"http://fixture/{term}/{i}"}
+                    for i in range(10)
+                ]
+            }, ensure_ascii=False).encode("utf-8")
+            content_type = "application/json; charset=utf-8"
+        else:
+            self.send_error(404)
+            return
+
+        self.server.count()
+        max_age = query.get("max_age")
+        etag = '"%s"' % hashlib.sha256(body).hexdigest()[:16]
+        if max_age and self.headers.get("If-None-Match") == etag:
+            self.server.count_not_modified()
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", f"max-age={max_age}")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", f"max-age={max_age}" if max_age else "no-store")
+        if max_age:
+            self.send_header("ETag", etag)
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            # ผู้อ่านแบบ streaming ปิดการเชื่อมต่อเมื่อได้ข้อความพอแล้ว
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FixtureServer(ThreadingHTTPServer):
+    """HTTP server จำลองที่ทำงานใน thread แยก (ใช้กับ with)"""
+
+    daemon_threads = True
+
+    def __init__(self, default_delay_ms: float = 0.0):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.default_delay_ms = default_delay_ms
+        self.requests = 0
+        self.not_modified = 0
+        self._pages = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_port}"
+
+    def page(self, number: int, kilobytes: int) -> bytes:
+        key = (number, kilobytes)
+        with self._lock:
+            body = self._pages.get(key)
+        if body is None:
+            body = make_page(number, kilobytes)
+            with self._lock:
+                self._pages[key] = body
+        return body
+
+    def count(self):
+        with self._lock:
+            self.requests += 1
+
+    def count_not_modified(self):
+        with self._lock:
+            self.not_modified += 1
+
+    def __enter__(self) -> "FixtureServer":
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,141 @@
+# agent/benchmarks/import_time.py
+"""วัดเวลา import ตอนเริ่ม process (cold start) ด้วย python -X importtime
+
+รัน import โมดูลใน process ใหม่หลายรอบ รายงาน median ของเวลารวมและโมดูลที่ใช้เวลามากที่สุด
+และตรวจว่า dependency หนัก (langchain, requests, bs4 ฯลฯ) ไม่ถูก import ตั้งแต่ตอนเริ่ม
+
+รัน:
+    python -m agent.benchmarks.import_time
+    python -m agent.benchmarks.import_time --module agent.server --runs 9
+    python -m agent.benchmarks.import_time --save-baseline
+คืนค่า exit code 1 หากมี dependency หนักถูก import หรือช้ากว่า baseline เกิน --tolerance
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Any, Dict, List
+
+PACKAGE = __package__.split(".")[0]
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "import_baseline.json")
+
+# โมดูลที่ต้อง import เมื่อใช้งานจริงเท่านั้น (ดู lazy.py)
+DEFERRED = [
+    "langchain", "langchain_openai", "langchain_core", "openai", "requests", "urllib3", "bs4",
+    "aiohttp", "asyncio", "multiprocessing", "numpy", "pandas", "chromadb", "tiktoken",
+    "cProfile", "pstats"
+]
+
+
+def measure(module: str) -> Dict[str, Any]:
+    """import โมดูลใน process ใหม่ คืนค่าเวลารวม (ms) และเวลาสะสมของแต่ละโมดูลที่ถูก import"""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        lines = completed.stderr.strip().splitlines()
+        raise RuntimeError(lines[-1] if lines else f"exit code {completed.returncode}")
+
+    # รูปแบบบรรทัด: "import time: <self us> | <cumulative us> | <ชื่อโมดูล (ย่อหน้าตามความลึก)>"
+    # โมดูลย่อยถูกพิมพ์ก่อนโมดูลที่ import มัน จึงเก็บไว้จนเจอบรรทัดระดับบนสุด
+    # (นับเฉพาะที่อยู่ใต้โมดูลที่วัด ไม่รวมสิ่งที่ site/.pth import ตอนเริ่ม interpreter)
+    pending, modules = {}, {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        name = parts[2].strip()
+        pending[name] = int(parts[1]) / 1000
+        if len(parts[2]) - len(parts[2].lstrip()) <= 1:
+            if name == module:
+                modules = pending
+            pending = {}
+    return {"total_ms": modules.get(module, 0.0), "modules": modules}
+
+
+def run(module: str, runs: int) -> Dict[str, Any]:
+    samples = [measure(module) for _ in range(runs)]
+    totals = [sample["total_ms"] for sample in samples]
+    # เวลาของแต่ละโมดูลใช้ median ข้ามรอบ (ลดผลของ disk cache และ process อื่น)
+    names = set().union(*(sample["modules"] for sample in samples))
+    per_module = {
+        name: statistics.median(sample["modules"].get(name, 0.0) for sample in samples)
+        for name in names
+    }
+    return {
+        "module": module,
+        "runs": runs,
+        "median_ms": statistics.median(totals),
+        "min_ms": min(totals),
+        "max_ms": max(totals),
+        "modules": per_module,
+        "deferred_imported": sorted(name for name in DEFERRED if name in names)
+    }
+
+
+def print_report(result: Dict[str, Any], top: int, baseline: Dict[str, Any]):
+    print(f"import {result['module']}: median {result['median_ms']:.1f} ms "
+          f"(min {result['min_ms']:.1f}, max {result['max_ms']:.1f}, {result['runs']} รอบ)")
+    reference = baseline.get(result["module"])
+    if reference:
+        change = result["median_ms"] / reference["median_ms"] - 1 if reference["median_ms"] else 0.0
+        print(f"baseline: {reference['median_ms']:.1f} ms ({change:+.0%})")
+
+    print(f"\n{'module':<48}{'cumulative ms':>14}")
+    ranked = sorted(result["modules"].items(), key=lambda item: item[1], reverse=True)
+    for name, cumulative in ranked[:top]:
+        print(f"{name:<48}{cumulative:>14.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="cold-start import time benchmark")
+    parser.add_argument("--module", default=f"{PACKAGE}.core")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="จำนวนโมดูลที่ช้าที่สุดที่แสดง")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.3)
+    args = parser.parse_args()
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    try:
+        result = run(args.module, max(1, args.runs))
+    except RuntimeError as e:
+        print(f"import {args.module} ล้มเหลว: {e}")
+        sys.exit(1)
+    print_report(result, args.top, baseline)
+
+    if args.save_baseline:
+        baseline[args.module] = {"median_ms": result["median_ms"], "runs": result["runs"]}
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, ensure_ascii=False, indent=2)
+        print(f"\nบันทึก baseline ที่ {args.baseline}")
+        return
+
+    problems: List[str] = []
+    if result["deferred_imported"]:
+        problems.append(f"import ตั้งแต่เริ่ม: {', '.join(result['deferred_imported'])}")
+    reference = baseline.get(args.module)
+    if reference and reference.get("median_ms"):
+        limit = reference["median_ms"] * (1 + args.tolerance)
+        if result["median_ms"] > limit:
+            problems.append(f"median {result['median_ms']:.1f} ms เกิน baseline {reference['median_ms']:.1f} ms "
+                            f"+{args.tolerance:.0%}")
+    if problems:
+        print()
+        for problem in problems:
+            print(problem)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# agent/benchmarks/memory_footprint.py
+"""วัดหน่วยความจำต่อรายการของ SimpleVectorMemory เทียบกับแบบ list-of-dicts เดิม
+
+รัน: python -m agent.benchmarks.memory_footprint --entries 100000
+"""
+import argparse
+import random
+import tracemalloc
+import uuid
+from datetime import datetime
+
+from ..simple_memory import SimpleVectorMemory
+
+
+def _make_corpus(n_entries: int, seed: int = 42):
+    rng = random.Random(seed)
+    vocabulary = [f"word{i}" for i in range(5000)]
+    corpus = []
+    for _ in range(n_entries):
+        question = " ".join(rng.choices(vocabulary, k=rng.randint(4, 12)))
+        answer = " ".join(rng.choices(vocabulary, k=rng.randint(10, 30)))
+        corpus.append(f"ผู้ใช้: {question}\nตอบ: {answer}")
+    return corpus
+
+
+def _metadata(i: int):
+    return {
+        "type": "conversation",
+        "timestamp": datetime.now().isoformat(),
+        "complexity": 0.3 + (i % 5) * 0.1
+    }
+
+
+def _legacy_store(corpus):
+    """จำลองโครงสร้างเดิม: list ของ dict ต่อความจำหนึ่งรายการ"""
+    helper = SimpleVectorMemory()
+    memories = []
+    for i, content in enumerate(corpus):
+        memories.append({
+            'id': str(uuid.uuid4()),
+            'content': content,
+            'metadata': _metadata(i),
+            'timestamp': datetime.now().isoformat(),
+            'keywords': helper._extract_keywords(content)
+        })
+    return memories
+
+
+def _columnar_store(corpus):
+    memory = SimpleVectorMemory()
+    for i, content in enumerate(corpus):
+        memory.add_memory(content, metadata=_metadata(i))
+    return memory
+
+
+def _measure(build, corpus):
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    store = build(corpus)
+    used = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    return store, used
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--entries", type=int, default=50000)
+    args = parser.parse_args()
+
+    corpus = _make_corpus(args.entries)
+    # นับเฉพาะโครงสร้างของ store: ข้อความ content ถูกสร้างไว้ก่อนแล้วและใช้ร่วมกัน
+    _, legacy_bytes = _measure(_legacy_store, corpus)
+    _, columnar_bytes = _measure(_columnar_store, corpus)
+
+    print(f"จำนวนความจำ: {args.entries:,}")
+    print(f"list-of-dicts : {legacy_bytes / args.entries:8.1f} bytes/entry")
+    print(f"columnar store: {columnar_bytes / args.entries:8.1f} bytes/entry "
+          f"(รวม inverted index)")
+    print(f"ประหยัด       : {1 - columnar_bytes / legacy_bytes:8.1%}")
+
+
+if __name__ == "__main__":
+    main()
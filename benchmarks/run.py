@@ -0,0 +1,147 @@
+# agent/benchmarks/run.py
+"""ชุด benchmark แบบ offline: รันทุกสถานการณ์ (แต่ละสถานการณ์ใน process แยกเพื่อวัด peak RSS)
+แสดง throughput, latency percentile และ peak RSS แล้วเทียบกับ baseline ที่บันทึกไว้
+
+รัน:
+    python -m agent.benchmarks.run
+    python -m agent.benchmarks.run --scenarios wide_plan,concurrent_sessions --memory-sizes 10000
+    python -m agent.benchmarks.run --save-baseline         # บันทึกผลปัจจุบันเป็น baseline
+คืนค่า exit code 1 หากผลแย่กว่า baseline เกิน --tolerance
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List
+
+from .scenarios import registry
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+# (ชื่อค่า, ดึงค่าจากผลลัพธ์, True หากค่ามากดีกว่า)
+COMPARED = [
+    ("throughput", lambda result: result["throughput"], True),
+    ("p95_ms", lambda result: result["latency_ms"]["p95"], False),
+    ("peak_rss_mb", lambda result: result["peak_rss_mb"], False),
+]
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux รายงานเป็น KB ส่วน macOS รายงานเป็นไบต์
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_child(name: str, memory_sizes: List[int]):
+    """ทำงานใน process ลูก: รันสถานการณ์เดียวแล้วพิมพ์ผลเป็น JSON บรรทัดสุดท้าย"""
+    result = registry(memory_sizes)[name]()
+    result["peak_rss_mb"] = _peak_rss_mb()
+    print(json.dumps(result, ensure_ascii=False, default=str))
+
+
+def run_scenario(name: str, memory_sizes: List[int]) -> Dict[str, Any]:
+    command = [sys.executable, "-m", f"{__package__}.run", "--child", name,
+               "--memory-sizes", ",".join(str(size) for size in memory_sizes)]
+    started = time.perf_counter()
+    completed = subprocess.run(command, capture_output=True, text=True)
+    if completed.returncode != 0:
+        lines = completed.stderr.strip().splitlines()
+        return {"error": lines[-1] if lines else f"exit code {completed.returncode}"}
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result["wall_seconds"] = time.perf_counter() - started
+    return result
+
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]], tolerance: float) -> List[str]:
+    """รายการค่าที่แย่กว่า baseline เกิน tolerance (สัดส่วน เช่น 0.2 = 20%)"""
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if "error" in result or not reference or "error" in reference:
+            continue
+        for metric, value_of, higher_is_better in COMPARED:
+            current, previous = value_of(result), value_of(reference)
+            if not previous:
+                continue
+            change = (current - previous) / previous
+            if (higher_is_better and change < -tolerance) or (not higher_is_better and change > tolerance):
+                regressions.append(f"{name}.{metric}: {previous:.2f} -> {current:.2f} ({change:+.0%})")
+    return regressions
+
+
+def print_table(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]]):
+    print(f"{'scenario':<22}{'ops/s':>12}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'RSS MB':>10}{'vs base':>10}")
+    for name, result in results.items():
+        if "error" in result:
+            print(f"{name:<22}  ล้มเหลว: {result['error']}")
+            continue
+        latency = result["latency_ms"]
+        reference = baseline.get(name) or {}
+        change = ""
+        if reference.get("throughput"):
+            change = f"{result['throughput'] / reference['throughput'] - 1:+.0%}"
+        print(f"{name:<22}{result['throughput']:>12.1f}{latency['p50']:>10.2f}{latency['p95']:>10.2f}"
+              f"{latency['p99']:>10.2f}{result['peak_rss_mb']:>10.1f}{change:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="offline benchmark suite")
+    parser.add_argument("--scenarios", default="", help="ชื่อสถานการณ์คั่นด้วย , (ค่าเริ่มต้น: ทั้งหมด)")
+    parser.add_argument("--memory-sizes", default="10000,100000,1000000")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--output", default="", help="บันทึกผลทั้งหมดเป็น JSON")
+    parser.add_argument("--child", default="", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    memory_sizes = [int(size) for size in args.memory_sizes.split(",") if size]
+    if args.child:
+        run_child(args.child, memory_sizes)
+        return
+
+    available = registry(memory_sizes)
+    names = [name for name in args.scenarios.split(",") if name] or list(available)
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        parser.error(f"ไม่รู้จักสถานการณ์: {', '.join(unknown)} (มี: {', '.join(available)})")
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    results = {}
+    for name in names:
+        print(f"กำลังรัน {name}...", flush=True)
+        results[name] = run_scenario(name, memory_sizes)
+
+    print()
+    print_table(results, baseline)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    if args.save_baseline:
+        baseline.update({name: result for name, result in results.items() if "error" not in result})
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, ensure_ascii=False, indent=2)
+        print(f"\nบันทึก baseline ที่ {args.baseline}")
+        return
+
+    regressions = compare(results, baseline, args.tolerance)
+    failed = [name for name, result in results.items() if "error" in result]
+    if regressions:
+        print("\nช้ากว่า baseline:")
+        for line in regressions:
+            print(f"  {line}")
+    if regressions or failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
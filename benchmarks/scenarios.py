@@ -0,0 +1,206 @@
+# agent/benchmarks/scenarios.py
+"""สถานการณ์สำหรับ benchmark แต่ละแบบ คืนค่าผลลัพธ์เป็น dict (ดู run.py)
+
+ทุกสถานการณ์ทำงานแบบ offline: ใช้ FakeChatModel แทน LLM และ FixtureServer แทนเว็บจริง
+"""
+import asyncio
+import random
+import time
+from typing import Any, Callable, Dict, List
+
+from .fake_llm import FakeChatModel
+from .fixture_server import FixtureServer
+
+
+def percentiles(samples_ms: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples_ms)
+    if not ordered:
+        return {'p50': 0.0, 'p95': 0.0, 'p99': 0.0, 'max': 0.0}
+
+    def pick(p: float) -> float:
+        return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+    return {'p50': pick(0.50), 'p95': pick(0.95), 'p99': pick(0.99), 'max': ordered[-1]}
+
+
+def _result(operations: int, seconds: float, latencies_ms: List[float], **extra) -> Dict[str, Any]:
+    return {
+        'operations': operations,
+        'seconds': seconds,
+        'throughput': operations / seconds if seconds else 0.0,
+        'latency_ms': percentiles(latencies_ms),
+        **extra
+    }
+
+
+def memory_search(entries: int, queries: int = 500, seed: int = 42) -> Dict[str, Any]:
+    """เพิ่มความจำ entries รายการ แล้ววัดเวลาค้นหา"""
+    from ..simple_memory import SimpleVectorMemory
+
+    rng = random.Random(seed)
+    vocabulary = [f"word{i}" for i in range(20000)]
+    memory = SimpleVectorMemory()
+
+    started = time.perf_counter()
+    for _ in range(entries):
+        question = " ".join(rng.choices(vocabulary, k=rng.randint(4, 12)))
+        answer = " ".join(rng.choices(vocabulary, k=rng.randint(10, 30)))
+        memory.add_memory(f"ผู้ใช้: {question}\nตอบ: {answer}", metadata={"type": "conversation"})
+    add_seconds = time.perf_counter() - started
+
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(queries):
+        query = " ".join(rng.choices(vocabulary, k=6))
+        began = time.perf_counter()
+        memory.search_memory(query, n_results=3)
+        latencies.append((time.perf_counter() - began) * 1000)
+    seconds = time.perf_counter() - started
+
+    return _result(queries, seconds, latencies, entries=entries, adds_per_second=entries / add_seconds)
+
+
+def wide_plan(width: int = 16, repeats: int = 10, delay_ms: float = 50.0) -> Dict[str, Any]:
+    """แผนที่มี width ขั้นตอนอิสระ (web_search) กับเว็บจำลองที่หน่วง delay_ms ต่อ request
+
+    request ไปยัง host เดียวกันถูกจำกัดด้วย per_host_limit ของ HttpClient
+    """
+    from ..planner import TaskPlanner
+    from ..tools import ToolManager
+
+    with FixtureServer(default_delay_ms=delay_ms) as server:
+        tools = ToolManager()
+        tools.search_endpoint = f"{server.base_url}/search"
+        llm = FakeChatModel(latency=0.0, plan_steps=width, plan_tool="web_search",
+                            plan_parameters=lambda step: {"query": f"หัวข้อ{step}"})
+        planner = TaskPlanner(llm, max_workers=width)
+
+        latencies = []
+        started = time.perf_counter()
+        for _ in range(repeats):
+            began = time.perf_counter()
+            plan = planner.create_plan("ค้นหาหลายหัวข้อพร้อมกัน", tools.get_available_tools())
+            result = planner.execute_plan(plan, tools, None)
+            latencies.append((time.perf_counter() - began) * 1000)
+            if not result['completed']:
+                raise RuntimeError("แผนทำงานไม่สำเร็จ")
+        seconds = time.perf_counter() - started
+
+    # เทียบกับเวลาของเส้นทางวิกฤต (หนึ่ง request) และเวลาหากทำทีละขั้นตอน
+    return _result(repeats, seconds, latencies, width=width,
+                   critical_path_ms=delay_ms, sequential_ms=delay_ms * width,
+                   http=tools.http.get_metrics())
+
+
+def scrape_heavy(pages: int = 8, repeats: int = 5, kilobytes: int = 512, delay_ms: float = 10.0) -> Dict[str, Any]:
+    """แผนที่ดึงหน้าเว็บขนาดใหญ่หลายหน้า (web_scrape แบบ streaming)"""
+    from ..planner import TaskPlanner
+    from ..tools import ToolManager
+
+    with FixtureServer(default_delay_ms=delay_ms) as server:
+        tools = ToolManager()
+        llm = FakeChatModel(latency=0.0, plan_steps=pages, plan_tool="web_scrape",
+                            plan_parameters=lambda step: {"url": f"{server.base_url}/page/{step}?kb={kilobytes}"})
+        planner = TaskPlanner(llm, max_workers=pages)
+
+        latencies = []
+        started = time.perf_counter()
+        for _ in range(repeats):
+            began = time.perf_counter()
+            plan = planner.create_plan("ดึงข้อมูลจากหลายหน้าเว็บ", tools.get_available_tools())
+            result = planner.execute_plan(plan, tools, None)
+            latencies.append((time.perf_counter() - began) * 1000)
+            if not result['completed']:
+                raise RuntimeError("แผนทำงานไม่สำเร็จ")
+        seconds = time.perf_counter() - started
+
+    return _result(repeats * pages, seconds, latencies, page_kb=kilobytes,
+                   http=tools.http.get_metrics())
+
+
+def concurrent_sessions(sessions: int = 200, latency: float = 0.05, complex_ratio: float = 0.25) -> Dict[str, Any]:
+    """หลาย session พร้อมกันบน event loop เดียว (aprocess) ด้วย LLM จำลองที่มี jitter"""
+    from ..core import AdvancedAgenticAI
+    from ..router import Router
+    from ..llm_scheduler import LLMScheduler
+
+    # LLM จำลองไม่จำกัดการเรียกพร้อมกัน จึงเปิดคิวเต็มที่ตั้งแต่ต้น (การปรับตัวของคิววัดใน rate_limited)
+    agent = AdvancedAgenticAI(llm=FakeChatModel(latency=latency, jitter=0.2), router=Router(log_path=None),
+                              scheduler=LLMScheduler(initial_concurrency=sessions, max_concurrency=sessions))
+    every = int(1 / complex_ratio) if complex_ratio > 0 else 0
+    tasks = [
+        "วิเคราะห์ เปรียบเทียบ และสรุปข้อมูลยอดขาย" if every and i % every == 0 else f"สวัสดี คำถามที่ {i}"
+        for i in range(sessions)
+    ]
+
+    async def one(task: str) -> float:
+        began = time.perf_counter()
+        result = await agent.aprocess(task)
+        if not result['success']:
+            raise RuntimeError(result['response'])
+        return (time.perf_counter() - began) * 1000
+
+    async def run_all() -> List[float]:
+        return await asyncio.gather(*(one(task) for task in tasks))
+
+    started = time.perf_counter()
+    latencies = asyncio.run(run_all())
+    seconds = time.perf_counter() - started
+    return _result(sessions, seconds, list(latencies), llm_latency_ms=latency * 1000,
+                   stages=agent.tracer.get_metrics())
+
+
+def rate_limited(calls: int = 300, latency: float = 0.05, provider_concurrency: int = 8,
+                 retry_after: float = 0.05) -> Dict[str, Any]:
+    """หลายคำขอพร้อมกันผ่าน LLMScheduler ไปยัง LLM จำลองที่ตอบ 429 เมื่อเรียกพร้อมกันเกิน provider_concurrency
+
+    คำขอกระจายทุกระดับความสำคัญ รายงานเวลารอของแต่ละระดับ จำนวน 429 และจำนวนที่ล้มเหลวหากไม่ผ่านคิว
+    """
+    from ..llm_scheduler import LLMScheduler, ScheduledChatModel, PRIORITY_NAMES
+    from .fake_llm import FakeMessage
+
+    messages = [FakeMessage("คำถามจำลองสำหรับทดสอบ rate limit")]
+
+    async def unscheduled() -> int:
+        provider = FakeChatModel(latency=latency, concurrency_limit=provider_concurrency, retry_after=retry_after)
+        results = await asyncio.gather(*(provider.ainvoke(messages) for _ in range(calls)), return_exceptions=True)
+        return sum(1 for result in results if isinstance(result, Exception))
+
+    provider = FakeChatModel(latency=latency, jitter=0.2, concurrency_limit=provider_concurrency,
+                             retry_after=retry_after)
+    scheduler = LLMScheduler(initial_concurrency=provider_concurrency * 2, seed=0)
+    llm = ScheduledChatModel(provider, scheduler)
+
+    async def one(priority: int) -> float:
+        began = time.perf_counter()
+        await llm.with_priority(priority).ainvoke(messages)
+        return (time.perf_counter() - began) * 1000
+
+    async def run_all() -> List[float]:
+        return await asyncio.gather(*(one(i % len(PRIORITY_NAMES)) for i in range(calls)))
+
+    unscheduled_failures = asyncio.run(unscheduled())
+    started = time.perf_counter()
+    latencies = asyncio.run(run_all())
+    seconds = time.perf_counter() - started
+    metrics = scheduler.get_metrics()
+    return _result(calls, seconds, list(latencies),
+                   provider_429=provider.rate_limited,
+                   unscheduled_failures=unscheduled_failures,
+                   retries=metrics["retries"],
+                   concurrency_limit=metrics["concurrency_limit"],
+                   max_queue_depth=metrics["max_queue_depth"],
+                   wait_p95_ms={name: summary["p95"] for name, summary in metrics["wait_ms"].items()})
+
+
+def registry(memory_sizes: List[int]) -> Dict[str, Callable[[], Dict[str, Any]]]:
+    """ชื่อสถานการณ์ -> ฟังก์ชันที่รัน"""
+    scenarios = {}
+    for size in memory_sizes:
+        label = f"{size // 1000}k" if size < 1000000 else f"{size // 1000000}m"
+        scenarios[f"memory_{label}"] = lambda size=size: memory_search(size)
+    scenarios["wide_plan"] = wide_plan
+    scenarios["scrape_heavy"] = scrape_heavy
+    scenarios["concurrent_sessions"] = concurrent_sessions
+    scenarios["rate_limited"] = rate_limited
+    return scenarios
@@ -0,0 +1,101 @@
+# agent/benchmarks/scrape_extraction.py
+"""เปรียบเทียบการดึงข้อความจาก HTML แบบ streaming กับแบบ BeautifulSoup เดิม
+
+ใช้ไฟล์ .html ในโฟลเดอร์ corpus (หากไม่มีจะสร้างหน้าเว็บขนาดใหญ่จำลองไว้ให้)
+รัน: python -m agent.benchmarks.scrape_extraction --corpus data/html_corpus
+"""
+import argparse
+import glob
+import os
+import random
+import time
+import tracemalloc
+
+from ..html_extract import extract_text_streaming, extract_text_soup
+
+CHUNK_SIZE = 16 * 1024
+
+
+def _make_page(rng: random.Random, paragraphs: int) -> str:
+    vocabulary = [f"คำ{i}" for i in range(500)] + [f"word{i}" for i in range(500)]
+    parts = ["<html><head><title>หน้าทดสอบขนาดใหญ่</title>",
+             "<style>body { font-family: sans-serif; }</style>",
+             "<script>var data = {" + ",".join(f'"k{i}": {i}' for i in range(2000)) + "};</script>",
+             "</head><body>"]
+    for _ in range(paragraphs):
+        words = " ".join(rng.choices(vocabulary, k=rng.randint(40, 120)))
+        parts.append(f"<div class=\"row\"><p>{words}</p>\n  <span>{rng.random()}</span></div>\n")
+    parts.append("</body></html>")
+    return "".join(parts)
+
+
+def _ensure_corpus(directory: str, pages: int, paragraphs: int):
+    if glob.glob(os.path.join(directory, "*.html")):
+        return
+    os.makedirs(directory, exist_ok=True)
+    rng = random.Random(42)
+    for i in range(pages):
+        with open(os.path.join(directory, f"page{i}.html"), "w", encoding="utf-8") as f:
+            f.write(_make_page(rng, paragraphs))
+    print(f"สร้าง corpus จำลอง {pages} หน้าใน {directory}")
+
+
+def _chunks(path: str):
+    """อ่านไฟล์ทีละชิ้นเหมือนการรับ response แบบ stream"""
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+
+def _streaming(path: str, max_chars: int):
+    chunks = _chunks(path)
+    try:
+        return extract_text_streaming(chunks, max_chars=max_chars)
+    finally:
+        chunks.close()
+
+
+def _soup(path: str, max_chars: int):
+    # วิธีเดิม: ดาวน์โหลดทั้ง body แล้วสร้าง tree ทั้งเอกสาร
+    return extract_text_soup(b"".join(_chunks(path)), max_chars=max_chars)
+
+
+def _measure(extract, paths, max_chars: int):
+    tracemalloc.start()
+    started = time.perf_counter()
+    peak = 0
+    for path in paths:
+        extract(path, max_chars)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+    elapsed = time.perf_counter() - started
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--corpus", default="data/html_corpus")
+    parser.add_argument("--pages", type=int, default=20, help="จำนวนหน้าจำลองหาก corpus ว่าง")
+    parser.add_argument("--paragraphs", type=int, default=5000, help="จำนวนย่อหน้าต่อหน้าจำลอง")
+    parser.add_argument("--max-chars", type=int, default=5000)
+    args = parser.parse_args()
+
+    _ensure_corpus(args.corpus, args.pages, args.paragraphs)
+    paths = sorted(glob.glob(os.path.join(args.corpus, "*.html")))
+    total_bytes = sum(os.path.getsize(path) for path in paths)
+
+    soup_time, soup_peak = _measure(_soup, paths, args.max_chars)
+    stream_time, stream_peak = _measure(_streaming, paths, args.max_chars)
+
+    print(f"จำนวนหน้า: {len(paths)} ({total_bytes / 1024 / 1024:.1f} MB)")
+    print(f"BeautifulSoup: {soup_time / len(paths) * 1000:8.1f} ms/หน้า, peak {soup_peak / 1024:10.1f} KB")
+    print(f"streaming    : {stream_time / len(paths) * 1000:8.1f} ms/หน้า, peak {stream_peak / 1024:10.1f} KB")
+    print(f"เร็วขึ้น       : {soup_time / stream_time:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
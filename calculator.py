@@ -0,0 +1,187 @@
+# agent/calculator.py
+from typing import List, Dict, Any, Union
+from functools import lru_cache
+import ast
+import math
+import operator
+
+Number = Union[int, float]
+
+# ขีดจำกัดเพื่อไม่ให้นิพจน์เดียวใช้ CPU/หน่วยความจำมากเกินไป (เช่น 9**9**9)
+MAX_EXPRESSION_LENGTH = 1000
+MAX_EXPONENT = 10000
+MAX_INT_BITS = 4096
+MAX_ARRAY_SIZE = 10_000_000
+
+_BINARY = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow
+}
+_UNARY = {
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg
+}
+
+# ฟังก์ชันที่ใช้ได้ในโหมด batch (ชื่อ -> ชื่อฟังก์ชันของ numpy)
+_ARRAY_FUNCTIONS = {
+    'abs': 'abs', 'sqrt': 'sqrt', 'exp': 'exp', 'log': 'log', 'log10': 'log10',
+    'round': 'round', 'floor': 'floor', 'ceil': 'ceil',
+    'sum': 'sum', 'mean': 'mean', 'median': 'median', 'min': 'min', 'max': 'max', 'std': 'std',
+    'cumsum': 'cumsum'
+}
+
+
+class CalculationError(ValueError):
+    """นิพจน์ไม่ถูกต้อง หรือผลลัพธ์ใหญ่เกินขีดจำกัด"""
+
+
+@lru_cache(maxsize=1024)
+def evaluate(expression: str) -> float:
+    """คำนวณนิพจน์เลขคณิต (+ - * / // % ** และวงเล็บ) โดยเดิน AST แทนการใช้ eval"""
+    if len(expression) > MAX_EXPRESSION_LENGTH:
+        raise CalculationError("นิพจน์ยาวเกินไป")
+    try:
+        tree = ast.parse(expression.strip(), mode='eval')
+    except SyntaxError:
+        raise CalculationError("รูปแบบนิพจน์ไม่ถูกต้อง") from None
+    try:
+        return float(_evaluate(tree.body))
+    except ZeroDivisionError:
+        raise CalculationError("หารด้วยศูนย์") from None
+    except OverflowError:
+        raise CalculationError("ผลลัพธ์ใหญ่เกินไป") from None
+
+
+def _evaluate(node: ast.AST) -> Number:
+    if isinstance(node, ast.Constant):
+        if isinstance(node.value, bool) or not isinstance(node.value, (int, float)):
+            raise CalculationError("อนุญาตเฉพาะตัวเลข")
+        return node.value
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY:
+        return _UNARY[type(node.op)](_evaluate(node.operand))
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY:
+        left = _evaluate(node.left)
+        right = _evaluate(node.right)
+        if isinstance(node.op, ast.Pow):
+            _check_power(left, right)
+        elif isinstance(node.op, ast.Mult) and isinstance(left, int) and isinstance(right, int):
+            _check_bits(left.bit_length() + right.bit_length())
+        result = _BINARY[type(node.op)](left, right)
+        if isinstance(result, complex):
+            raise CalculationError("ผลลัพธ์เป็นจำนวนเชิงซ้อน")
+        if isinstance(result, float) and math.isinf(result):
+            raise OverflowError
+        return result
+    raise CalculationError(f"ไม่รองรับ {type(node).__name__}")
+
+
+def _check_power(base: Number, exponent: Number):
+    if abs(exponent) > MAX_EXPONENT:
+        raise CalculationError("เลขชี้กำลังใหญ่เกินไป")
+    if isinstance(base, int) and isinstance(exponent, int) and exponent > 0:
+        _check_bits(base.bit_length() * exponent)
+
+
+def _check_bits(bits: int):
+    if bits > MAX_INT_BITS:
+        raise CalculationError("ผลลัพธ์ใหญ่เกินไป")
+
+
+def batch_evaluate(expressions: List[str], variables: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+    """คำนวณหลายนิพจน์ในครั้งเดียวแบบ vectorized ด้วย numpy
+
+    ตัวแปร (variables) เป็นตัวเลขหรือรายการตัวเลข (คำนวณทีละทั้งคอลัมน์) นิพจน์รูปแบบ
+    "ชื่อ = นิพจน์" จะเก็บผลเป็นตัวแปรให้นิพจน์ถัดไปใช้ได้ เช่น
+    ["total = price * qty", "sum(total)"] ผลลัพธ์ของแต่ละนิพจน์แยกกัน (มี result หรือ error)
+    """
+    import numpy as np
+
+    scope = {name: _as_array(np, value) for name, value in (variables or {}).items()}
+    results = []
+    for expression in expressions:
+        try:
+            name, body = _split_assignment(expression)
+            with np.errstate(over='raise', divide='raise', invalid='raise'):
+                value = _evaluate_array(np, body, scope)
+            if name is not None:
+                scope[name] = value
+            results.append({"expression": expression, "result": _to_python(value)})
+        except CalculationError as e:
+            results.append({"expression": expression, "error": str(e)})
+        except ZeroDivisionError:
+            results.append({"expression": expression, "error": "หารด้วยศูนย์"})
+        except FloatingPointError as e:
+            error = "หารด้วยศูนย์" if "divide" in str(e) else f"คำนวณไม่ได้: {e}"
+            results.append({"expression": expression, "error": error})
+        except (OverflowError, ValueError, TypeError) as e:
+            # รวมข้อผิดพลาดของ numpy เช่น reduction ของรายการว่าง หรือขนาดที่ broadcast ไม่ได้
+            results.append({"expression": expression, "error": f"คำนวณไม่ได้: {e}"})
+    return results
+
+
+def _split_assignment(expression: str):
+    if len(expression) > MAX_EXPRESSION_LENGTH:
+        raise CalculationError("นิพจน์ยาวเกินไป")
+    try:
+        tree = ast.parse(expression.strip(), mode='exec')
+    except SyntaxError:
+        raise CalculationError("รูปแบบนิพจน์ไม่ถูกต้อง") from None
+    if len(tree.body) != 1:
+        raise CalculationError("หนึ่งรายการต้องมีหนึ่งนิพจน์")
+    statement = tree.body[0]
+    if isinstance(statement, ast.Expr):
+        return None, statement.value
+    if (isinstance(statement, ast.Assign) and len(statement.targets) == 1
+            and isinstance(statement.targets[0], ast.Name)):
+        return statement.targets[0].id, statement.value
+    raise CalculationError("รองรับเฉพาะนิพจน์ หรือ ชื่อ = นิพจน์")
+
+
+def _evaluate_array(np, node: ast.AST, scope: Dict[str, Any]):
+    if isinstance(node, ast.Constant):
+        if isinstance(node.value, bool) or not isinstance(node.value, (int, float)):
+            raise CalculationError("อนุญาตเฉพาะตัวเลข")
+        return np.float64(node.value)
+    if isinstance(node, ast.Name):
+        if node.id not in scope:
+            raise CalculationError(f"ไม่รู้จักตัวแปร {node.id}")
+        return scope[node.id]
+    if isinstance(node, (ast.List, ast.Tuple)):
+        values = [_evaluate_array(np, element, scope) for element in node.elts]
+        return _as_array(np, values)
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY:
+        return _UNARY[type(node.op)](_evaluate_array(np, node.operand, scope))
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY:
+        left = _evaluate_array(np, node.left, scope)
+        right = _evaluate_array(np, node.right, scope)
+        if isinstance(node.op, ast.Pow) and np.size(right) and np.max(np.abs(right)) > MAX_EXPONENT:
+            raise CalculationError("เลขชี้กำลังใหญ่เกินไป")
+        if np.size(left) > 1 and np.size(right) > 1 and np.shape(left) != np.shape(right):
+            raise CalculationError("ขนาดของรายการไม่เท่ากัน")
+        return _BINARY[type(node.op)](left, right)
+    if (isinstance(node, ast.Call) and isinstance(node.func, ast.Name)
+            and node.func.id in _ARRAY_FUNCTIONS and not node.keywords and len(node.args) == 1):
+        argument = _evaluate_array(np, node.args[0], scope)
+        return getattr(np, _ARRAY_FUNCTIONS[node.func.id])(argument)
+    raise CalculationError(f"ไม่รองรับ {type(node).__name__}")
+
+
+def _as_array(np, value):
+    try:
+        array = np.asarray(value, dtype=np.float64)
+    except (TypeError, ValueError):
+        raise CalculationError("ตัวแปรต้องเป็นตัวเลขหรือรายการตัวเลข") from None
+    if array.ndim > 1 or array.size > MAX_ARRAY_SIZE:
+        raise CalculationError("รายการใหญ่เกินไป")
+    return array
+
+
+def _to_python(value) -> Union[float, List[float]]:
+    if getattr(value, 'ndim', 0):
+        return value.tolist()
+    return float(value)
@@ -0,0 +1,235 @@
+# agent/context_builder.py
+from typing import List, Dict, Any, Callable, Set
+from collections import OrderedDict
+import math
+import threading
+
+from .simple_memory import extract_keywords
+
+EMPTY_CONTEXT = "ไม่มีข้อมูลที่เกี่ยวข้องจากอดีต"
+_ELLIPSIS = "…"
+_ROLES = {"user": "ผู้ใช้", "assistant": "ผู้ช่วย", "summary": "สรุปบทสนทนาก่อนหน้า"}
+
+
+class TokenCounter:
+    """นับ token ของข้อความ พร้อม LRU cache ตามข้อความ
+
+    ใช้ tiktoken หากติดตั้งไว้ (มากับ langchain_openai) ไม่เช่นนั้นประมาณค่าแบบเผื่อไว้:
+    อักขระ ASCII 4 ตัวต่อ token และอักขระอื่น (เช่น ภาษาไทย) 1 ตัวต่อ token
+    """
+
+    def __init__(self, model_name: str = None, max_entries: int = 20000):
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self._cache: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._encoding = None
+        self._encoding_loaded = False
+        self.stats = {"hits": 0, "misses": 0}
+
+    def count(self, text: str) -> int:
+        """จำนวน token (ข้อความเดิมนับครั้งเดียว)"""
+        if not text:
+            return 0
+        with self._lock:
+            cached = self._cache.get(text)
+            if cached is not None:
+                self._cache.move_to_end(text)
+                self.stats["hits"] += 1
+                return cached
+
+        tokens = self._count(text)
+        with self._lock:
+            self.stats["misses"] += 1
+            self._cache[text] = tokens
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return tokens
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """ตัดข้อความให้ไม่เกิน max_tokens (รวมเครื่องหมาย … ที่ต่อท้าย)"""
+        if max_tokens <= 0:
+            return ""
+        total = self.count(text)
+        if total <= max_tokens:
+            return text
+
+        encoding = self._get_encoding()
+        if encoding is not None:
+            return encoding.decode(encoding.encode(text)[:max_tokens - 1]) + _ELLIPSIS
+
+        # ประมาณตำแหน่งตัดจากสัดส่วน แล้วลดลงจนพอดีงบ
+        end = len(text) * (max_tokens - 1) // total
+        while end > 0 and self._count(text[:end]) > max_tokens - 1:
+            end = end * 9 // 10
+        return text[:end].rstrip() + _ELLIPSIS
+
+    def _count(self, text: str) -> int:
+        encoding = self._get_encoding()
+        if encoding is not None:
+            return len(encoding.encode(text))
+        ascii_chars = len(text.encode('ascii', 'ignore'))
+        return math.ceil(ascii_chars / 4) + (len(text) - ascii_chars)
+
+    def _get_encoding(self):
+        if self._encoding_loaded:
+            return self._encoding
+        with self._lock:
+            if not self._encoding_loaded:
+                try:
+                    import tiktoken
+                    try:
+                        self._encoding = tiktoken.encoding_for_model(self.model_name or "gpt-3.5-turbo")
+                    except KeyError:
+                        self._encoding = tiktoken.get_encoding("cl100k_base")
+                except Exception:
+                    # ไม่มี tiktoken หรือโหลดไฟล์ encoding ไม่ได้ (เช่น ไม่มีเครือข่าย)
+                    self._encoding = None
+                self._encoding_loaded = True
+        return self._encoding
+
+
+class ContextBuilder:
+    """ประกอบ context ของ prompt ภายใต้งบ token ที่กำหนด (max_tokens)
+
+    - ประวัติการสนทนา: ใช้งบไม่เกิน history_share ของทั้งหมด ข้อความใหม่สุดก่อน
+    - ความจำ: เรียงตาม distance (น้อย = เกี่ยวข้องมาก) ข้ามรายการที่คำสำคัญซ้ำกับรายการที่เลือกแล้ว
+      หรือกับประวัติการสนทนาตั้งแต่ duplicate_threshold (Jaccard) และตัดแต่ละรายการไม่เกิน max_memory_tokens
+    - compact_history เก็บ history_window ข้อความล่าสุด ที่เก่ากว่ารวมเป็นสรุปหนึ่งรายการ
+      (ใช้ summarizer(entries) -> str หากกำหนด ไม่เช่นนั้นสรุปจากคำถามของผู้ใช้)
+    - คำตอบที่บันทึกลงความจำถูกตัดไม่เกิน max_answer_tokens (ดู truncate_answer)
+    """
+
+    def __init__(self,
+                 max_tokens: int = 1500,
+                 history_share: float = 0.4,
+                 max_memory_tokens: int = 300,
+                 history_window: int = 6,
+                 summary_tokens: int = 200,
+                 max_answer_tokens: int = 300,
+                 duplicate_threshold: float = 0.8,
+                 min_item_tokens: int = 16,
+                 counter: TokenCounter = None,
+                 summarizer: Callable[[List[Dict[str, Any]]], str] = None,
+                 model_name: str = None):
+        self.max_tokens = max_tokens
+        self.history_share = history_share
+        self.max_memory_tokens = max_memory_tokens
+        self.history_window = history_window
+        self.summary_tokens = summary_tokens
+        self.max_answer_tokens = max_answer_tokens
+        self.duplicate_threshold = duplicate_threshold
+        self.min_item_tokens = min_item_tokens
+        self.counter = counter or TokenCounter(model_name)
+        self.summarizer = summarizer
+
+    def build(self, memories: List[Dict[str, Any]], history: List[Dict[str, Any]] = None) -> str:
+        """สร้าง context จากประวัติการสนทนาและความจำ (ไม่เกิน max_tokens)"""
+        sections = []
+        remaining = self.max_tokens
+        history_keywords: Set[str] = set()
+
+        history_lines, used = self._history_lines(
+            history or [], int(self.max_tokens * self.history_share), history_keywords
+        )
+        if history_lines:
+            sections.append("บทสนทนาก่อนหน้า:\n" + "\n".join(history_lines))
+            remaining -= used
+
+        memory_lines = self._memory_lines(memories or [], remaining, history_keywords)
+        if memory_lines:
+            sections.append("ข้อมูลที่เกี่ยวข้อง:\n" + "\n".join(memory_lines))
+
+        return "\n\n".join(sections) if sections else EMPTY_CONTEXT
+
+    def compact_history(self, history: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """เก็บ history_window ข้อความล่าสุด ข้อความที่เก่ากว่ารวมเป็นรายการสรุปเดียว"""
+        if len(history) <= self.history_window:
+            return history
+        cut = len(history) - self.history_window
+        older, recent = history[:cut], history[cut:]
+        summary = {
+            "type": "summary",
+            "content": self._summarize(older),
+            "timestamp": older[-1].get("timestamp"),
+            "turns": sum(entry.get("turns", 1) for entry in older)
+        }
+        return [summary] + recent
+
+    def truncate_answer(self, answer: str) -> str:
+        """ตัดคำตอบก่อนบันทึกลงความจำ"""
+        return self.counter.truncate(answer, self.max_answer_tokens)
+
+    def _history_lines(self, history: List[Dict[str, Any]], budget: int, history_keywords: Set[str]):
+        lines, used = [], 0
+        # ใหม่สุดก่อน เมื่องบหมดข้อความเก่าจะถูกตัดออก
+        for entry in reversed(history):
+            prefix = f"- {_ROLES.get(entry.get('type'), entry.get('type', ''))}: "
+            available = min(self.max_memory_tokens, budget - used) - self.counter.count(prefix)
+            if available < self.min_item_tokens:
+                break
+            line = prefix + self.counter.truncate(entry.get("content", ""), available)
+            tokens = self.counter.count(line)
+            if used + tokens > budget:
+                break
+            lines.append(line)
+            used += tokens
+            history_keywords.update(extract_keywords(entry.get("content", "")))
+        lines.reverse()
+        return lines, used
+
+    def _memory_lines(self, memories: List[Dict[str, Any]], budget: int, history_keywords: Set[str]) -> List[str]:
+        ranked = sorted(memories, key=lambda memory: memory.get("distance", 1.0))
+        lines, used = [], 0
+        seen: List[Set[str]] = []
+        for memory in ranked:
+            available = min(self.max_memory_tokens, budget - used)
+            if available < self.min_item_tokens:
+                break
+            content = memory.get("content", "")
+            keywords = set(memory.get("keywords") or extract_keywords(content))
+            if self._is_duplicate(keywords, seen, history_keywords):
+                continue
+            line = f"- {self.counter.truncate(content, available - 1)}"
+            tokens = self.counter.count(line)
+            if used + tokens > budget:
+                break
+            lines.append(line)
+            used += tokens
+            seen.append(keywords)
+        return lines
+
+    def _is_duplicate(self, keywords: Set[str], seen: List[Set[str]], history_keywords: Set[str]) -> bool:
+        """ซ้ำเมื่อคำสำคัญส่วนใหญ่อยู่ในประวัติการสนทนาแล้ว หรือ Jaccard กับรายการที่เลือกแล้วสูง"""
+        if not keywords:
+            return False
+        if len(keywords & history_keywords) / len(keywords) >= self.duplicate_threshold:
+            return True
+        for other in seen:
+            if not other:
+                continue
+            intersection = len(keywords & other)
+            if intersection and intersection / len(keywords | other) >= self.duplicate_threshold:
+                return True
+        return False
+
+    def _summarize(self, entries: List[Dict[str, Any]]) -> str:
+        if self.summarizer is not None:
+            return self.counter.truncate(self.summarizer(entries), self.summary_tokens)
+
+        # สรุปเดิม (ถ้ามี) ตามด้วยคำถามของผู้ใช้แบบย่อ เก็บส่วนที่ใหม่กว่าไว้เมื่อเกินงบ
+        parts = [entry["content"] for entry in entries if entry.get("type") == "summary"]
+        parts.extend(self.counter.truncate(entry.get("content", ""), 40)
+                     for entry in entries if entry.get("type") == "user")
+        kept, used = [], 0
+        for part in reversed(parts):
+            tokens = self.counter.count(part) + 1
+            if used + tokens > self.summary_tokens:
+                break
+            kept.append(part)
+            used += tokens
+        kept.reverse()
+        return "; ".join(kept)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"token_cache": dict(self.counter.stats), "cached_texts": len(self.counter._cache)}
@@ -1,30 +1,99 @@
 # agent/core.py (เวอร์ชันสมบูรณ์)
-from langchain_openai import ChatOpenAI
-from langchain.schema import SystemMessage, HumanMessage
 from .simple_memory import SimpleVectorMemory as VectorMemory
 from .tools import ToolManager
 from .planner import TaskPlanner
-from typing import List, Dict, Any
+from .llm_cache import LLMResponseCache
+from .plan_cache import PlanCache
+from .tracing import Tracer, span, token_usage, payload_bytes
+from .context_builder import ContextBuilder
+from .router import Router
+from .llm_scheduler import LLMScheduler, ScheduledChatModel, PLANNING
+from .lazy import LazyObject, lazy_import
+from typing import List, Dict, Any, AsyncIterator, Iterator
 import json
+import threading
+import time
 from datetime import datetime
 
+# import เมื่อใช้งานจริง (langchain และ asyncio ใช้เวลา import นาน)
+asyncio = lazy_import("asyncio")
+schema = lazy_import("langchain.schema")
+
+
+def _chat_model(model_name: str, temperature: float):
+    from langchain_openai import ChatOpenAI
+    return ChatOpenAI(model_name=model_name, temperature=temperature)
+
+
 class AdvancedAgenticAI:
     def __init__(self, 
                  model_name: str = "gpt-3.5-turbo",
-                 temperature: float = 0.7):
-        # เริ่มต้น LLM
-        self.llm = ChatOpenAI(
-            model_name=model_name,
-            temperature=temperature
-        )
+                 temperature: float = 0.7,
+                 memory_snapshot: str = None,
+                 memory_backend: str = "simple",
+                 memory_options: Dict[str, Any] = None,
+                 llm=None,
+                 response_cache: LLMResponseCache = None,
+                 plan_cache: PlanCache = None,
+                 tracer: Tracer = None,
+                 context_builder: ContextBuilder = None,
+                 router: Router = None,
+                 scheduler: LLMScheduler = None,
+                 shared: "AdvancedAgenticAI" = None,
+                 namespace: str = None):
+        # ความจำของ agent นี้ถูกติด metadata["namespace"] และค้นหาเฉพาะใน namespace นี้ (None = ทั้งหมด)
+        self.namespace = namespace
+        # หน่วยความจำชั่วคราว
+        self.conversation_history = []
+        
+        if shared is not None:
+            # session ที่ใช้ LLM, เครื่องมือ (HTTP pool), cache, ความจำ และ planner ร่วมกับ shared
+            # (ดู server.py) ตัวเองเก็บเฉพาะประวัติการสนทนาและ namespace
+            self.llm = shared.llm
+            self.scheduler = shared.scheduler
+            self.model_name = shared.model_name
+            self.temperature = shared.temperature
+            self.response_cache = shared.response_cache
+            self.tracer = shared.tracer
+            self.memory = shared.memory
+            self._memory_lock = shared._memory_lock
+            self.tools = shared.tools
+            self.planner = shared.planner
+            self.context_builder = shared.context_builder
+            self.router = shared.router
+            self.system_prompt = shared.system_prompt
+            return
+        
+        self.model_name = model_name
+        self.temperature = temperature
+        # cache คำตอบของ LLM (ไม่ระบุ = เรียก LLM ทุกครั้ง)
+        self.response_cache = response_cache
+        # วัดเวลาแต่ละขั้นตอน (trace อยู่ใน response_data["trace"], histogram ดูได้จาก tracer.get_metrics())
+        self.tracer = tracer or Tracer()
+        # ประกอบ context ภายใต้งบ token และย่อประวัติการสนทนาที่เก่า
+        self.context_builder = context_builder or ContextBuilder(model_name=model_name)
+        
+        # เริ่มต้น LLM (ส่ง llm มาเองได้ เช่น LLM จำลองใน benchmarks/fake_llm.py)
+        # ไม่ระบุ = สร้าง ChatOpenAI เมื่อเรียก LLM ครั้งแรก
+        llm = llm if llm is not None else LazyObject(lambda: _chat_model(model_name, temperature))
+        # ทุกการเรียก LLM ผ่านคิวกลาง (rate limit, ลำดับความสำคัญ, retry) ดู llm_scheduler.py
+        self.scheduler = scheduler or LLMScheduler(count_tokens=self.context_builder.counter.count)
+        self.llm = llm if isinstance(llm, ScheduledChatModel) else ScheduledChatModel(llm, self.scheduler)
+        # เลือกเส้นทาง fast/direct/plan (ไม่ระบุ = โหลดโมเดลที่ train แล้วจาก data/router_model.json ถ้ามี)
+        # log สำหรับ train ปิดไว้โดยปริยาย ส่ง Router.load(log_path=...) เพื่อเปิด
+        self.router = router or Router.load()
         
         # เริ่มต้นส่วนประกอบ
-        self.memory = VectorMemory()
+        # memory_options ส่งต่อให้ constructor ของ backend (เช่น retention, cold_tier)
+        self.memory = self._create_memory(memory_backend, memory_snapshot, **(memory_options or {}))
+        # aprocess เรียกหน่วยความจำจาก thread pool จึงต้องไม่ให้ทำงานซ้อนกัน
+        self._memory_lock = threading.Lock()
         self.tools = ToolManager()
-        self.planner = TaskPlanner(self.llm)
-        
-        # หน่วยความจำชั่วคราว
-        self.conversation_history = []
+        self.planner = TaskPlanner(self.llm.with_priority(PLANNING),
+                                   response_cache=response_cache,
+                                   model_name=model_name,
+                                   temperature=temperature,
+                                   plan_cache=plan_cache)
         
         self.system_prompt = """
         คุณเป็น Advanced AI Agent ที่มีความสามารถดังนี้:
@@ -50,8 +119,29 @@ class AdvancedAgenticAI:
         - ตอบเป็นภาษาไทยที่เข้าใจง่าย
         """
     
+    def _create_memory(self, backend: str, snapshot_path: str = None, **options):
+        """สร้างหน่วยความจำตาม backend: simple, vector หรือ chroma"""
+        if backend == "simple":
+            # snapshot_path: snapshot แบบ mmap (ดู SimpleVectorMemory.save_snapshot) ใช้ได้ทันทีไม่ต้องโหลด
+            return VectorMemory(snapshot_path=snapshot_path, **options)
+        if backend == "vector":
+            from .vector_memory import NumpyVectorMemory
+            return NumpyVectorMemory(**options)
+        if backend == "chroma":
+            from .memory import VectorMemory as ChromaVectorMemory
+            return ChromaVectorMemory(**options)
+        raise ValueError(f"ไม่รู้จัก memory backend: {backend}")
+    
     def process(self, user_input: str, use_planning: bool = True) -> Dict[str, Any]:
         """ประมวลผลคำขอจากผู้ใช้"""
+        with self.tracer.trace("process", input_bytes=payload_bytes(user_input)) as trace:
+            response_data = self._process(user_input, use_planning)
+            trace.root.set(success=response_data["success"])
+        response_data["trace"] = trace.to_dict()
+        self.router.record(response_data)
+        return response_data
+    
+    def _process(self, user_input: str, use_planning: bool) -> Dict[str, Any]:
         
         # 1. บันทึกข้อความผู้ใช้
         self.conversation_history.append({
@@ -60,91 +150,349 @@ class AdvancedAgenticAI:
             "timestamp": self._get_timestamp()
         })
         
-        # 2. ค้นหาข้อมูลที่เกี่ยวข้อง
-        related_memories = self.memory.search_memory(user_input, n_results=3)
+        # 2. เลือกเส้นทาง (fast = ตอบด้วยเครื่องมือโดยตรง ไม่ต้องค้นความจำหรือเรียก LLM)
+        decision = self._route(user_input, use_planning)
+        fast_result = self._handle_fast_task(decision)
         
-        # 3. ตัดสินใจว่าต้องใช้ planning หรือไม่
-        complexity_score = self._assess_complexity(user_input)
-        
-        response_data = {
-            "user_input": user_input,
-            "complexity_score": complexity_score,
-            "related_memories": related_memories,
-            "response": "",
-            "actions_taken": [],
-            "success": True
-        }
+        # 3. ค้นหาข้อมูลที่เกี่ยวข้อง
+        related_memories = [] if fast_result is not None else self._search_memories(user_input)
+        complexity_score = decision["complexity"]
+        response_data = self._new_response_data(user_input, complexity_score, related_memories, decision["route"])
         
         try:
-            if use_planning and complexity_score > 0.7:
+            if fast_result is not None:
+                response_data.update(fast_result)
+            elif decision["route"] == "plan":
                 # งานซับซ้อน ใช้ planning
                 response_data.update(self._handle_complex_task(user_input, related_memories))
             else:
                 # งานง่าย ตอบโดยตรง
                 response_data.update(self._handle_simple_task(user_input, related_memories))
             
-            # 4. บันทึกความจำ
-            self.memory.add_memory(
-                content=f"ผู้ใช้: {user_input}\nตอบ: {response_data['response']}",
-                metadata={
-                    "type": "conversation",
-                    "timestamp": self._get_timestamp(),
-                    "complexity": complexity_score
-                }
-            )
+            # 4. บันทึกความจำ และ 5. บันทึกประวัติการสนทนา
+            self._remember(user_input, response_data, complexity_score)
             
-            # 5. บันทึกประวัติการสนทนา
-            self.conversation_history.append({
-                "type": "assistant",
-                "content": response_data['response'],
-                "timestamp": self._get_timestamp()
-            })
+        except Exception as e:
+            response_data["success"] = False
+            response_data["response"] = f"เกิดข้อผิดพลาด: {str(e)}"
+        
+        return response_data
+    
+    async def aprocess(self, user_input: str, use_planning: bool = True) -> Dict[str, Any]:
+        """ประมวลผลคำขอแบบ async (ผลลัพธ์เหมือน process)
+        
+        งานซับซ้อนจะค้นหาความจำไปพร้อมกับการวางแผน และหลาย session ใช้ event loop เดียวกันได้
+        """
+        with self.tracer.trace("aprocess", input_bytes=payload_bytes(user_input)) as trace:
+            response_data = await self._aprocess(user_input, use_planning)
+            trace.root.set(success=response_data["success"])
+        response_data["trace"] = trace.to_dict()
+        await asyncio.to_thread(self.router.record, response_data)
+        return response_data
+    
+    async def _aprocess(self, user_input: str, use_planning: bool) -> Dict[str, Any]:
+        self.conversation_history.append({
+            "type": "user",
+            "content": user_input,
+            "timestamp": self._get_timestamp()
+        })
+        
+        decision = self._route(user_input, use_planning)
+        fast_result = await self._ahandle_fast_task(decision)
+        complexity_score = decision["complexity"]
+        # การค้นหาความจำเป็นงาน CPU/ดิสก์ จึงรันใน thread pool ไปพร้อมกับงานอื่น
+        memory_search = None
+        if fast_result is None:
+            memory_search = asyncio.ensure_future(asyncio.to_thread(self._search_memories, user_input))
+        
+        response_data = self._new_response_data(user_input, complexity_score, [], decision["route"])
+        
+        try:
+            if fast_result is not None:
+                response_data.update(fast_result)
+            elif decision["route"] == "plan":
+                # การวางแผนไม่ต้องใช้ความจำ จึงทำไปพร้อมกับการค้นหา
+                response_data.update(await self._ahandle_complex_task(user_input))
+                response_data["related_memories"] = await memory_search
+            else:
+                response_data["related_memories"] = await memory_search
+                response_data.update(await self._ahandle_simple_task(user_input, response_data["related_memories"]))
+            
+            await asyncio.to_thread(self._remember, user_input, response_data, complexity_score)
             
         except Exception as e:
             response_data["success"] = False
             response_data["response"] = f"เกิดข้อผิดพลาด: {str(e)}"
+        finally:
+            if memory_search is not None and not memory_search.done():
+                memory_search.cancel()
         
         return response_data
     
-    def _assess_complexity(self, task: str) -> float:
-        """ประเมินความซับซ้อนของงาน"""
-        complex_keywords = [
-            'วิเคราะห์', 'เปรียบเทียบ', 'สร้างรายงาน', 'ค้นหา', 
-            'คำนวณ', 'สรุป', 'แปล', 'ตรวจสอบ', 'จัดการ'
-        ]
+    def _search_memories(self, user_input: str) -> List[Dict[str, Any]]:
+        with span("memory_search") as current:
+            options = {"namespace": self.namespace} if self.namespace is not None else {}
+            related_memories = self._locked_memory_call(self._search_memory_dicts, user_input, **options)
+            current.set(results=len(related_memories))
+        return related_memories
+    
+    def _search_memory_dicts(self, user_input: str, **options) -> List[Dict[str, Any]]:
+        # search_memory คืนค่าเป็น view ที่อ้างถึงที่เก็บความจำ (MemoryRecord/SnapshotRecord)
+        # คัดลอกเป็น dict ก่อนปล่อย lock เพื่อให้ response_data เป็นข้อมูลธรรมดา (json.dumps ได้)
+        return [dict(memory) for memory in self.memory.search_memory(user_input, n_results=3, **options)]
+    
+    def _locked_memory_call(self, method, *args, **kwargs):
+        with self._memory_lock:
+            return method(*args, **kwargs)
+    
+    def _remember(self, user_input: str, response_data: Dict[str, Any], complexity_score: float) -> str:
+        """บันทึกความจำและประวัติการสนทนาหลังตอบเสร็จ คืนค่า id ของความจำ"""
+        # ตัดคำตอบที่ยาวก่อนบันทึก เพื่อไม่ให้ context ของคำขอถัดไปโตตาม
+        content = f"ผู้ใช้: {user_input}\nตอบ: {self.context_builder.truncate_answer(response_data['response'])}"
+        metadata = {
+            "type": "conversation",
+            "timestamp": self._get_timestamp(),
+            "complexity": complexity_score
+        }
+        if self.namespace is not None:
+            metadata["namespace"] = self.namespace
+        with span("memory_write", payload_bytes=payload_bytes(content)):
+            memory_id = self._locked_memory_call(self.memory.add_memory, content=content, metadata=metadata)
         
-        score = 0.3  # base score
+        self.conversation_history.append({
+            "type": "assistant",
+            "content": response_data['response'],
+            "timestamp": self._get_timestamp()
+        })
+        self.conversation_history = self.context_builder.compact_history(self.conversation_history)
+        return memory_id
+    
+    def process_stream(self, user_input: str, use_planning: bool = True) -> Iterator[Dict[str, Any]]:
+        """ประมวลผลคำขอแบบ streaming
         
-        # เพิ่มคะแนนตาม keyword
-        for keyword in complex_keywords:
-            if keyword in task:
-                score += 0.2
+        yield {"type": "token", "content": ...} ทีละชิ้นตามที่ LLM ส่งมา แล้วปิดท้ายด้วย
+        {"type": "final", ...} ที่มีข้อมูลเหมือนผลของ process พร้อม memory_id
+        ความจำจะถูกบันทึกเมื่อ stream จบครบเท่านั้น
+        """
+        with self.tracer.trace("process_stream", input_bytes=payload_bytes(user_input)) as trace:
+            for event in self._process_stream(user_input, use_planning):
+                if event["type"] == "final":
+                    final = event
+                    trace.root.set(success=final["success"])
+                else:
+                    yield event
+        final["trace"] = trace.to_dict()
+        self.router.record(final)
+        yield final
+    
+    def _process_stream(self, user_input: str, use_planning: bool) -> Iterator[Dict[str, Any]]:
+        self.conversation_history.append({
+            "type": "user",
+            "content": user_input,
+            "timestamp": self._get_timestamp()
+        })
         
-        # เพิ่มคะแนนตามความยาว
-        if len(task.split()) > 10:
-            score += 0.2
+        decision = self._route(user_input, use_planning)
+        fast_result = self._handle_fast_task(decision)
+        related_memories = [] if fast_result is not None else self._search_memories(user_input)
+        complexity_score = decision["complexity"]
+        response_data = self._new_response_data(user_input, complexity_score, related_memories, decision["route"])
         
-        return min(score, 1.0)
+        try:
+            if fast_result is not None:
+                response_data.update(fast_result)
+                yield {"type": "token", "content": response_data["response"]}
+            elif decision["route"] == "plan":
+                # งานซับซ้อนได้คำตอบเป็นสรุปผลการดำเนินงานทั้งก้อน
+                response_data.update(self._handle_complex_task(user_input, related_memories))
+                yield {"type": "token", "content": response_data["response"]}
+            else:
+                messages = self._simple_task_messages(user_input, related_memories)
+                cached = self._cached_response(messages, user_input)
+                if cached is not None:
+                    yield {"type": "token", "content": cached}
+                    content = cached
+                else:
+                    parts = []
+                    started = time.perf_counter()
+                    with span("llm", purpose="answer", streamed=True,
+                              prompt_bytes=payload_bytes(messages)) as current:
+                        for chunk in self.llm.stream(messages):
+                            if chunk.content:
+                                if not parts:
+                                    current.set(first_token_ms=(time.perf_counter() - started) * 1000)
+                                parts.append(chunk.content)
+                                yield {"type": "token", "content": chunk.content}
+                        content = "".join(parts)
+                        current.set(response_bytes=payload_bytes(content), chunks=len(parts))
+                    self._cache_response(messages, user_input, content, time.perf_counter() - started)
+                response_data.update(self._simple_task_result(content))
+            
+            response_data["memory_id"] = self._remember(user_input, response_data, complexity_score)
+            
+        except Exception as e:
+            response_data["success"] = False
+            response_data["response"] = f"เกิดข้อผิดพลาด: {str(e)}"
+        
+        yield {"type": "final", **response_data}
+    
+    async def aprocess_stream(self, user_input: str, use_planning: bool = True) -> AsyncIterator[Dict[str, Any]]:
+        """process_stream แบบ async (ใช้ llm.astream)"""
+        with self.tracer.trace("aprocess_stream", input_bytes=payload_bytes(user_input)) as trace:
+            async for event in self._aprocess_stream(user_input, use_planning):
+                if event["type"] == "final":
+                    final = event
+                    trace.root.set(success=final["success"])
+                else:
+                    yield event
+        final["trace"] = trace.to_dict()
+        await asyncio.to_thread(self.router.record, final)
+        yield final
+    
+    async def _aprocess_stream(self, user_input: str, use_planning: bool) -> AsyncIterator[Dict[str, Any]]:
+        self.conversation_history.append({
+            "type": "user",
+            "content": user_input,
+            "timestamp": self._get_timestamp()
+        })
+        
+        decision = self._route(user_input, use_planning)
+        fast_result = await self._ahandle_fast_task(decision)
+        related_memories = [] if fast_result is not None else await asyncio.to_thread(self._search_memories, user_input)
+        complexity_score = decision["complexity"]
+        response_data = self._new_response_data(user_input, complexity_score, related_memories, decision["route"])
+        
+        try:
+            if fast_result is not None:
+                response_data.update(fast_result)
+                yield {"type": "token", "content": response_data["response"]}
+            elif decision["route"] == "plan":
+                response_data.update(await self._ahandle_complex_task(user_input))
+                yield {"type": "token", "content": response_data["response"]}
+            else:
+                messages = self._simple_task_messages(user_input, related_memories)
+                cached = self._cached_response(messages, user_input)
+                if cached is not None:
+                    yield {"type": "token", "content": cached}
+                    content = cached
+                else:
+                    parts = []
+                    started = time.perf_counter()
+                    with span("llm", purpose="answer", streamed=True,
+                              prompt_bytes=payload_bytes(messages)) as current:
+                        async for chunk in self.llm.astream(messages):
+                            if chunk.content:
+                                if not parts:
+                                    current.set(first_token_ms=(time.perf_counter() - started) * 1000)
+                                parts.append(chunk.content)
+                                yield {"type": "token", "content": chunk.content}
+                        content = "".join(parts)
+                        current.set(response_bytes=payload_bytes(content), chunks=len(parts))
+                    self._cache_response(messages, user_input, content, time.perf_counter() - started)
+                response_data.update(self._simple_task_result(content))
+            
+            response_data["memory_id"] = await asyncio.to_thread(
+                self._remember, user_input, response_data, complexity_score
+            )
+            
+        except Exception as e:
+            response_data["success"] = False
+            response_data["response"] = f"เกิดข้อผิดพลาด: {str(e)}"
+        
+        yield {"type": "final", **response_data}
+    
+    def _cached_response(self, messages: List, user_input: str):
+        if self.response_cache is None:
+            return None
+        return self.response_cache.get(messages, self.model_name, self.temperature, query=user_input)
+    
+    def _cache_response(self, messages: List, user_input: str, content: str, latency: float):
+        if self.response_cache is not None:
+            self.response_cache.put(messages, self.model_name, self.temperature, content, latency, query=user_input)
+    
+    def _new_response_data(self, user_input: str, complexity_score: float, related_memories: List,
+                           route: str = None) -> Dict[str, Any]:
+        return {
+            "user_input": user_input,
+            "complexity_score": complexity_score,
+            "route": route,
+            "related_memories": related_memories,
+            "response": "",
+            "actions_taken": [],
+            "success": True
+        }
+    
+    def _assess_complexity(self, task: str) -> float:
+        """ประเมินความซับซ้อนของงาน (ความน่าจะเป็นที่ต้องใช้เครื่องมือ/หลายขั้นตอน ตาม router)"""
+        return self.router.predict(task)
+    
+    def _route(self, user_input: str, use_planning: bool) -> Dict[str, Any]:
+        with span("routing") as current:
+            decision = self.router.route(user_input, use_planning)
+            current.set(route=decision["route"], complexity=decision["complexity"])
+        return decision
+    
+    def _handle_fast_task(self, decision: Dict[str, Any]):
+        """ตอบด้วยเครื่องมือโดยตรงโดยไม่เรียก LLM (None = ไม่ใช่เส้นทาง fast หรือเครื่องมือล้มเหลว)"""
+        if decision["route"] != "fast":
+            return None
+        return self._fast_task_result(decision, self.tools.use_tool(decision["tool"], **decision["arguments"]))
+    
+    async def _ahandle_fast_task(self, decision: Dict[str, Any]):
+        if decision["route"] != "fast":
+            return None
+        return self._fast_task_result(decision, await self.tools.ause_tool(decision["tool"], **decision["arguments"]))
+    
+    def _fast_task_result(self, decision: Dict[str, Any], tool_result: Dict[str, Any]):
+        if not tool_result["success"]:
+            # เช่น นิพจน์หารด้วยศูนย์ ให้ LLM ตอบแทน
+            decision["route"] = "direct"
+            return None
+        result = tool_result["result"]
+        if decision["tool"] == "calculator":
+            value = int(result) if isinstance(result, float) and result.is_integer() else result
+            response = f"{decision['arguments']['expression']} = {value}"
+        else:
+            response = f"ขณะนี้เวลา {result}"
+        return {
+            "response": response,
+            "actions_taken": [f"tool:{decision['tool']}"],
+            "planning_used": False
+        }
     
     def _handle_simple_task(self, user_input: str, related_memories: List) -> Dict[str, Any]:
         """จัดการงานง่าย"""
         
+        # ได้รับคำตอบ (ผ่าน cache หากมี)
+        messages = self._simple_task_messages(user_input, related_memories)
+        with span("llm", purpose="answer", prompt_bytes=payload_bytes(messages)) as current:
+            if self.response_cache is not None:
+                response = self.response_cache.invoke(self.llm, messages, self.model_name, self.temperature, query=user_input)
+            else:
+                response = self.llm.invoke(messages)
+            current.set(response_bytes=payload_bytes(response.content),
+                        cached=getattr(response, 'from_cache', False),
+                        **token_usage(response))
+        
+        return self._simple_task_result(response.content)
+    
+    def _simple_task_messages(self, user_input: str, related_memories: List) -> List:
+        """สร้างข้อความสำหรับงานง่าย (context จากความจำ + คำขอ)"""
+        
         # สร้าง context จากความจำ
         context = self._build_context(related_memories)
         
         # สร้างข้อความ
-        messages = [
-            SystemMessage(content=self.system_prompt.format(
+        return [
+            schema.SystemMessage(content=self.system_prompt.format(
                 tools=", ".join(self.tools.get_available_tools())
             )),
-            HumanMessage(content=f"Context: {context}\n\nคำขอ: {user_input}")
+            schema.HumanMessage(content=f"Context: {context}\n\nคำขอ: {user_input}")
         ]
-        
-        # ได้รับคำตอบ
-        response = self.llm.invoke(messages)
-        
+    
+    def _simple_task_result(self, content: str) -> Dict[str, Any]:
         return {
-            "response": response.content,
+            "response": content,
             "actions_taken": ["direct_response"],
             "planning_used": False
         }
@@ -153,13 +501,18 @@ class AdvancedAgenticAI:
         """จัดการงานซับซ้อน"""
         
         # สร้างแผน
-        plan = self.planner.create_plan(
-            task=user_input,
-            available_tools=self.tools.get_available_tools()
-        )
+        with span("planning") as current:
+            plan = self.planner.create_plan(
+                task=user_input,
+                available_tools=self.tools.get_available_tools()
+            )
+            current.set(steps=len(plan['steps']), from_cache=bool(plan.get('from_cache')))
         
         # ดำเนินการตามแผน
-        execution_result = self.planner.execute_plan(plan, self.tools, self)
+        with span("execute_plan") as current:
+            execution_result = self.planner.execute_plan(plan, self.tools, self)
+            current.set(completed=execution_result['completed'])
+        self.planner.record_result(user_input, execution_result, self.tools.get_available_tools())
         
         # สร้างคำตอบ
         if execution_result['completed']:
@@ -175,16 +528,49 @@ class AdvancedAgenticAI:
             "execution_result": execution_result
         }
     
-    def _build_context(self, memories: List) -> str:
-        """สร้าง context จากความจำ"""
-        if not memories:
-            return "ไม่มีข้อมูลที่เกี่ยวข้องจากอดีต"
+    async def _ahandle_simple_task(self, user_input: str, related_memories: List) -> Dict[str, Any]:
+        """จัดการงานง่ายแบบ async"""
+        messages = self._simple_task_messages(user_input, related_memories)
+        with span("llm", purpose="answer", prompt_bytes=payload_bytes(messages)) as current:
+            if self.response_cache is not None:
+                response = await self.response_cache.ainvoke(self.llm, messages, self.model_name, self.temperature, query=user_input)
+            else:
+                response = await self.llm.ainvoke(messages)
+            current.set(response_bytes=payload_bytes(response.content),
+                        cached=getattr(response, 'from_cache', False),
+                        **token_usage(response))
+        return self._simple_task_result(response.content)
+    
+    async def _ahandle_complex_task(self, user_input: str) -> Dict[str, Any]:
+        """จัดการงานซับซ้อนแบบ async"""
+        with span("planning") as current:
+            plan = await self.planner.acreate_plan(
+                task=user_input,
+                available_tools=self.tools.get_available_tools()
+            )
+            current.set(steps=len(plan['steps']), from_cache=bool(plan.get('from_cache')))
         
-        context_parts = []
-        for memory in memories:
-            context_parts.append(f"- {memory['content']}")
+        with span("execute_plan") as current:
+            execution_result = await self.planner.aexecute_plan(plan, self.tools, self)
+            current.set(completed=execution_result['completed'])
+        self.planner.record_result(user_input, execution_result, self.tools.get_available_tools())
         
-        return "ข้อมูลที่เกี่ยวข้อง:\n" + "\n".join(context_parts)
+        if execution_result['completed']:
+            response = self._summarize_results(execution_result)
+        else:
+            response = f"ไม่สามารถดำเนินการให้เสร็จสิ้นได้ กรุณาดูรายละเอียดในผลการดำเนินงาน"
+        
+        return {
+            "response": response,
+            "actions_taken": ["planning", "execution"],
+            "planning_used": True,
+            "plan": plan,
+            "execution_result": execution_result
+        }
+    
+    def _build_context(self, memories: List) -> str:
+        """สร้าง context จากความจำและประวัติการสนทนา (ไม่นับคำขอปัจจุบัน) ภายใต้งบ token"""
+        return self.context_builder.build(memories, self.conversation_history[:-1])
     
     def _summarize_results(self, execution_result: Dict) -> str:
         """สรุปผลการดำเนินงาน"""
@@ -0,0 +1,176 @@
+# agent/data_tool.py
+from typing import List, Dict, Any, Union
+from collections import OrderedDict
+import ast
+import json
+import os
+import re
+import threading
+
+from .file_store import DATA_DIR, resolve_path
+
+MAX_ROWS = 50
+
+# ฟังก์ชันรวมค่าที่อนุญาตใน aggregations
+AGGREGATIONS = {"sum", "mean", "median", "min", "max", "count", "nunique", "std", "var", "first", "last"}
+# ฟังก์ชันคณิตศาสตร์ที่ pandas.eval รองรับ
+_FUNCTIONS = {
+    "sin", "cos", "tan", "arcsin", "arccos", "arctan", "arctan2", "sinh", "cosh", "tanh",
+    "exp", "expm1", "log", "log10", "log1p", "sqrt", "abs"
+}
+_ALLOWED_NODES = (
+    ast.Module, ast.Expr, ast.Assign, ast.Name, ast.Load, ast.Store, ast.Constant,
+    ast.BinOp, ast.UnaryOp, ast.BoolOp, ast.Compare, ast.Call, ast.List, ast.Tuple,
+    ast.operator, ast.unaryop, ast.boolop, ast.cmpop
+)
+_BACKTICK = re.compile(r'`[^`]*`')
+
+
+class _TableCache:
+    """DataFrame ที่โหลดแล้ว (LRU) ใช้ซ้ำจนกว่าไฟล์จะถูกแก้ไข (mtime/ขนาดเปลี่ยน)"""
+
+    def __init__(self, max_tables: int = 8):
+        self.max_tables = max_tables
+        self._tables: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path: str):
+        stat = os.stat(path)
+        version = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            cached = self._tables.get(path)
+            if cached is not None and cached[0] == version:
+                self._tables.move_to_end(path)
+                return cached[1]
+
+        frame = _read_table(path)
+        with self._lock:
+            self._tables[path] = (version, frame)
+            self._tables.move_to_end(path)
+            while len(self._tables) > self.max_tables:
+                self._tables.popitem(last=False)
+        return frame
+
+
+# cache ต่อ process (แต่ละ worker ของ ToolExecutor มี cache ของตัวเอง)
+_tables = _TableCache()
+
+
+def query_data(filename: str,
+               where: str = None,
+               expressions: List[str] = None,
+               group_by: Union[str, List[str]] = None,
+               aggregations: Dict[str, Union[str, List[str]]] = None,
+               columns: List[str] = None,
+               sort_by: Union[str, List[str]] = None,
+               descending: bool = False,
+               limit: int = MAX_ROWS) -> Dict[str, Any]:
+    """ประมวลผลตาราง CSV/Parquet ใน data/ แบบ vectorized ทั้งคอลัมน์
+
+    ลำดับการทำงาน: where (กรองแถว เช่น "amount > 100 and region == 'north'")
+    -> expressions (สร้างคอลัมน์ใหม่ เช่น "total = price * qty")
+    -> group_by + aggregations (เช่น {"total": ["sum", "mean"]}) หรือ aggregations อย่างเดียว
+    -> columns, sort_by และ limit (จำนวนแถวที่คืน ไม่เกิน MAX_ROWS)
+    """
+    frame = _tables.get(_resolve(filename))
+
+    if where:
+        _check_expression(where)
+        frame = frame.query(where)
+    for expression in expressions or []:
+        _check_expression(expression)
+        if _is_assignment(expression):
+            frame = frame.eval(expression)
+        else:
+            frame = frame.assign(**{expression: frame.eval(expression)})
+
+    aggregations = _check_aggregations(aggregations)
+    if group_by:
+        grouped = frame.groupby(group_by)
+        frame = grouped.agg(aggregations) if aggregations else grouped.size().to_frame("count")
+        if hasattr(frame.columns, "to_flat_index") and frame.columns.nlevels > 1:
+            frame.columns = ["_".join(str(part) for part in column) for column in frame.columns.to_flat_index()]
+        frame = frame.reset_index()
+    elif aggregations:
+        summary = frame.agg(aggregations)
+        return {"result": json.loads(summary.to_json(force_ascii=False, date_format="iso"))}
+
+    if columns:
+        frame = frame[list(columns)]
+    if sort_by:
+        frame = frame.sort_values(sort_by, ascending=not descending)
+
+    limit = max(0, min(limit or MAX_ROWS, MAX_ROWS))
+    return {
+        "columns": [str(column) for column in frame.columns],
+        "rows": json.loads(frame.head(limit).to_json(orient="records", force_ascii=False, date_format="iso")),
+        "row_count": len(frame)
+    }
+
+
+def describe_data(filename: str) -> Dict[str, Any]:
+    """ชื่อคอลัมน์ ชนิดข้อมูล จำนวนแถว และตัวอย่าง 5 แถวแรก"""
+    frame = _tables.get(_resolve(filename))
+    return {
+        "columns": {str(column): str(dtype) for column, dtype in frame.dtypes.items()},
+        "row_count": len(frame),
+        "sample": json.loads(frame.head(5).to_json(orient="records", force_ascii=False, date_format="iso"))
+    }
+
+
+def _resolve(filename: str) -> str:
+    """path ของไฟล์ใน data/ (ห้ามออกนอกโฟลเดอร์)"""
+    return resolve_path(filename, DATA_DIR)
+
+
+def _read_table(path: str):
+    try:
+        import pandas as pd
+    except ImportError:
+        raise ImportError("ต้องติดตั้ง pandas เพื่อใช้เครื่องมือข้อมูล") from None
+
+    extension = os.path.splitext(path)[1].lower()
+    if extension in (".csv", ".tsv", ".txt"):
+        # memory_map: อ่านผ่าน mmap แทนการคัดลอกไฟล์ผ่าน buffer
+        return pd.read_csv(path, sep="\t" if extension == ".tsv" else ",", memory_map=True)
+    if extension in (".parquet", ".pq"):
+        # pyarrow อ่านคอลัมน์จาก mmap ได้โดยตรง
+        return pd.read_parquet(path, memory_map=True)
+    raise ValueError(f"ไม่รองรับไฟล์ {extension} (ใช้ .csv, .tsv หรือ .parquet)")
+
+
+def _check_expression(expression: str):
+    """อนุญาตเฉพาะคอลัมน์ ตัวเลข/ข้อความ ตัวดำเนินการ และฟังก์ชันคณิตศาสตร์ (ไม่มี attribute หรือ @ตัวแปร)"""
+    # ชื่อคอลัมน์ในเครื่องหมาย ` ` (มีช่องว่าง) ถือเป็นชื่อธรรมดา
+    text = _BACKTICK.sub("column", expression)
+    if "@" in text:
+        # @ใน pandas.eval คือการอ้างตัวแปรภายในฟังก์ชัน
+        raise ValueError("ไม่อนุญาตการอ้างตัวแปรด้วย @")
+    try:
+        tree = ast.parse(text.strip(), mode="exec")
+    except SyntaxError:
+        raise ValueError(f"รูปแบบนิพจน์ไม่ถูกต้อง: {expression}") from None
+    if len(tree.body) != 1:
+        raise ValueError("หนึ่งรายการต้องมีหนึ่งนิพจน์")
+    for node in ast.walk(tree):
+        if not isinstance(node, _ALLOWED_NODES):
+            raise ValueError(f"ไม่รองรับ {type(node).__name__} ในนิพจน์")
+        if isinstance(node, ast.Name) and node.id.startswith("__"):
+            raise ValueError(f"ไม่อนุญาตชื่อ {node.id}")
+        if isinstance(node, ast.Call) and not (
+                isinstance(node.func, ast.Name) and node.func.id in _FUNCTIONS and not node.keywords):
+            raise ValueError("เรียกได้เฉพาะฟังก์ชันคณิตศาสตร์")
+
+
+def _is_assignment(expression: str) -> bool:
+    return isinstance(ast.parse(_BACKTICK.sub("column", expression).strip()).body[0], ast.Assign)
+
+
+def _check_aggregations(aggregations: Dict[str, Any]) -> Dict[str, Any]:
+    if not aggregations:
+        return {}
+    for column, functions in aggregations.items():
+        for function in ([functions] if isinstance(functions, str) else functions):
+            if function not in AGGREGATIONS:
+                raise ValueError(f"ไม่รองรับการรวมค่า {function} (ใช้ได้: {', '.join(sorted(AGGREGATIONS))})")
+    return aggregations
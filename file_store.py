@@ -0,0 +1,326 @@
+# agent/file_store.py
+from .persistence import atomic_write
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+from array import array
+from collections import OrderedDict
+from contextlib import contextmanager
+import atexit
+import mmap
+import os
+import re
+import threading
+import time
+
+DATA_DIR = "data"
+# ขนาดข้อความที่ grep ถอดรหัสต่อครั้ง (ขยายถึงท้ายบรรทัด)
+GREP_CHUNK_SIZE = 1 << 20
+MAX_LINE_CHARS = 500
+
+
+def resolve_path(filename: str, base_dir: str = DATA_DIR) -> str:
+    """path จริงของไฟล์ใน base_dir (ห้ามออกนอกโฟลเดอร์ด้วย .. หรือ symlink)"""
+    base = os.path.realpath(base_dir)
+    path = os.path.realpath(os.path.join(base, filename))
+    if path == base or os.path.commonpath([base, path]) != base:
+        raise ValueError(f"ใช้ได้เฉพาะไฟล์ใน {base_dir}/")
+    return path
+
+
+class FileStore:
+    """อ่าน/เขียนไฟล์ใน data/ สำหรับเครื่องมือ read_file และ save_note
+
+    - ไฟล์เล็ก (ไม่เกิน max_cached_file ไบต์) เก็บเนื้อหาใน LRU cache (รวมไม่เกิน cache_bytes)
+      ใช้ซ้ำจนกว่า mtime/ขนาดเปลี่ยน หลายขั้นตอนของแผนที่อ่านไฟล์เดิมจึงอ่านดิสก์ครั้งเดียว
+    - ไฟล์ใหญ่อ่านผ่าน mmap เฉพาะช่วงที่ต้องการ (เปิด/ปิดในแต่ละครั้ง ไม่ค้าง handle ไว้)
+      ตำแหน่งเริ่มต้นของแต่ละบรรทัดถูก cache ไว้สำหรับการอ่านตามช่วงบรรทัด
+    - อ่านตามช่วงไบต์ (read), ช่วงบรรทัด (read_lines) หรือเฉพาะบรรทัดที่ตรง pattern (grep)
+      ข้อความที่คืนแปลง "\r\n" และ "\r" เป็น "\n" เหมือนการเปิดไฟล์แบบ text (นับบรรทัดตาม "\n")
+    - เขียนแบบ atomic (ไฟล์ชั่วคราว + rename) write_behind=True = คืนค่าทันทีแล้วเขียนใน thread
+      เบื้องหลังภายใน flush_delay วินาที (เขียนไฟล์เดิมซ้ำหลายครั้งจะเขียนดิสก์ครั้งเดียว)
+      การอ่านระหว่างนั้นเห็นเนื้อหาล่าสุดเสมอ การเขียนลงดิสก์ทำทีละครั้ง และเนื้อหาที่ถูกเขียนทับแล้ว
+      (เช่นเขียนตรงระหว่างที่ thread เบื้องหลังกำลังจะเขียนค่าเก่า) จะไม่ถูกเขียนลงดิสก์ทับค่าใหม่
+    """
+
+    def __init__(self,
+                 base_dir: str = DATA_DIR,
+                 cache_bytes: int = 64 * 1024 * 1024,
+                 max_cached_file: int = 4 * 1024 * 1024,
+                 max_line_indexes: int = 8,
+                 write_behind: bool = False,
+                 flush_delay: float = 0.5,
+                 encoding: str = 'utf-8'):
+        self.base_dir = base_dir
+        self.cache_bytes = cache_bytes
+        self.max_cached_file = max_cached_file
+        self.max_line_indexes = max_line_indexes
+        self.write_behind = write_behind
+        self.flush_delay = flush_delay
+        self.encoding = encoding
+
+        self._lock = threading.Lock()
+        # path -> ((mtime_ns, size), bytes)
+        self._contents: "OrderedDict[str, Tuple[Tuple[int, int], bytes]]" = OrderedDict()
+        self._cached_bytes = 0
+        # path -> ((mtime_ns, size), ตำแหน่งเริ่มต้นของแต่ละบรรทัด)
+        self._line_indexes: "OrderedDict[str, Tuple[Tuple[int, int], array]]" = OrderedDict()
+        # เขียนแบบ write-behind: path -> เนื้อหาที่ยังไม่ได้เขียน
+        self._pending: Dict[str, bytes] = {}
+        # path -> เนื้อหาล่าสุดที่กำลังเขียนลงดิสก์ (ทั้งจาก flush และการเขียนตรง)
+        self._flushing: Dict[str, bytes] = {}
+        self._write_lock = threading.Lock()
+        self._pending_changed = threading.Condition(self._lock)
+        self._writer: Optional[threading.Thread] = None
+        self.stats = {"hits": 0, "misses": 0, "mmap_reads": 0, "writes": 0, "deferred_writes": 0,
+                      "write_errors": 0}
+
+    def resolve(self, filename: str) -> str:
+        return resolve_path(filename, self.base_dir)
+
+    # ---------- อ่าน ----------
+
+    def read(self, filename: str, offset: int = 0, length: int = None) -> str:
+        """อ่านข้อความตั้งแต่ไบต์ offset ยาว length ไบต์ (None = ถึงท้ายไฟล์)
+
+        อักขระที่ถูกตัดครึ่งที่ขอบช่วงจะถูกข้าม
+        """
+        with self._view(self.resolve(filename)) as buffer:
+            offset = max(0, int(offset or 0))
+            end = len(buffer) if length is None else min(len(buffer), offset + max(0, int(length)))
+            data = buffer[offset:end]
+        if offset == 0 and length is None:
+            return _universal_newlines(data.decode(self.encoding))
+        return _universal_newlines(data.decode(self.encoding, errors='ignore'))
+
+    def read_lines(self, filename: str, start: int = 1, end: int = None) -> str:
+        """อ่านบรรทัดที่ start ถึง end (นับจาก 1 รวมบรรทัด end, None = ถึงท้ายไฟล์)"""
+        path = self.resolve(filename)
+        with self._view(path) as buffer:
+            starts = self._line_starts(path, buffer)
+            line_count = len(starts) - 1 if starts[-1] == len(buffer) else len(starts)
+            first = max(1, int(start or 1))
+            last = line_count if end is None else min(line_count, int(end))
+            if first > last:
+                return ""
+            begin = starts[first - 1]
+            stop = starts[last] if last < len(starts) else len(buffer)
+            return _universal_newlines(buffer[begin:stop].decode(self.encoding, errors='replace'))
+
+    def grep(self,
+             filename: str,
+             pattern: str,
+             ignore_case: bool = False,
+             max_matches: int = 100) -> Dict[str, Any]:
+        """บรรทัดที่ตรงกับ regular expression (pattern ที่ไม่ใช่ regex ที่ถูกต้องใช้เป็นข้อความธรรมดา)
+
+        คืนค่า {"matches": [{"line": เลขบรรทัด, "text": ข้อความ}], "truncated": พบเกิน max_matches หรือไม่}
+        """
+        flags = re.MULTILINE | (re.IGNORECASE if ignore_case else 0)
+        try:
+            compiled = re.compile(pattern, flags)
+        except re.error:
+            compiled = re.compile(re.escape(pattern), flags)
+
+        matches: List[Dict[str, Any]] = []
+        with self._view(self.resolve(filename)) as buffer:
+            for first_line, text in self._text_chunks(buffer):
+                line, position, last_line = first_line, 0, None
+                for match in compiled.finditer(text):
+                    line += text.count('\n', position, match.start())
+                    position = match.start()
+                    if line == last_line:
+                        continue
+                    last_line = line
+                    line_start = text.rfind('\n', 0, position) + 1
+                    line_end = text.find('\n', position)
+                    content = text[line_start:line_end if line_end != -1 else len(text)].rstrip('\r')
+                    matches.append({"line": line, "text": content[:MAX_LINE_CHARS]})
+                    if len(matches) >= max_matches:
+                        return {"matches": matches, "truncated": True}
+        return {"matches": matches, "truncated": False}
+
+    def _text_chunks(self, buffer) -> Iterator[Tuple[int, str]]:
+        """ถอดรหัสทีละช่วง (จบที่ท้ายบรรทัด) คืนค่า (เลขบรรทัดแรกของช่วง, ข้อความ)"""
+        start, line, size = 0, 1, len(buffer)
+        while start < size:
+            end = min(size, start + GREP_CHUNK_SIZE)
+            if end < size:
+                newline = buffer.find(b'\n', end)
+                end = size if newline == -1 else newline + 1
+            text = buffer[start:end].decode(self.encoding, errors='replace')
+            yield line, text
+            line += text.count('\n')
+            start = end
+
+    @contextmanager
+    def _view(self, path: str) -> Iterator[Any]:
+        """เนื้อหาของไฟล์เป็น bytes (จาก cache/ที่รอเขียน) หรือ mmap สำหรับไฟล์ใหญ่"""
+        with self._lock:
+            pending = self._pending.get(path, self._flushing.get(path))
+        if pending is not None:
+            yield pending
+            return
+
+        stat = os.stat(path)
+        version = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            cached = self._contents.get(path)
+            if cached is not None and cached[0] == version:
+                self._contents.move_to_end(path)
+                self.stats["hits"] += 1
+                content = cached[1]
+            else:
+                self.stats["misses"] += 1
+                content = None
+        if content is not None:
+            yield content
+            return
+
+        if stat.st_size <= self.max_cached_file:
+            with open(path, 'rb') as f:
+                content = f.read()
+            self._cache(path, (stat.st_mtime_ns, len(content)), content)
+            yield content
+            return
+
+        with open(path, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                with self._lock:
+                    self.stats["mmap_reads"] += 1
+                yield mapped
+
+    def _line_starts(self, path: str, buffer) -> array:
+        """ตำแหน่งไบต์ที่เริ่มแต่ละบรรทัด (cache ตาม mtime/ขนาด)"""
+        with self._lock:
+            deferred = path in self._pending or path in self._flushing
+        version = None  # เนื้อหาที่ยังรอเขียนแบบ write-behind ไม่ cache
+        if not deferred:
+            stat = os.stat(path)
+            version = (stat.st_mtime_ns, stat.st_size)
+            with self._lock:
+                cached = self._line_indexes.get(path)
+                if cached is not None and cached[0] == version:
+                    self._line_indexes.move_to_end(path)
+                    return cached[1]
+
+        starts = array('q', [0])
+        find = buffer.find
+        position = find(b'\n')
+        while position != -1:
+            starts.append(position + 1)
+            position = find(b'\n', position + 1)
+        if version is not None and len(buffer) == version[1]:
+            with self._lock:
+                self._line_indexes[path] = (version, starts)
+                self._line_indexes.move_to_end(path)
+                while len(self._line_indexes) > self.max_line_indexes:
+                    self._line_indexes.popitem(last=False)
+        return starts
+
+    def _cache(self, path: str, version: Tuple[int, int], content: bytes):
+        if len(content) > self.max_cached_file:
+            return
+        with self._lock:
+            previous = self._contents.pop(path, None)
+            if previous is not None:
+                self._cached_bytes -= len(previous[1])
+            self._contents[path] = (version, content)
+            self._cached_bytes += len(content)
+            while self._cached_bytes > self.cache_bytes and self._contents:
+                _, (_, evicted) = self._contents.popitem(last=False)
+                self._cached_bytes -= len(evicted)
+
+    # ---------- เขียน ----------
+
+    def write(self, filename: str, content: str, append: bool = False):
+        """เขียนไฟล์แบบ atomic (append=True ต่อท้ายเนื้อหาเดิม)"""
+        path = self.resolve(filename)
+        data = content.encode(self.encoding)
+        if append:
+            try:
+                with self._view(path) as buffer:
+                    data = bytes(buffer) + data
+            except FileNotFoundError:
+                pass
+
+        if not self.write_behind:
+            with self._lock:
+                # แทนที่เนื้อหาที่รอเขียนแบบ write-behind ทั้งหมด
+                self._pending.pop(path, None)
+                self._flushing[path] = data
+            self._write_pending({path: data}, raise_errors=True)
+            return
+        with self._lock:
+            self._pending[path] = data
+            self.stats["deferred_writes"] += 1
+            self._start_writer()
+            self._pending_changed.notify()
+
+    def flush(self):
+        """เขียนทุกไฟล์ที่รอเขียนแบบ write-behind ให้เสร็จ"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._flushing.update(pending)
+        self._write_pending(pending)
+
+    def _write_now(self, path: str, data: bytes):
+        # เรียกภายใต้ self._write_lock
+        atomic_write(path, [data], binary=True)
+        stat = os.stat(path)
+        with self._lock:
+            self.stats["writes"] += 1
+        self._cache(path, (stat.st_mtime_ns, stat.st_size), data)
+
+    def _write_pending(self, pending: Dict[str, bytes], raise_errors: bool = False):
+        for path, data in pending.items():
+            try:
+                with self._write_lock:
+                    with self._lock:
+                        # มีการเขียนที่ใหม่กว่าแล้ว (รอเขียนอยู่หรือเขียนไปแล้ว) ข้ามค่าเก่านี้
+                        superseded = self._flushing.get(path) is not data
+                    if not superseded:
+                        self._write_now(path, data)
+            except Exception as e:
+                if raise_errors:
+                    raise
+                with self._lock:
+                    self.stats["write_errors"] += 1
+                print(f"เขียนไฟล์ {path} ไม่สำเร็จ: {e}")
+            finally:
+                with self._lock:
+                    if self._flushing.get(path) is data:
+                        del self._flushing[path]
+
+    def _start_writer(self):
+        # เรียกภายใต้ self._lock
+        if self._writer is None or not self._writer.is_alive():
+            self._writer = threading.Thread(target=self._write_behind_loop, name="file-store-writer", daemon=True)
+            self._writer.start()
+            atexit.register(self.flush)
+
+    def _write_behind_loop(self):
+        while True:
+            with self._lock:
+                while not self._pending:
+                    self._pending_changed.wait()
+            # รอให้การเขียนไฟล์เดิมที่ตามมาติด ๆ รวมเป็นครั้งเดียว
+            time.sleep(self.flush_delay)
+            self.flush()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+            stats.update({
+                "cached_files": len(self._contents),
+                "cached_bytes": self._cached_bytes,
+                "pending_writes": len(self._pending) + len(self._flushing)
+            })
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+
+def _universal_newlines(text: str) -> str:
+    """แปลงท้ายบรรทัด "\r\n" และ "\r" เป็น "\n" (เหมือน open(..., 'r'))"""
+    if '\r' not in text:
+        return text
+    return text.replace('\r\n', '\n').replace('\r', '\n')
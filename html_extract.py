@@ -0,0 +1,154 @@
+# agent/html_extract.py
+from typing import Dict, AsyncIterable, Iterable, Optional
+from html.parser import HTMLParser
+import codecs
+import re
+
+# แท็กที่ไม่ต้องการข้อความ (ข้ามทั้ง subtree)
+SKIPPED_TAGS = {'script', 'style'}
+# แท็กที่บอกว่าพ้นส่วน <head> แล้ว (ไม่มี <title> ตามมาอีก)
+_BODY_TAGS = {'body', 'p', 'div', 'main', 'article', 'section', 'h1', 'h2', 'h3', 'table', 'ul', 'ol'}
+_TOKENS = re.compile(r'\S+|\s+')
+
+
+class StreamingTextExtractor(HTMLParser):
+    """ดึงข้อความจาก HTML แบบ incremental
+
+    ข้าม subtree ของ script/style, รวมช่องว่างให้เหลือช่องเดียว และหยุดได้ทันที
+    (done) เมื่อได้ข้อความครบ max_chars และผ่าน <title> มาแล้ว
+    """
+
+    def __init__(self, max_chars: int = 5000):
+        super().__init__(convert_charrefs=True)
+        self.max_chars = max_chars
+        self.title: Optional[str] = None
+        self._title_parts = None
+        self._title_done = False
+        self._skip_tag = None
+        self._parts = []
+        self._length = 0
+        self._space = False
+
+    @property
+    def done(self) -> bool:
+        return self._length >= self.max_chars and self._title_done
+
+    @property
+    def text(self) -> str:
+        return ''.join(self._parts)[:self.max_chars]
+
+    def handle_starttag(self, tag, attrs):
+        if self._skip_tag is not None:
+            return
+        if tag in SKIPPED_TAGS:
+            self._skip_tag = tag
+        elif tag == 'title' and self.title is None:
+            self._title_parts = []
+        elif tag in _BODY_TAGS:
+            self._title_done = True
+
+    def handle_endtag(self, tag):
+        if self._skip_tag is not None:
+            if tag == self._skip_tag:
+                self._skip_tag = None
+            return
+        if tag == 'title' and self._title_parts is not None:
+            self.title = ''.join(self._title_parts).strip()
+            self._title_parts = None
+            self._title_done = True
+        elif tag == 'head':
+            self._title_done = True
+
+    def handle_data(self, data):
+        if self._skip_tag is not None:
+            return
+        if self._title_parts is not None:
+            self._title_parts.append(data)
+        if self._length >= self.max_chars:
+            return
+        for match in _TOKENS.finditer(data):
+            piece = match.group()
+            if piece[0].isspace():
+                self._space = True
+                continue
+            if self._space and self._length:
+                self._parts.append(' ')
+                self._length += 1
+            self._space = False
+            self._parts.append(piece)
+            self._length += len(piece)
+            if self._length >= self.max_chars:
+                break
+
+
+def _decoder(encoding: str):
+    try:
+        return codecs.getincrementaldecoder(encoding)(errors='replace')
+    except LookupError:
+        return codecs.getincrementaldecoder('utf-8')(errors='replace')
+
+
+def _result(extractor: StreamingTextExtractor) -> Dict[str, str]:
+    return {'title': extractor.title or 'ไม่มีชื่อ', 'content': extractor.text}
+
+
+def extract_text_streaming(chunks: Iterable[bytes],
+                           encoding: str = 'utf-8',
+                           max_chars: int = 5000) -> Dict[str, str]:
+    """ดึง title และข้อความจาก HTML ที่มาเป็นชิ้น ๆ หยุดอ่านทันทีเมื่อได้ข้อความครบ"""
+    decoder = _decoder(encoding)
+    extractor = StreamingTextExtractor(max_chars=max_chars)
+    for chunk in chunks:
+        extractor.feed(decoder.decode(chunk))
+        if extractor.done:
+            break
+    else:
+        extractor.feed(decoder.decode(b'', final=True))
+        extractor.close()
+
+    return _result(extractor)
+
+
+async def aextract_text_streaming(chunks: AsyncIterable[bytes],
+                                  encoding: str = 'utf-8',
+                                  max_chars: int = 5000) -> Dict[str, str]:
+    """เหมือน extract_text_streaming แต่รับชิ้นข้อมูลแบบ async (เช่นจาก AsyncHttpClient.stream)"""
+    decoder = _decoder(encoding)
+    extractor = StreamingTextExtractor(max_chars=max_chars)
+    async for chunk in chunks:
+        extractor.feed(decoder.decode(chunk))
+        if extractor.done:
+            break
+    else:
+        extractor.feed(decoder.decode(b'', final=True))
+        extractor.close()
+
+    return _result(extractor)
+
+
+def extract_text_soup(content: bytes, max_chars: int = 5000, encoding: str = None) -> Dict[str, str]:
+    """ดึงข้อความด้วย BeautifulSoup ทั้งเอกสาร (วิธีเดิมของ web_scrape)
+
+    encoding: charset จาก Content-Type (None = ให้ bs4 เดาจากเนื้อหา)
+    """
+    # bs4 import นาน และใช้เฉพาะทางนี้ (รันใน worker ของ ToolExecutor)
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(content, 'html.parser', from_encoding=encoding)
+
+    # ลบ script และ style tags
+    for script in soup(["script", "style"]):
+        script.decompose()
+
+    # ดึงข้อความ
+    text = soup.get_text()
+    # ทำความสะอาดข้อความ
+    lines = (line.strip() for line in text.splitlines())
+    chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+    text = ' '.join(chunk for chunk in chunks if chunk)
+
+    # คืนเฉพาะ str ธรรมดา: NavigableString อ้างถึง parse tree ทั้งต้น (pickle กลับจาก process pool ไม่ได้)
+    title = str(soup.title.get_text()).strip() if soup.title else ''
+    return {
+        'title': title or 'ไม่มีชื่อ',
+        'content': str(text[:max_chars])
+    }
@@ -0,0 +1,696 @@
+# agent/http_client.py
+from typing import Dict, Any, AsyncIterator, Iterator, Optional
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+from .lazy import lazy_import
+from .persistence import atomic_write
+
+# requests import นาน (urllib3, ssl, charset_normalizer): import เมื่อสร้าง client หรือใช้งานครั้งแรก
+asyncio = lazy_import("asyncio")
+requests = lazy_import("requests")
+adapters = lazy_import("requests.adapters")
+
+DEFAULT_USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+_CACHE_NAME = re.compile(r'[0-9a-f]{64}$')
+
+
+class CachedResponse:
+    """response แบบเบาที่เก็บใน cache ได้ (มี API คล้าย requests.Response ที่เครื่องมือใช้)"""
+    __slots__ = ('url', 'status_code', 'headers', 'content', 'stored_at', 'expires_at', 'from_cache')
+
+    def __init__(self,
+                 url: str,
+                 status_code: int,
+                 headers: Dict[str, str],
+                 content: bytes,
+                 stored_at: float = None,
+                 expires_at: float = 0.0,
+                 from_cache: bool = False):
+        self.url = url
+        self.status_code = status_code
+        self.headers = {key.lower(): value for key, value in headers.items()}
+        self.content = content
+        self.stored_at = stored_at or time.time()
+        self.expires_at = expires_at
+        self.from_cache = from_cache
+
+    @property
+    def encoding(self) -> str:
+        match = re.search(r'charset=([\w-]+)', self.headers.get('content-type', ''), re.I)
+        return match.group(1) if match else 'utf-8'
+
+    @property
+    def text(self) -> str:
+        try:
+            return self.content.decode(self.encoding, errors='replace')
+        except LookupError:
+            return self.content.decode('utf-8', errors='replace')
+
+    def json(self) -> Any:
+        return json.loads(self.text)
+
+    @property
+    def fresh(self) -> bool:
+        return time.time() < self.expires_at
+
+    def to_meta(self) -> Dict[str, Any]:
+        return {
+            'url': self.url,
+            'status_code': self.status_code,
+            'headers': self.headers,
+            'stored_at': self.stored_at,
+            'expires_at': self.expires_at
+        }
+
+
+class HttpCache:
+    """cache ของ response: LRU ในหน่วยความจำ (จำกัดจำนวนและขนาด) + ไฟล์บนดิสก์ (ถ้าระบุ directory)
+
+    บนดิสก์แต่ละรายการเป็นไฟล์คู่ <sha256>.body/.json จำกัดด้วย max_disk_entries และ max_disk_bytes
+    เกินแล้วลบคู่ที่เขียนไว้นานที่สุดก่อน (ลำดับเริ่มต้นจาก mtime ของไฟล์ที่มีอยู่แล้ว)
+    """
+
+    def __init__(self,
+                 max_entries: int = 256,
+                 max_bytes: int = 32 * 1024 * 1024,
+                 directory: str = None,
+                 max_disk_entries: int = 2048,
+                 max_disk_bytes: int = 256 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.max_disk_entries = max_disk_entries
+        self.max_disk_bytes = max_disk_bytes
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._bytes = 0
+        # ชื่อไฟล์ (sha256 ของ key) -> ขนาดรวมของไฟล์คู่บนดิสก์ เรียงจากเขียนนานที่สุด
+        self._disk: "OrderedDict[str, int]" = OrderedDict()
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self._scan_disk()
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        with self._lock:
+            response = self._entries.get(key)
+            if response is not None:
+                self._entries.move_to_end(key)
+                return response
+
+        response = self._load(key)
+        if response is not None:
+            self._remember(key, response)
+        return response
+
+    def put(self, key: str, response: CachedResponse):
+        self._remember(key, response)
+        if self.directory:
+            name = self._name(key)
+            path = os.path.join(self.directory, name)
+            meta = json.dumps(response.to_meta())
+            atomic_write(path + '.body', [response.content], binary=True)
+            atomic_write(path + '.json', [meta])
+            self._remember_disk(name, len(response.content) + len(meta.encode('utf-8')))
+
+    def clear(self):
+        """ล้างทั้งในหน่วยความจำและบนดิสก์"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            names = list(self._disk)
+            self._disk.clear()
+            self._disk_bytes = 0
+        self._remove_files(names)
+
+    def _remember(self, key: str, response: CachedResponse):
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous.content)
+            self._entries[key] = response
+            self._bytes += len(response.content)
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted.content)
+
+    def _remember_disk(self, name: str, size: int):
+        evicted = []
+        with self._lock:
+            self._disk_bytes += size - self._disk.pop(name, 0)
+            self._disk[name] = size
+            while self._disk and (len(self._disk) > self.max_disk_entries or self._disk_bytes > self.max_disk_bytes):
+                oldest, oldest_size = self._disk.popitem(last=False)
+                self._disk_bytes -= oldest_size
+                evicted.append(oldest)
+        self._remove_files(evicted)
+
+    def _remove_files(self, names):
+        for name in names:
+            path = os.path.join(self.directory, name)
+            # ลบ .json ก่อน: _load ต้องอ่าน .json ได้จึงจะใช้ .body
+            for suffix in ('.json', '.body'):
+                try:
+                    os.unlink(path + suffix)
+                except FileNotFoundError:
+                    pass
+
+    def _scan_disk(self):
+        """สร้างรายการไฟล์บนดิสก์จากโฟลเดอร์ (ไฟล์จากการรันครั้งก่อน) แล้วตัดให้อยู่ในขีดจำกัด"""
+        found = []
+        for entry in os.scandir(self.directory):
+            name, suffix = os.path.splitext(entry.name)
+            if suffix != '.json' or not _CACHE_NAME.match(name):
+                continue
+            try:
+                size = entry.stat().st_size + os.path.getsize(os.path.join(self.directory, name + '.body'))
+            except OSError:
+                continue
+            found.append((entry.stat().st_mtime_ns, name, size))
+        for _, name, size in sorted(found):
+            self._remember_disk(name, size)
+
+    def _load(self, key: str) -> Optional[CachedResponse]:
+        if not self.directory:
+            return None
+        path = self._path(key)
+        try:
+            with open(path + '.json', 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            with open(path + '.body', 'rb') as f:
+                content = f.read()
+        except (OSError, ValueError):
+            return None
+        return CachedResponse(content=content, **meta)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, self._name(key))
+
+    def _name(self, key: str) -> str:
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+class _CachingClient:
+    """ส่วนที่ HttpClient และ AsyncHttpClient ใช้ร่วมกัน: นโยบาย cache และสถิติ"""
+
+    def __init__(self, cache: HttpCache = None, default_ttl: float = 300.0, timeout: float = 15.0):
+        self.cache = cache if cache is not None else HttpCache()
+        self.default_ttl = default_ttl
+        self.timeout = timeout
+        self._lock = threading.Lock()
+
+        self.metrics = {
+            "requests": 0,
+            "cache_hits": 0,
+            "cache_misses": 0,
+            "revalidated": 0,
+            "bytes_downloaded": 0,
+            "errors": 0
+        }
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """สถิติการใช้งาน (รวมอัตรา cache hit)"""
+        with self._lock:
+            metrics = dict(self.metrics)
+        lookups = metrics["cache_hits"] + metrics["cache_misses"] + metrics["revalidated"]
+        metrics["hit_rate"] = (metrics["cache_hits"] + metrics["revalidated"]) / lookups if lookups else 0.0
+        return metrics
+
+    def _lookup(self, url: str, params: Dict[str, Any], use_cache: bool):
+        """คืนค่า (url เต็ม, response ใน cache หรือ None)"""
+        if params:
+            url = requests.Request('GET', url, params=params).prepare().url
+        return url, (self.cache.get(url) if use_cache else None)
+
+    def _fresh_hit(self, cached: Optional[CachedResponse]) -> bool:
+        if cached is not None and cached.fresh:
+            self._count("cache_hits")
+            cached.from_cache = True
+            return True
+        return False
+
+    def _conditional_headers(self, cached: Optional[CachedResponse], headers: Dict[str, str]) -> Dict[str, str]:
+        request_headers = dict(headers or {})
+        if cached is not None:
+            if 'etag' in cached.headers:
+                request_headers['If-None-Match'] = cached.headers['etag']
+            if 'last-modified' in cached.headers:
+                request_headers['If-Modified-Since'] = cached.headers['last-modified']
+        return request_headers
+
+    def _revalidated(self, url: str, cached: CachedResponse, headers) -> CachedResponse:
+        # เนื้อหาไม่เปลี่ยน ต่ออายุ cache เดิม
+        self._count("revalidated")
+        refreshed = CachedResponse(
+            url=url,
+            status_code=cached.status_code,
+            headers={**cached.headers, **headers},
+            content=cached.content,
+            expires_at=time.time() + self._ttl(headers)
+        )
+        self.cache.put(url, refreshed)
+        refreshed.from_cache = True
+        return refreshed
+
+    def _store(self, url: str, status_code: int, headers, content: bytes, use_cache: bool) -> CachedResponse:
+        self._count("cache_misses")
+        self._count("bytes_downloaded", len(content))
+        result = CachedResponse(
+            url=url,
+            status_code=status_code,
+            headers=dict(headers),
+            content=content
+        )
+        if use_cache and status_code == 200 and self._cacheable(headers):
+            result.expires_at = time.time() + self._ttl(headers)
+            self.cache.put(url, result)
+        return result
+
+    def _store_streamed(self, url: str, status_code: int, headers, content: bytes):
+        """เก็บ body ที่ stream มาครบถึง EOF ลง cache (นับ cache miss และจำนวนไบต์ไว้แล้วตอน stream)"""
+        response = CachedResponse(
+            url=url,
+            status_code=status_code,
+            headers=dict(headers),
+            content=content,
+            expires_at=time.time() + self._ttl(headers)
+        )
+        self.cache.put(url, response)
+
+    def _stream_cacheable(self, status_code: int, headers) -> bool:
+        return status_code == 200 and self._cacheable(headers)
+
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            self.metrics[name] += amount
+
+    def _cacheable(self, headers) -> bool:
+        cache_control = headers.get('Cache-Control', '').lower()
+        return 'no-store' not in cache_control and 'private' not in cache_control
+
+    def _ttl(self, headers) -> float:
+        """อายุของ cache จาก Cache-Control: max-age หรือ Expires (ไม่มีใช้ default_ttl)"""
+        cache_control = headers.get('Cache-Control', '').lower()
+        if 'no-cache' in cache_control:
+            return 0.0
+        match = re.search(r'max-age=(\d+)', cache_control)
+        if match:
+            return float(match.group(1))
+        if headers.get('Expires'):
+            try:
+                from email.utils import parsedate_to_datetime
+                return max(0.0, parsedate_to_datetime(headers['Expires']).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+        return self.default_ttl
+
+
+class HttpClient(_CachingClient):
+    """HTTP client ที่ใช้ร่วมกันของเครื่องมือ: connection pool, cache (TTL + ETag/Last-Modified),
+    จำกัดจำนวน request พร้อมกันต่อ host และเก็บสถิติการใช้ cache"""
+
+    def __init__(self,
+                 pool_connections: int = 10,
+                 pool_maxsize: int = 20,
+                 per_host_limit: int = 4,
+                 cache: HttpCache = None,
+                 default_ttl: float = 300.0,
+                 timeout: float = 15.0,
+                 user_agent: str = DEFAULT_USER_AGENT):
+        super().__init__(cache, default_ttl, timeout)
+        self.session = requests.Session()
+        adapter = adapters.HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers['User-Agent'] = user_agent
+
+        self.per_host_limit = per_host_limit
+        self._host_slots: Dict[str, threading.BoundedSemaphore] = {}
+
+    def get(self,
+            url: str,
+            params: Dict[str, Any] = None,
+            headers: Dict[str, str] = None,
+            timeout: float = None,
+            use_cache: bool = True) -> CachedResponse:
+        """GET พร้อม cache: fresh -> คืนจาก cache, stale -> ส่ง conditional request"""
+        url, cached = self._lookup(url, params, use_cache)
+        if self._fresh_hit(cached):
+            return cached
+
+        request_headers = self._conditional_headers(cached, headers)
+        with self._host_slot(url):
+            self._count("requests")
+            try:
+                response = self.session.get(url, headers=request_headers, timeout=timeout or self.timeout)
+            except requests.RequestException:
+                self._count("errors")
+                raise
+
+        if cached is not None and response.status_code == 304:
+            return self._revalidated(url, cached, response.headers)
+        return self._store(url, response.status_code, response.headers, response.content, use_cache)
+
+    def stream(self,
+               url: str,
+               max_bytes: int = 2 * 1024 * 1024,
+               chunk_size: int = 16 * 1024,
+               headers: Dict[str, str] = None,
+               timeout: float = None) -> 'StreamedBody':
+        """เปิด body แบบอ่านทีละชิ้นไม่เกิน max_bytes (ใช้ cache หากยังสด)
+
+        ใช้กับ with: ผู้เรียกหยุดอ่านกลางทางได้ และการเชื่อมต่อจะถูกปิดเมื่อออกจาก with
+        body ที่อ่านครบถึง EOF ภายใน max_bytes ถูกเก็บลง cache (ดู StreamedBody.finish)
+        response ที่ยาวเกิน max_bytes หรือถูกยกเลิกเพราะเกิด exception จะไม่ถูกเก็บ
+        cache ที่หมดอายุแล้วส่ง conditional request (ETag/Last-Modified) ได้ 304 = ใช้ body เดิม
+        """
+        cached = self.cache.get(url)
+        if cached is not None and cached.fresh:
+            self._count("cache_hits")
+            return StreamedBody(self, cached.status_code, cached.headers, cached=cached,
+                                max_bytes=max_bytes, chunk_size=chunk_size)
+
+        slot = self._host_slot(url)
+        slot.acquire()
+        self._count("requests")
+        try:
+            response = self.session.get(url, headers=self._conditional_headers(cached, headers),
+                                        timeout=timeout or self.timeout, stream=True)
+        except requests.RequestException:
+            slot.release()
+            self._count("errors")
+            raise
+        if cached is not None and response.status_code == 304:
+            response.close()
+            slot.release()
+            refreshed = self._revalidated(url, cached, response.headers)
+            return StreamedBody(self, refreshed.status_code, refreshed.headers, cached=refreshed,
+                                max_bytes=max_bytes, chunk_size=chunk_size)
+        self._count("cache_misses")
+        return StreamedBody(self, response.status_code, response.headers, response=response, slot=slot,
+                            max_bytes=max_bytes, chunk_size=chunk_size, url=url)
+
+    def close(self):
+        self.session.close()
+
+    def _host_slot(self, url: str) -> threading.BoundedSemaphore:
+        host = urlsplit(url).netloc
+        with self._lock:
+            slot = self._host_slots.get(host)
+            if slot is None:
+                slot = self._host_slots[host] = threading.BoundedSemaphore(self.per_host_limit)
+        return slot
+
+
+class StreamedBody:
+    """body ของ response ที่อ่านทีละชิ้น (สร้างจาก HttpClient.stream)
+
+    ชิ้นที่อ่านแล้วถูกเก็บไว้ใน buffer (เฉพาะ response ที่ cache ได้) เมื่ออ่านถึง EOF ภายใน max_bytes
+    จึงเก็บลง cache หากผู้เรียกหยุดอ่านก่อน finish() จะอ่านส่วนที่เหลือให้ เมื่อ Content-Length ไม่เกิน max_bytes
+    """
+
+    def __init__(self,
+                 client: _CachingClient,
+                 status_code: int,
+                 headers,
+                 response=None,
+                 cached: CachedResponse = None,
+                 slot: threading.BoundedSemaphore = None,
+                 max_bytes: int = 2 * 1024 * 1024,
+                 chunk_size: int = 16 * 1024,
+                 url: str = None):
+        self.headers = {key.lower(): value for key, value in headers.items()}
+        self.status_code = status_code
+        self.from_cache = cached is not None
+        self._client = client
+        self._response = response
+        self._cached = cached
+        self._slot = slot
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+
+        self._url = url
+        self._raw_headers = headers
+        self._chunks = None
+        self._received = 0
+        self._truncated = False
+        cacheable = response is not None and url is not None and client._stream_cacheable(status_code, headers)
+        self._buffer: Optional[list] = [] if cacheable else None
+
+    @property
+    def encoding(self) -> str:
+        match = re.search(r'charset=([\w-]+)', self.headers.get('content-type', ''), re.I)
+        return match.group(1) if match else 'utf-8'
+
+    def __iter__(self) -> Iterator[bytes]:
+        if self._cached is not None:
+            content = self._cached.content[:self.max_bytes]
+            for start in range(0, len(content), self.chunk_size):
+                yield content[start:start + self.chunk_size]
+            return
+
+        # generator เดียวตลอดอายุของ body (ผู้เรียกหยุดกลางทางแล้ว finish() อ่านต่อจากเดิมได้)
+        if self._chunks is None:
+            self._chunks = self._read()
+        for chunk in self._chunks:
+            yield chunk
+
+    def _read(self) -> Iterator[bytes]:
+        for chunk in self._response.iter_content(chunk_size=self.chunk_size):
+            chunk = self._take(chunk)
+            if chunk:
+                yield chunk
+            if self._truncated:
+                return
+        self._complete()
+
+    def _take(self, chunk: bytes) -> bytes:
+        """นับและเก็บชิ้นที่อ่านได้ (ส่วนที่เกิน max_bytes ถูกตัด และไม่เก็บลง cache)"""
+        allowed = self.max_bytes - self._received
+        if len(chunk) > allowed:
+            chunk = chunk[:allowed]
+            self._truncated = True
+            self._buffer = None
+        self._received += len(chunk)
+        self._client._count("bytes_downloaded", len(chunk))
+        if self._buffer is not None:
+            self._buffer.append(chunk)
+        return chunk
+
+    def _complete(self):
+        """อ่านถึง EOF แล้ว: เก็บ body ทั้งหมดลง cache"""
+        if self._buffer is not None:
+            content, self._buffer = b''.join(self._buffer), None
+            self._client._store_streamed(self._url, self.status_code, self._raw_headers, content)
+
+    def _should_finish(self) -> bool:
+        """อ่านส่วนที่เหลือเพื่อเก็บลง cache หรือไม่ (ต้องรู้ขนาดล่วงหน้าและไม่เกิน max_bytes)"""
+        if self._buffer is None:
+            return False
+        try:
+            return int(self.headers.get('content-length', '')) <= self.max_bytes
+        except ValueError:
+            return False
+
+    def finish(self):
+        """อ่านส่วนที่เหลือของ body ที่ cache ได้ให้ครบ แล้วเก็บลง cache"""
+        if self._response is None or not self._should_finish():
+            return
+        try:
+            for _ in self:
+                pass
+        except Exception:
+            # เก็บลง cache ไม่ได้ แต่ผู้เรียกได้ข้อมูลที่ต้องการไปแล้ว
+            self._buffer = None
+            self._client._count("errors")
+
+    def close(self):
+        if self._response is not None:
+            self._response.close()
+            self._response = None
+        if self._slot is not None:
+            self._slot.release()
+            self._slot = None
+
+    def __enter__(self) -> 'StreamedBody':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            if exc_type is None:
+                self.finish()
+        finally:
+            self.close()
+
+
+class AsyncStreamedBody(StreamedBody):
+    """body ของ response แบบ aiohttp ที่อ่านทีละชิ้น (ใช้ async for)"""
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        if self._cached is not None:
+            for chunk in self.__iter__():
+                yield chunk
+            return
+
+        if self._chunks is None:
+            self._chunks = self._aread()
+        async for chunk in self._chunks:
+            yield chunk
+
+    async def _aread(self) -> AsyncIterator[bytes]:
+        async for chunk in self._response.content.iter_chunked(self.chunk_size):
+            chunk = self._take(chunk)
+            if chunk:
+                yield chunk
+            if self._truncated:
+                return
+        self._complete()
+
+    async def afinish(self):
+        """finish แบบ async"""
+        if self._response is None or not self._should_finish():
+            return
+        try:
+            async for _ in self:
+                pass
+        except Exception:
+            self._buffer = None
+            self._client._count("errors")
+
+
+async def _close_on_shutdown(session):
+    """ค้างไว้จน event loop เรียก shutdown_asyncgens() (ตอนจบ asyncio.run) แล้วปิด session ใน loop นั้น"""
+    try:
+        yield
+    finally:
+        await session.close()
+
+
+class AsyncHttpClient(_CachingClient):
+    """HTTP client แบบ asyncio (aiohttp) ใช้ HttpCache ร่วมกับ HttpClient ได้
+
+    จำกัดจำนวนการเชื่อมต่อพร้อมกันต่อ host ด้วย connector ของ aiohttp
+    session ถูกสร้างเมื่อใช้ครั้งแรกในแต่ละ event loop ที่กำลังทำงาน และถูกปิดเมื่อ event loop นั้นปิด
+    (asyncio.run เรียก shutdown_asyncgens) หรือเมื่อเรียก close() ใน event loop เดียวกัน
+    """
+
+    def __init__(self,
+                 pool_maxsize: int = 100,
+                 per_host_limit: int = 4,
+                 cache: HttpCache = None,
+                 default_ttl: float = 300.0,
+                 timeout: float = 15.0,
+                 user_agent: str = DEFAULT_USER_AGENT):
+        super().__init__(cache, default_ttl, timeout)
+        self.pool_maxsize = pool_maxsize
+        self.per_host_limit = per_host_limit
+        self.user_agent = user_agent
+        # event loop -> (ClientSession, async generator ที่ปิด session เมื่อ event loop ปิด)
+        self._sessions: Dict[Any, tuple] = {}
+
+    async def get(self,
+                  url: str,
+                  params: Dict[str, Any] = None,
+                  headers: Dict[str, str] = None,
+                  timeout: float = None,
+                  use_cache: bool = True) -> CachedResponse:
+        """GET พร้อม cache (ทำงานเหมือน HttpClient.get)"""
+        url, cached = self._lookup(url, params, use_cache)
+        if self._fresh_hit(cached):
+            return cached
+
+        session = await self._session_for_loop()
+        self._count("requests")
+        try:
+            async with session.get(url,
+                                   headers=self._conditional_headers(cached, headers),
+                                   timeout=self._timeout(timeout)) as response:
+                content = await response.read()
+        except Exception:
+            self._count("errors")
+            raise
+
+        if cached is not None and response.status == 304:
+            return self._revalidated(url, cached, response.headers)
+        return self._store(url, response.status, response.headers, content, use_cache)
+
+    @asynccontextmanager
+    async def stream(self,
+                     url: str,
+                     max_bytes: int = 2 * 1024 * 1024,
+                     chunk_size: int = 16 * 1024,
+                     headers: Dict[str, str] = None,
+                     timeout: float = None) -> AsyncIterator[AsyncStreamedBody]:
+        """เปิด body แบบอ่านทีละชิ้น (ใช้กับ async with) เหมือน HttpClient.stream"""
+        cached = self.cache.get(url)
+        if cached is not None and cached.fresh:
+            self._count("cache_hits")
+            yield AsyncStreamedBody(self, cached.status_code, cached.headers, cached=cached,
+                                    max_bytes=max_bytes, chunk_size=chunk_size)
+            return
+
+        session = await self._session_for_loop()
+        self._count("requests")
+        try:
+            response = await session.get(url, headers=self._conditional_headers(cached, headers),
+                                         timeout=self._timeout(timeout))
+        except Exception:
+            self._count("errors")
+            raise
+        if cached is not None and response.status == 304:
+            response.release()
+            refreshed = self._revalidated(url, cached, response.headers)
+            yield AsyncStreamedBody(self, refreshed.status_code, refreshed.headers, cached=refreshed,
+                                    max_bytes=max_bytes, chunk_size=chunk_size)
+            return
+        self._count("cache_misses")
+        body = AsyncStreamedBody(self, response.status, response.headers, response=response,
+                                 max_bytes=max_bytes, chunk_size=chunk_size, url=url)
+        try:
+            yield body
+            await body.afinish()
+        finally:
+            # อ่านไม่ครบจึงปิดการเชื่อมต่อแทนการคืนเข้า pool
+            response.close()
+
+    async def close(self):
+        """ปิด session ของ event loop ปัจจุบัน (และที่ค้างจาก event loop ที่ปิดไปแล้ว)"""
+        entry = self._sessions.pop(asyncio.get_running_loop(), None)
+        if entry is not None:
+            await entry[1].aclose()
+        await self._close_stale_sessions()
+
+    async def _session_for_loop(self):
+        import aiohttp
+
+        loop = asyncio.get_running_loop()
+        entry = self._sessions.get(loop)
+        if entry is None or entry[0].closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_maxsize, limit_per_host=self.per_host_limit)
+            session = aiohttp.ClientSession(connector=connector, headers={'User-Agent': self.user_agent})
+            guard = _close_on_shutdown(session)
+            await guard.__anext__()
+            self._sessions[loop] = (session, guard)
+            await self._close_stale_sessions()
+            return session
+        return entry[0]
+
+    async def _close_stale_sessions(self):
+        # event loop ที่ปิดโดยไม่เรียก shutdown_asyncgens (เช่น loop.close() เอง): ปิด session ที่ค้างอยู่
+        for loop in [loop for loop in self._sessions if loop.is_closed()]:
+            entry = self._sessions.pop(loop, None)
+            if entry is not None and not entry[0].closed:
+                await entry[0].close()
+
+    def _timeout(self, timeout: float = None):
+        import aiohttp
+
+        return aiohttp.ClientTimeout(total=timeout or self.timeout)
@@ -0,0 +1,74 @@
+# agent/lazy.py
+from typing import Any, Callable
+import importlib
+import threading
+
+
+class LazyModule:
+    """โมดูลที่ import จริงเมื่อเข้าถึง attribute ครั้งแรก
+
+    ใช้กับ dependency ที่ import ช้า (requests, bs4, langchain, asyncio) เพื่อให้
+    import agent.core เร็ว โดยยังเขียนโค้ดแบบ module.attribute ได้เหมือนเดิม
+    """
+
+    def __init__(self, name: str, package: str = None):
+        self._name = name
+        self._package = package
+        self._module = None
+
+    def __getattr__(self, attribute: str) -> Any:
+        module = self._module
+        if module is None:
+            # import_module ป้องกันการ import ซ้อนกันจากหลาย thread อยู่แล้ว
+            module = self._module = importlib.import_module(self._name, self._package)
+        return getattr(module, attribute)
+
+    @property
+    def loaded(self) -> bool:
+        return self._module is not None
+
+    def __repr__(self) -> str:
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module {self._name} ({state})>"
+
+
+def lazy_import(name: str, package: str = None) -> LazyModule:
+    """import แบบเลื่อนไปจนกว่าจะใช้งาน (ชื่อแบบ relative เช่น ".calculator" ต้องระบุ package)"""
+    return LazyModule(name, package)
+
+
+class LazyObject:
+    """สร้างวัตถุจริงด้วย factory() เมื่อถูกใช้งานครั้งแรก แล้วส่งต่อทุก attribute และการเรียก
+
+    ใช้กับ LLM client: การสร้าง agent ไม่ต้อง import langchain_openai หรืออ่าน API key
+    จนกว่าจะเรียก LLM ครั้งแรก
+    """
+
+    def __init__(self, factory: Callable[[], Any]):
+        self._factory = factory
+        self._instance = None
+        self._lock = threading.Lock()
+
+    def resolve(self) -> Any:
+        instance = self._instance
+        if instance is None:
+            with self._lock:
+                if self._instance is None:
+                    self._instance = self._factory()
+                instance = self._instance
+        return instance
+
+    @property
+    def loaded(self) -> bool:
+        return self._instance is not None
+
+    def __getattr__(self, attribute: str) -> Any:
+        return getattr(self.resolve(), attribute)
+
+    def __call__(self, *args, **kwargs) -> Any:
+        return self.resolve()(*args, **kwargs)
+
+    def __repr__(self) -> str:
+        if self._instance is None:
+            return "<lazy object (not created)>"
+        return repr(self._instance)
@@ -0,0 +1,243 @@
+# agent/llm_cache.py
+from typing import List, Dict, Any, Optional
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+from .persistence import atomic_write
+from .simple_memory import SimpleVectorMemory
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+class CachedMessage:
+    """คำตอบที่ได้จาก cache (มี .content เหมือนข้อความจาก LLM)"""
+
+    def __init__(self, content: str):
+        self.content = content
+        self.from_cache = True
+
+
+class LLMResponseCache:
+    """cache คำตอบของ LLM ตาม prompt ที่ normalize แล้ว + ชื่อโมเดล + temperature
+
+    - ตรงทุกตัวอักษร: key คือ hash ของข้อความทั้งหมด (ช่องว่าง/ตัวพิมพ์ไม่มีผล)
+    - ใกล้เคียง (ถ้ากำหนด similarity_threshold): ค้นคำถาม (query) ด้วย SimpleVectorMemory
+      เฉพาะรายการที่ใช้ system prompt, โมเดล และ temperature เดียวกัน
+    - คัดออกแบบ LRU เมื่อเกิน max_entries และหมดอายุตาม ttl_seconds
+    - บันทึกลงไฟล์ JSONL แบบต่อท้าย (path=None คือเก็บในหน่วยความจำอย่างเดียว)
+    - temperature สูงกว่า max_temperature ถือว่าต้องการคำตอบที่หลากหลาย จึงไม่ใช้ cache
+    """
+
+    def __init__(self,
+                 max_entries: int = 1000,
+                 ttl_seconds: float = 24 * 3600,
+                 path: Optional[str] = "data/llm_cache.jsonl",
+                 similarity_threshold: float = None,
+                 max_temperature: float = 0.3):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.path = path
+        self.similarity_threshold = similarity_threshold
+        self.max_temperature = max_temperature
+
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._semantic = SimpleVectorMemory()
+        self._semantic_size = 0
+        self._lock = threading.Lock()
+        self._log_lines = 0
+
+        self.stats = {
+            "hits": 0,
+            "semantic_hits": 0,
+            "misses": 0,
+            "bypassed": 0,
+            "evictions": 0,
+            "latency_saved": 0.0
+        }
+
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._load()
+
+    def get(self, messages: List, model: str, temperature: float, query: str = None) -> Optional[str]:
+        """คืนคำตอบจาก cache (None หากไม่พบหรือไม่ควรใช้ cache)"""
+        if not self.cacheable(temperature):
+            self._count("bypassed")
+            return None
+
+        key, context = self._keys(messages, model, temperature)
+        with self._lock:
+            entry = self._live_entry(key)
+            if entry is None and query and self.similarity_threshold is not None:
+                entry = self._similar_entry(query, context)
+                if entry is not None:
+                    self.stats["semantic_hits"] += 1
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            self.stats["hits"] += 1
+            self.stats["latency_saved"] += entry["latency"]
+            return entry["response"]
+
+    def put(self,
+            messages: List,
+            model: str,
+            temperature: float,
+            response: str,
+            latency: float = 0.0,
+            query: str = None):
+        """เก็บคำตอบลง cache"""
+        if not self.cacheable(temperature):
+            return
+
+        key, context = self._keys(messages, model, temperature)
+        entry = {
+            "key": key,
+            "context": context,
+            "query": query,
+            "response": response,
+            "latency": latency,
+            "created_at": time.time()
+        }
+        with self._lock:
+            self._remember(entry)
+            if self.path:
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+                self._log_lines += 1
+                if self._log_lines > 2 * self.max_entries:
+                    self._compact()
+
+    def invoke(self, llm, messages: List, model: str, temperature: float, query: str = None):
+        """เรียก llm.invoke ผ่าน cache"""
+        cached = self.get(messages, model, temperature, query)
+        if cached is not None:
+            return CachedMessage(cached)
+        started = time.perf_counter()
+        response = llm.invoke(messages)
+        self.put(messages, model, temperature, response.content, time.perf_counter() - started, query)
+        return response
+
+    async def ainvoke(self, llm, messages: List, model: str, temperature: float, query: str = None):
+        """เรียก llm.ainvoke ผ่าน cache"""
+        cached = self.get(messages, model, temperature, query)
+        if cached is not None:
+            return CachedMessage(cached)
+        started = time.perf_counter()
+        response = await llm.ainvoke(messages)
+        self.put(messages, model, temperature, response.content, time.perf_counter() - started, query)
+        return response
+
+    def cacheable(self, temperature: float) -> bool:
+        return temperature is None or temperature <= self.max_temperature
+
+    def get_stats(self) -> Dict[str, Any]:
+        """สถิติการใช้ cache (รวมอัตรา hit)"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats["entries"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._semantic = SimpleVectorMemory()
+            self._semantic_size = 0
+            if self.path:
+                atomic_write(self.path, [])
+                self._log_lines = 0
+
+    def _keys(self, messages: List, model: str, temperature: float):
+        """key ของ prompt ทั้งหมด และ key ของบริบท (system prompt) สำหรับการค้นแบบใกล้เคียง"""
+        texts = [self._normalize(getattr(message, 'content', message)) for message in messages]
+        prefix = f"{model}\x00{temperature}\x00"
+        key = hashlib.sha256((prefix + "\x00".join(texts)).encode('utf-8')).hexdigest()
+        context = hashlib.sha256((prefix + (texts[0] if len(texts) > 1 else "")).encode('utf-8')).hexdigest()
+        return key, context
+
+    def _normalize(self, text: str) -> str:
+        return _WHITESPACE.sub(' ', str(text)).strip().casefold()
+
+    def _live_entry(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if self._expired(entry):
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _similar_entry(self, query: str, context: str) -> Optional[Dict[str, Any]]:
+        for memory in self._semantic.search_memory(query, n_results=5):
+            if 1 - memory['distance'] < self.similarity_threshold:
+                break
+            metadata = memory['metadata']
+            if metadata['context'] == context:
+                entry = self._live_entry(metadata['key'])
+                if entry is not None:
+                    return entry
+        return None
+
+    def _remember(self, entry: Dict[str, Any]):
+        key = entry["key"]
+        self._entries.pop(key, None)
+        self._entries[key] = entry
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+        if entry.get("query") and self.similarity_threshold is not None:
+            # รายการที่ถูกคัดออกยังค้างใน index ได้ (ถูกข้ามตอนค้นหา) จึงสร้างใหม่เป็นครั้งคราว
+            if self._semantic_size > 2 * self.max_entries:
+                self._rebuild_semantic()
+            self._semantic.add_memory(entry["query"], metadata={"key": key, "context": entry["context"]})
+            self._semantic_size += 1
+
+    def _rebuild_semantic(self):
+        # index ใหม่แทนการเรียก clear_memory() (ซึ่งพิมพ์ข้อความถึงผู้ใช้)
+        self._semantic = SimpleVectorMemory()
+        self._semantic_size = 0
+        for entry in self._entries.values():
+            if entry.get("query"):
+                self._semantic.add_memory(entry["query"], metadata={"key": entry["key"], "context": entry["context"]})
+                self._semantic_size += 1
+
+    def _expired(self, entry: Dict[str, Any]) -> bool:
+        return self.ttl_seconds is not None and time.time() - entry["created_at"] > self.ttl_seconds
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # บรรทัดท้ายที่เขียนไม่ครบ
+                    continue
+                self._log_lines += 1
+                if not self._expired(entry):
+                    self._remember(entry)
+        self.stats["evictions"] = 0
+        if self._log_lines > len(self._entries):
+            self._compact()
+
+    def _compact(self):
+        """เขียนไฟล์ใหม่ให้เหลือเฉพาะรายการที่ยังอยู่ใน cache"""
+        live = [entry for entry in self._entries.values() if not self._expired(entry)]
+        atomic_write(self.path, (json.dumps(entry, ensure_ascii=False) + '\n' for entry in live))
+        self._log_lines = len(live)
+
+    def _count(self, name: str):
+        with self._lock:
+            self.stats[name] += 1
@@ -0,0 +1,471 @@
+# agent/llm_scheduler.py
+"""จัดคิวการเรียก LLM ทุกครั้งผ่านจุดเดียว ไม่ให้ชน rate limit ของผู้ให้บริการ
+
+- bucket จำนวนคำขอ/นาที และ token/นาที (เติมต่อเนื่อง)
+- คิวตามลำดับความสำคัญ: คำตอบที่ผู้ใช้รอ > การวางแผน > ขั้นตอนย่อยของแผน > งานเบื้องหลัง
+- จำนวนการเรียกพร้อมกันปรับเองแบบ AIMD: เริ่มแบบ slow start (เพิ่มเท่าตัวต่อรอบ) จนเจอสัญญาณแน่นครั้งแรก
+  จากนั้นสำเร็จและเร็ว = เพิ่มทีละน้อย, โดน rate limit หรือช้าผิดปกติ = ลดครึ่ง/ลดลงเล็กน้อย
+- เรียกซ้ำเมื่อเจอข้อผิดพลาดชั่วคราว (429, 5xx, timeout) ด้วย exponential backoff แบบสุ่ม (jitter)
+  และเคารพ Retry-After โดยหยุดส่งคำขอใหม่ทั้งหมดจนพ้นช่วงนั้น
+- สถิติความยาวคิวและเวลารอของแต่ละระดับความสำคัญ (get_metrics)
+
+ใช้ผ่าน ScheduledChatModel ซึ่งมี invoke/ainvoke/stream/astream เหมือน ChatModel ของ langchain
+"""
+from .context_builder import TokenCounter
+from .lazy import lazy_import
+from .tracing import Histogram, span, token_usage
+from typing import List, Dict, Any, Callable, Iterator, AsyncIterator, Optional
+from collections import deque
+import heapq
+import itertools
+import random
+import threading
+import time
+
+asyncio = lazy_import("asyncio")
+
+# ระดับความสำคัญ (ค่าน้อยได้คิวก่อน)
+INTERACTIVE = 0
+PLANNING = 1
+STEP = 2
+BACKGROUND = 3
+PRIORITY_NAMES = {INTERACTIVE: "interactive", PLANNING: "planning", STEP: "step", BACKGROUND: "background"}
+
+
+def status_code(error: Exception) -> Optional[int]:
+    """HTTP status ของข้อผิดพลาดจาก client ของผู้ให้บริการ (openai, httpx, requests) ถ้ามี"""
+    code = getattr(error, "status_code", None)
+    if code is None:
+        code = getattr(getattr(error, "response", None), "status_code", None)
+    return code if isinstance(code, int) else None
+
+
+def is_rate_limit(error: Exception) -> bool:
+    if status_code(error) == 429:
+        return True
+    return "ratelimit" in type(error).__name__.lower() or "rate limit" in str(error).lower()
+
+
+def is_retryable(error: Exception) -> bool:
+    """ข้อผิดพลาดชั่วคราวที่ลองใหม่ได้: rate limit, 5xx, timeout และการเชื่อมต่อ"""
+    if is_rate_limit(error):
+        return True
+    code = status_code(error)
+    if code is not None:
+        return code >= 500 or code == 408
+    name = type(error).__name__.lower()
+    return isinstance(error, (TimeoutError, ConnectionError)) or "timeout" in name or "connection" in name
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """จำนวนวินาทีที่ผู้ให้บริการขอให้รอ (attribute retry_after หรือ header Retry-After)"""
+    value = getattr(error, "retry_after", None)
+    if value is None:
+        headers = getattr(getattr(error, "response", None), "headers", None) or {}
+        try:
+            value = headers.get("retry-after") or headers.get("Retry-After")
+        except AttributeError:
+            value = None
+    try:
+        return max(0.0, float(value)) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """bucket ที่เติม per_minute หน่วยต่อนาทีแบบต่อเนื่อง จุได้ไม่เกิน capacity (ไม่ thread-safe ใช้ภายใต้ lock)"""
+
+    def __init__(self, per_minute: float, capacity: float = None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """วินาทีที่ต้องรอจนพอสำหรับ amount (คำขอที่ใหญ่กว่า capacity รอจน bucket เต็ม)"""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def take(self, amount: float, now: float):
+        # ติดลบได้: คำขอถัดไปต้องรอจนชดใช้ส่วนที่เกิน
+        self._refill(now)
+        self.level -= amount
+
+    def adjust(self, amount: float):
+        """แก้ยอดเมื่อรู้จำนวนจริง (บวก = ใช้เกินที่ประมาณไว้, ลบ = คืน)"""
+        self.level = min(self.capacity, self.level - amount)
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+
+class _Ticket:
+    """คำขอหนึ่งรายการในคิว (granted = ได้สิทธิ์เรียกแล้ว)"""
+
+    __slots__ = ("priority", "tokens", "enqueued", "granted", "cancelled", "wake")
+
+    def __init__(self, priority: int, tokens: int, wake: Callable[[], None]):
+        self.priority = priority
+        self.tokens = tokens
+        self.enqueued = time.monotonic()
+        self.granted = False
+        self.cancelled = False
+        self.wake = wake
+
+
+class LLMScheduler:
+    """ตัวจัดคิวกลางของการเรียก LLM (ใช้ร่วมกันได้ทั้ง thread และ event loop หลายตัว)
+
+    - requests_per_minute / tokens_per_minute: None = ไม่จำกัด
+    - initial_concurrency..max_concurrency: ช่วงของจำนวนการเรียกพร้อมกัน (ปรับตาม AIMD)
+    - latency_target: วินาที เกินนี้ถือว่าผู้ให้บริการเริ่มแน่น
+      (None = latency_tolerance เท่าของ latency ต่ำสุดใน 100 ครั้งล่าสุด)
+    - max_retries, backoff, max_backoff: การเรียกซ้ำเมื่อเจอข้อผิดพลาดชั่วคราว
+    - expected_output_tokens: token คำตอบที่กันไว้ก่อนเรียก (ปรับตามจริงเมื่อได้ usage)
+    """
+
+    def __init__(self,
+                 requests_per_minute: float = None,
+                 tokens_per_minute: float = None,
+                 initial_concurrency: int = 8,
+                 min_concurrency: int = 1,
+                 max_concurrency: int = 64,
+                 latency_target: float = None,
+                 latency_tolerance: float = 3.0,
+                 max_retries: int = 4,
+                 backoff: float = 0.5,
+                 max_backoff: float = 30.0,
+                 expected_output_tokens: int = 256,
+                 count_tokens: Callable[[str], int] = None,
+                 seed: int = None):
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.limit = float(max(min_concurrency, min(initial_concurrency, max_concurrency)))
+        self.latency_target = latency_target
+        self.latency_tolerance = latency_tolerance
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.expected_output_tokens = expected_output_tokens
+        self.count_tokens = count_tokens or TokenCounter().count
+
+        self._lock = threading.Lock()
+        self._queue: List = []
+        self._sequence = itertools.count()
+        self._in_flight = 0
+        self._waiting = 0
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self._slow_start = True
+        self._recent_latency = deque(maxlen=100)
+        self._random = random.Random(seed)
+        self.stats = {"calls": 0, "retries": 0, "rate_limited": 0, "errors": 0, "tokens": 0, "max_queue_depth": 0}
+        self._wait_ms = {name: Histogram() for name in PRIORITY_NAMES.values()}
+        self._latency_ms = Histogram()
+
+    # ---------- เรียก LLM ผ่านคิว ----------
+
+    def call(self, function: Callable[[List], Any], messages: List, priority: int = INTERACTIVE) -> Any:
+        """เรียก function(messages) เมื่อได้คิว และเรียกซ้ำเมื่อเจอข้อผิดพลาดชั่วคราว"""
+        tokens = self.estimate_tokens(messages)
+        for attempt in itertools.count():
+            ticket = self.acquire(priority, tokens)
+            started = time.perf_counter()
+            try:
+                response = function(messages)
+            except Exception as e:
+                delay = self._failed(ticket, time.perf_counter() - started, e, attempt)
+                time.sleep(delay)
+                continue
+            except BaseException:
+                self._abandon(ticket)
+                raise
+            self.release(ticket, time.perf_counter() - started, tokens_used=_total_tokens(response))
+            return response
+
+    async def acall(self, function: Callable[[List], Any], messages: List, priority: int = INTERACTIVE) -> Any:
+        """call แบบ async (function คืนค่า coroutine)"""
+        tokens = self.estimate_tokens(messages)
+        for attempt in itertools.count():
+            ticket = await self.aacquire(priority, tokens)
+            started = time.perf_counter()
+            try:
+                response = await function(messages)
+            except Exception as e:
+                delay = self._failed(ticket, time.perf_counter() - started, e, attempt)
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                # task ถูกยกเลิกระหว่างรอคำตอบ
+                self._abandon(ticket)
+                raise
+            self.release(ticket, time.perf_counter() - started, tokens_used=_total_tokens(response))
+            return response
+
+    def stream(self, function: Callable[[List], Iterator], messages: List, priority: int = INTERACTIVE) -> Iterator:
+        """stream ผ่านคิว (เรียกซ้ำได้เฉพาะเมื่อยังไม่ได้รับ chunk แรก)"""
+        tokens = self.estimate_tokens(messages)
+        for attempt in itertools.count():
+            ticket = self.acquire(priority, tokens)
+            started = time.perf_counter()
+            received = False
+            try:
+                for chunk in function(messages):
+                    received = True
+                    yield chunk
+            except Exception as e:
+                if received:
+                    self.release(ticket, time.perf_counter() - started, error=e)
+                    raise
+                delay = self._failed(ticket, time.perf_counter() - started, e, attempt)
+                time.sleep(delay)
+                continue
+            except BaseException:
+                # ผู้ใช้หยุดอ่าน stream กลางทาง (GeneratorExit)
+                self._abandon(ticket)
+                raise
+            self.release(ticket, time.perf_counter() - started)
+            return
+
+    async def astream(self, function: Callable[[List], AsyncIterator], messages: List,
+                      priority: int = INTERACTIVE) -> AsyncIterator:
+        tokens = self.estimate_tokens(messages)
+        for attempt in itertools.count():
+            ticket = await self.aacquire(priority, tokens)
+            started = time.perf_counter()
+            received = False
+            try:
+                async for chunk in function(messages):
+                    received = True
+                    yield chunk
+            except Exception as e:
+                if received:
+                    self.release(ticket, time.perf_counter() - started, error=e)
+                    raise
+                delay = self._failed(ticket, time.perf_counter() - started, e, attempt)
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                self._abandon(ticket)
+                raise
+            self.release(ticket, time.perf_counter() - started)
+            return
+
+    def _failed(self, ticket: _Ticket, latency: float, error: Exception, attempt: int) -> float:
+        """คืนสิทธิ์ของการเรียกที่ล้มเหลว แล้วคืนค่าเวลารอก่อนลองใหม่ (raise ต่อถ้าลองใหม่ไม่ได้)"""
+        self.release(ticket, latency, error=error)
+        if attempt >= self.max_retries or not is_retryable(error):
+            raise error
+        with self._lock:
+            self.stats["retries"] += 1
+        return self.retry_delay(attempt, error)
+
+    def retry_delay(self, attempt: int, error: Exception = None) -> float:
+        """exponential backoff แบบ full jitter (ไม่น้อยกว่า Retry-After ถ้ามี)"""
+        ceiling = min(self.max_backoff, self.backoff * (2 ** attempt))
+        with self._lock:
+            delay = self._random.uniform(0, ceiling)
+        requested = retry_after(error) if error is not None else None
+        return max(delay, requested) if requested is not None else delay
+
+    def estimate_tokens(self, messages: List) -> int:
+        prompt = sum(self.count_tokens(getattr(message, "content", str(message))) for message in messages)
+        return prompt + self.expected_output_tokens
+
+    # ---------- คิวและสิทธิ์การเรียก ----------
+
+    def acquire(self, priority: int = INTERACTIVE, tokens: int = 0) -> _Ticket:
+        """รอจนได้สิทธิ์เรียก (ต้องเรียก release เมื่อเสร็จ)"""
+        event = threading.Event()
+        ticket = self._enqueue(priority, tokens, event.set)
+        with span("llm_wait", priority=PRIORITY_NAMES.get(priority, str(priority))) as current:
+            try:
+                while not ticket.granted:
+                    delay = self._dispatch()
+                    if ticket.granted:
+                        break
+                    event.wait(delay)
+                    event.clear()
+            except BaseException:
+                self._abandon(ticket)
+                raise
+            current.set(concurrency_limit=int(self.limit))
+        return ticket
+
+    async def aacquire(self, priority: int = INTERACTIVE, tokens: int = 0) -> _Ticket:
+        loop = asyncio.get_running_loop()
+        event = asyncio.Event()
+        ticket = self._enqueue(priority, tokens, lambda: loop.call_soon_threadsafe(event.set))
+        with span("llm_wait", priority=PRIORITY_NAMES.get(priority, str(priority))) as current:
+            try:
+                while not ticket.granted:
+                    delay = self._dispatch()
+                    if ticket.granted:
+                        break
+                    try:
+                        await asyncio.wait_for(event.wait(), delay)
+                    except asyncio.TimeoutError:
+                        pass
+                    event.clear()
+            except BaseException:
+                self._abandon(ticket)
+                raise
+            current.set(concurrency_limit=int(self.limit))
+        return ticket
+
+    def release(self, ticket: _Ticket, latency: float, error: Exception = None, tokens_used: int = None):
+        """คืนสิทธิ์เมื่อเรียกเสร็จ และปรับจำนวนการเรียกพร้อมกันตามผล"""
+        now = time.monotonic()
+        with self._lock:
+            self._in_flight -= 1
+            self.stats["calls"] += 1
+            if tokens_used:
+                self.stats["tokens"] += tokens_used
+                if self.tokens is not None:
+                    self.tokens.adjust(tokens_used - ticket.tokens)
+            if error is None:
+                self._latency_ms.record(latency * 1000)
+                self._succeeded(latency, now)
+            elif is_rate_limit(error):
+                self.stats["rate_limited"] += 1
+                # หยุดส่งคำขอใหม่ทั้งหมดชั่วคราว แทนที่ทุกคำขอในคิวจะชน limit ซ้ำ
+                pause = retry_after(error)
+                self._paused_until = max(self._paused_until, now + (pause if pause is not None else self.backoff))
+                self._decrease(now, 0.5)
+            else:
+                self.stats["errors"] += 1
+                if is_retryable(error):
+                    self._decrease(now, 0.5)
+        self._dispatch()
+
+    def _enqueue(self, priority: int, tokens: int, wake: Callable[[], None]) -> _Ticket:
+        ticket = _Ticket(priority, tokens, wake)
+        with self._lock:
+            heapq.heappush(self._queue, (priority, next(self._sequence), ticket))
+            self._waiting += 1
+            self.stats["max_queue_depth"] = max(self.stats["max_queue_depth"], self._waiting)
+        return ticket
+
+    def _dispatch(self) -> Optional[float]:
+        """ให้สิทธิ์คำขอหัวคิวที่พร้อม คืนค่าวินาทีที่หัวคิวต้องรอ bucket (None = รอจนมีการเรียกเสร็จ)"""
+        with self._lock:
+            now = time.monotonic()
+            while self._queue:
+                ticket = self._queue[0][2]
+                if ticket.cancelled:
+                    heapq.heappop(self._queue)
+                    continue
+                if self._in_flight >= int(self.limit):
+                    return None
+                wait = self._paused_until - now
+                if self.requests is not None:
+                    wait = max(wait, self.requests.wait_time(1, now))
+                if self.tokens is not None:
+                    wait = max(wait, self.tokens.wait_time(ticket.tokens, now))
+                if wait > 0:
+                    return wait
+                heapq.heappop(self._queue)
+                if self.requests is not None:
+                    self.requests.take(1, now)
+                if self.tokens is not None:
+                    self.tokens.take(ticket.tokens, now)
+                self._in_flight += 1
+                self._waiting -= 1
+                ticket.granted = True
+                self._wait_ms[PRIORITY_NAMES.get(ticket.priority, "background")].record(
+                    (now - ticket.enqueued) * 1000
+                )
+                ticket.wake()
+            return None
+
+    def _abandon(self, ticket: _Ticket):
+        """ผู้เรียกเลิกรอหรือเลิกรอคำตอบ (เช่น task ถูกยกเลิก) โดยไม่นับเป็นผลของการเรียก"""
+        with self._lock:
+            if ticket.granted:
+                self._in_flight -= 1
+            else:
+                ticket.cancelled = True
+                self._waiting -= 1
+        self._dispatch()
+
+    def _succeeded(self, latency: float, now: float):
+        self._recent_latency.append(latency)
+        target = self.latency_target or min(self._recent_latency) * self.latency_tolerance
+        if len(self._recent_latency) >= 5 and latency > target:
+            self._decrease(now, 0.9)
+        else:
+            # slow start: +1 ต่อการเรียก (เท่าตัวต่อรอบ) หลังจากนั้น +1 ต่อการเรียกครบหนึ่งรอบของ limit
+            step = 1.0 if self._slow_start else 1.0 / self.limit
+            self.limit = min(float(self.max_concurrency), self.limit + step)
+
+    def _decrease(self, now: float, factor: float):
+        # การเรียกที่ค้างอยู่พร้อมกันมักล้มเหลวพร้อมกัน ลดได้ครั้งเดียวต่อช่วง
+        cooldown = max(0.1, min(self._recent_latency)) if self._recent_latency else 0.1
+        if now - self._last_decrease < cooldown:
+            return
+        self._last_decrease = now
+        self._slow_start = False
+        self.limit = max(float(self.min_concurrency), self.limit * factor)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """ความยาวคิว เวลารอของแต่ละระดับความสำคัญ (ms) และสถานะของ AIMD/rate limit"""
+        with self._lock:
+            metrics = dict(self.stats)
+            metrics.update({
+                "queue_depth": self._waiting,
+                "in_flight": self._in_flight,
+                "concurrency_limit": round(self.limit, 2),
+                "paused_ms": max(0.0, (self._paused_until - time.monotonic()) * 1000),
+                "latency_ms": self._latency_ms.summary(),
+                "wait_ms": {name: histogram.summary() for name, histogram in self._wait_ms.items()
+                            if histogram.count}
+            })
+        return metrics
+
+
+def _total_tokens(response: Any) -> int:
+    usage = token_usage(response)
+    return usage.get("input_tokens", 0) + usage.get("output_tokens", 0)
+
+
+class ScheduledChatModel:
+    """ห่อ ChatModel ให้ทุกการเรียกผ่าน LLMScheduler ด้วยระดับความสำคัญ priority
+
+    attribute อื่นส่งต่อไปยังโมเดลจริง ใช้ with_priority เพื่อได้ตัวห่อที่ใช้คิวเดียวกันแต่ต่างระดับ
+    """
+
+    def __init__(self, llm, scheduler: LLMScheduler, priority: int = INTERACTIVE):
+        self.llm = llm
+        self.scheduler = scheduler
+        self.priority = priority
+
+    def with_priority(self, priority: int) -> "ScheduledChatModel":
+        if priority == self.priority:
+            return self
+        return ScheduledChatModel(self.llm, self.scheduler, priority)
+
+    def invoke(self, messages: List, **kwargs) -> Any:
+        return self.scheduler.call(lambda batch: self.llm.invoke(batch, **kwargs), messages, self.priority)
+
+    async def ainvoke(self, messages: List, **kwargs) -> Any:
+        return await self.scheduler.acall(lambda batch: self.llm.ainvoke(batch, **kwargs), messages, self.priority)
+
+    def stream(self, messages: List, **kwargs) -> Iterator:
+        return self.scheduler.stream(lambda batch: self.llm.stream(batch, **kwargs), messages, self.priority)
+
+    def astream(self, messages: List, **kwargs) -> AsyncIterator:
+        return self.scheduler.astream(lambda batch: self.llm.astream(batch, **kwargs), messages, self.priority)
+
+    def __call__(self, messages: List, **kwargs) -> Any:
+        return self.invoke(messages, **kwargs)
+
+    def __getattr__(self, attribute: str) -> Any:
+        if attribute == "llm":
+            raise AttributeError(attribute)
+        return getattr(self.llm, attribute)
@@ -1,58 +1,252 @@
 # agent/memory.py
 import chromadb
 from chromadb.config import Settings
+from chromadb.utils import embedding_functions
 from typing import List, Dict, Any
+from collections import OrderedDict
+import hashlib
+import threading
 import uuid
+from datetime import datetime
+from .retention import RetentionPolicy, ColdTier
+from .memory_store import timestamp_micros
+from .simple_memory import extract_keywords
 
 class VectorMemory:
-    def __init__(self, collection_name: str = "agent_memory"):
+    def __init__(self,
+                 collection_name: str = "agent_memory",
+                 batch_size: int = 64,
+                 flush_interval: float = 2.0,
+                 embedding_function=None,
+                 embedding_cache_size: int = 10000,
+                 retention: RetentionPolicy = None,
+                 cold_tier: ColdTier = None,
+                 summarizer=None):
         # สร้าง ChromaDB client
         self.client = chromadb.Client(Settings(
             persist_directory="./data/chroma_db",
             chroma_db_impl="duckdb+parquet"
         ))
         
+        # คำนวณ embedding เองเพื่อรวมเป็นชุดและใช้ cache ได้
+        self.embedding_function = embedding_function or embedding_functions.DefaultEmbeddingFunction()
+        
         # สร้างหรือโหลด collection
         self.collection = self.client.get_or_create_collection(
-            name=collection_name
+            name=collection_name,
+            embedding_function=self.embedding_function
         )
+        
+        # buffer สำหรับรวม add_memory หลายครั้งเป็น collection.add ครั้งเดียว
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending = []
+        self._timer = None
+        self._lock = threading.RLock()
+        
+        # cache ของ embedding ตาม hash ของเนื้อหา (ไม่ต้อง embed ข้อความเดิมซ้ำ)
+        self.embedding_cache_size = embedding_cache_size
+        self._embedding_cache = OrderedDict()
+        self.stats = {"embedded": 0, "embedding_cache_hits": 0, "batches": 0, "flush_errors": 0}
+        
+        # นโยบายการเก็บ: ติดตามความจำที่เพิ่มในโปรเซสนี้ (id -> [timestamp, ขนาด, จำนวนครั้งที่ค้นเจอ])
+        self.retention = retention
+        self.cold_tier = cold_tier
+        self.summarizer = summarizer
+        self._tracked = OrderedDict()
+        self._tracked_bytes = 0
     
     def add_memory(self, 
                    content: str, 
                    metadata: Dict[str, Any] = None) -> str:
-        """เพิ่มความจำใหม่"""
+        """เพิ่มความจำใหม่ (เก็บใน buffer และเขียนเป็นชุดตามขนาดหรือเวลา)"""
         memory_id = str(uuid.uuid4())
         
-        self.collection.add(
-            documents=[content],
-            metadatas=[metadata or {}],
-            ids=[memory_id]
-        )
+        with self._lock:
+            self._pending.append((memory_id, content, metadata or {}))
+            if len(self._pending) >= self.batch_size:
+                self._flush_in_background()
+            else:
+                self._schedule_flush()
+            
+            if self.retention is not None:
+                size = len(content.encode('utf-8'))
+                self._tracked[memory_id] = [timestamp_micros(datetime.now().isoformat()), size, 0]
+                self._tracked_bytes += size
+                oldest = next(iter(self._tracked.values()))[0]
+                if self.retention.needs_eviction(len(self._tracked), self._tracked_bytes, oldest):
+                    self.enforce_retention()
         
         return memory_id
     
+    def flush(self):
+        """เขียนความจำที่ค้างใน buffer ลง collection ในครั้งเดียว
+        
+        หากเขียนไม่สำเร็จ (embedding หรือ collection.add ผิดพลาด) ความจำยังอยู่ใน buffer
+        และจะลองใหม่อีกครั้งหลัง flush_interval วินาที นับใน stats["flush_errors"] แล้ว raise ต่อ
+        """
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._pending:
+                return
+            
+            pending = list(self._pending)
+            ids = [memory_id for memory_id, _, _ in pending]
+            documents = [content for _, content, _ in pending]
+            metadatas = [metadata for _, _, metadata in pending]
+            
+            try:
+                self.collection.add(
+                    documents=documents,
+                    embeddings=self._embed(documents),
+                    metadatas=metadatas,
+                    ids=ids
+                )
+            except Exception as e:
+                self.stats["flush_errors"] += 1
+                print(f"เขียนความจำลง collection ไม่สำเร็จ ({len(pending)} รายการ): {e}")
+                self._schedule_flush()
+                raise
+            # ถือ lock ไว้ตลอด จึงไม่มีรายการใหม่แทรกระหว่างเขียน
+            del self._pending[:len(pending)]
+            self.stats["batches"] += 1
+    
+    def _schedule_flush(self):
+        # เรียกภายใต้ self._lock
+        if self._timer is None:
+            self._timer = threading.Timer(self.flush_interval, self._flush_in_background)
+            self._timer.daemon = True
+            self._timer.start()
+    
+    def _flush_in_background(self):
+        """flush จาก timer หรือเมื่อ buffer เต็ม (ข้อผิดพลาดถูกนับและพิมพ์แล้ว ความจำยังรอเขียนใน buffer)"""
+        try:
+            self.flush()
+        except Exception:
+            pass
+    
     def search_memory(self, 
                       query: str, 
-                      n_results: int = 5) -> List[Dict[str, Any]]:
-        """ค้นหาความจำที่เกี่ยวข้อง"""
+                      n_results: int = 5,
+                      namespace: str = None) -> List[Dict[str, Any]]:
+        """ค้นหาความจำที่เกี่ยวข้อง เฉพาะ metadata["namespace"] ที่ระบุ (ถ้ามี)"""
+        return self.search_memory_many([query], n_results=n_results, namespace=namespace)[0]
+    
+    def search_memory_many(self,
+                           queries: List[str],
+                           n_results: int = 5,
+                           namespace: str = None) -> List[List[Dict[str, Any]]]:
+        """ค้นหาหลายคำถามพร้อมกัน (embed และ query เป็นชุดเดียว)"""
+        if not queries:
+            return []
+        
+        # ให้ผลการค้นหาเห็นความจำที่ยังค้างอยู่ใน buffer ด้วย
+        self.flush()
+        
+        # กรองด้วย where ของ Chroma ฝั่ง collection
         results = self.collection.query(
-            query_texts=[query],
-            n_results=n_results
+            query_embeddings=self._embed(queries),
+            n_results=n_results,
+            where={"namespace": namespace} if namespace is not None else None
         )
         
-        memories = []
-        for i in range(len(results['documents'][0])):
-            memories.append({
-                'id': results['ids'][0][i],
-                'content': results['documents'][0][i],
-                'metadata': results['metadatas'][0][i],
-                'distance': results['distances'][0][i]
-            })
+        all_memories = []
+        for q in range(len(queries)):
+            memories = []
+            for i in range(len(results['documents'][q])):
+                memories.append({
+                    'id': results['ids'][q][i],
+                    'content': results['documents'][q][i],
+                    'metadata': results['metadatas'][q][i],
+                    'distance': results['distances'][q][i]
+                })
+                tracked = self._tracked.get(results['ids'][q][i])
+                if tracked is not None:
+                    tracked[2] += 1
+            
+            # ค้นใน cold tier เฉพาะเมื่อ collection ได้ผลลัพธ์ไม่พอ
+            if self.cold_tier is not None and len(memories) < n_results:
+                memories.extend(self.cold_tier.search(
+                    extract_keywords(queries[q].lower()), n_results - len(memories), namespace
+                ))
+            all_memories.append(memories)
         
-        return memories
+        return all_memories
     
-    def get_recent_memories(self, limit: int = 10) -> List[Dict[str, Any]]:
+    def get_recent_memories(self, limit: int = 10, namespace: str = None) -> List[Dict[str, Any]]:
         """ดึงความจำล่าสุด"""
         # สำหรับตัวอย่างนี้ เราจะใช้การ query ทั่วไป
         # ในการใช้งานจริงควรเก็บ timestamp และเรียงลำดับ
-        return self.search_memory("", n_results=limit)
+        return self.search_memory("", n_results=limit, namespace=namespace)
+    
+    def enforce_retention(self) -> int:
+        """คัดความจำออกจาก collection ตาม retention policy คืนค่าจำนวนที่ถูกคัดออก"""
+        with self._lock:
+            if self.retention is None or not self._tracked:
+                return 0
+            
+            entries = ((memory_id, ts, size, hits) for memory_id, (ts, size, hits) in self._tracked.items())
+            victims = self.retention.select(entries)
+            if not victims:
+                return 0
+            
+            self.flush()
+            stored = self.collection.get(ids=victims, include=["documents", "metadatas"])
+            evicted = [
+                {
+                    'id': memory_id,
+                    'content': document,
+                    'metadata': metadata or {},
+                    'keywords': extract_keywords(document)
+                }
+                for memory_id, document, metadata in zip(stored['ids'], stored['documents'], stored['metadatas'])
+            ]
+            if self.cold_tier is not None:
+                self.cold_tier.append(evicted)
+            
+            self.collection.delete(ids=victims)
+            for memory_id in victims:
+                self._tracked_bytes -= self._tracked.pop(memory_id)[1]
+        
+        # สรุปความจำที่ถูกคัดออกเป็นความจำใหม่หนึ่งรายการ (ถ้ามี summarizer)
+        if self.summarizer is not None and evicted:
+            self.add_memory(
+                self.summarizer(evicted),
+                metadata={'type': 'summary', 'summarized_count': len(evicted)}
+            )
+        
+        return len(victims)
+    
+    def close(self):
+        """เขียนความจำที่ค้างอยู่ก่อนปิดการใช้งาน"""
+        self.flush()
+    
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        """คำนวณ embedding เฉพาะข้อความที่ยังไม่อยู่ใน cache (รวมเป็นชุดเดียว)"""
+        keys = [hashlib.sha256(text.encode('utf-8')).hexdigest() for text in texts]
+        
+        found = {}
+        missing = {}
+        with self._lock:
+            for key, text in zip(keys, texts):
+                if key in found or key in missing:
+                    continue
+                if key in self._embedding_cache:
+                    self._embedding_cache.move_to_end(key)
+                    found[key] = self._embedding_cache[key]
+                    self.stats["embedding_cache_hits"] += 1
+                else:
+                    missing[key] = text
+        
+        if missing:
+            embeddings = self.embedding_function(list(missing.values()))
+            with self._lock:
+                for key, embedding in zip(missing, embeddings):
+                    found[key] = self._embedding_cache[key] = list(embedding)
+                while len(self._embedding_cache) > self.embedding_cache_size:
+                    self._embedding_cache.popitem(last=False)
+                self.stats["embedded"] += len(missing)
+        
+        return [found[key] for key in keys]
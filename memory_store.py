@@ -0,0 +1,215 @@
+# agent/memory_store.py
+from typing import List, Dict, Any, Iterable, Optional
+from collections.abc import Mapping, Sequence
+from array import array
+from datetime import datetime, timedelta
+import uuid
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+_EMPTY = ()
+
+# ฟิลด์ของความจำแต่ละรายการ (เหมือน dict เดิมของ SimpleVectorMemory)
+RECORD_FIELDS = ('id', 'content', 'metadata', 'timestamp', 'keywords')
+
+
+def timestamp_micros(timestamp: str) -> Optional[int]:
+    """แปลง ISO timestamp เป็นไมโครวินาทีนับจาก epoch (เวลาท้องถิ่นแบบ naive)"""
+    try:
+        parsed = datetime.fromisoformat(timestamp)
+    except (ValueError, TypeError):
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return (parsed - _EPOCH) // _MICROSECOND
+
+
+class MemoryRecord(Mapping):
+    """มุมมอง (view) แบบอ่านอย่างเดียวของความจำหนึ่งรายการใน MemoryStore"""
+    __slots__ = ('_store', '_row', '_distance')
+
+    def __init__(self, store: 'MemoryStore', row: int, distance: Optional[float] = None):
+        self._store = store
+        self._row = row
+        self._distance = distance
+
+    def __getitem__(self, key: str) -> Any:
+        if key == 'distance' and self._distance is not None:
+            return self._distance
+        if key in RECORD_FIELDS:
+            return self._store.get_field(self._row, key)
+        raise KeyError(key)
+
+    def __iter__(self):
+        yield from RECORD_FIELDS
+        if self._distance is not None:
+            yield 'distance'
+
+    def __len__(self) -> int:
+        return len(RECORD_FIELDS) + (self._distance is not None)
+
+    def __repr__(self) -> str:
+        return f"MemoryRecord({dict(self)!r})"
+
+
+class MemoryStore(Sequence):
+    """ที่เก็บความจำแบบ structure-of-arrays
+
+    - id เก็บเป็น uuid 16 ไบต์ต่อกันใน bytearray
+    - timestamp เก็บเป็นจำนวนไมโครวินาทีนับจาก epoch ใน array('q')
+    - คำสำคัญถูก intern เป็นเลข id และเก็บต่อกันใน array('I') พร้อม offset
+    - metadata เก็บเป็น tuple ของค่า โดยใช้ชุด key (schema) ร่วมกัน
+    - metadata["namespace"] ถูก intern เป็นเลข id ต่อแถวใน array('I') (0 = ไม่มี) สำหรับกรองตอนค้นหา
+    """
+
+    def __init__(self):
+        self._ids = bytearray()
+        self._timestamps = array('q')
+        self._contents: List[str] = []
+        self._metadata_schemas = array('I')
+        self._metadata_values: List[tuple] = []
+        self._keyword_offsets = array('I', [0])
+        self._keyword_ids = array('I')
+        self._namespace_ids = array('I')
+
+        # พจนานุกรมคำสำคัญ (intern)
+        self._vocabulary: Dict[str, int] = {}
+        self._keywords: List[str] = []
+
+        # ชุด key ของ metadata ที่ใช้ร่วมกัน
+        self._schema_ids: Dict[tuple, int] = {(): 0}
+        self._schemas: List[tuple] = [()]
+
+        # namespace -> id (เริ่มที่ 1)
+        self._namespaces: Dict[str, int] = {}
+
+        # ค่าที่เข้ารหัสแบบกะทัดรัดไม่ได้ (เช่น id ที่ไม่ใช่ uuid) เก็บแยกไว้
+        self._raw_ids: Dict[int, str] = {}
+        self._raw_timestamps: Dict[int, str] = {}
+
+    def __len__(self) -> int:
+        return len(self._contents)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [MemoryRecord(self, row) for row in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("memory index out of range")
+        return MemoryRecord(self, index)
+
+    def append(self,
+               memory_id: str,
+               content: str,
+               metadata: Dict[str, Any],
+               timestamp: str,
+               keywords: Iterable[str]) -> int:
+        """เพิ่มความจำหนึ่งรายการ คืนค่าเลขแถว"""
+        row = len(self._contents)
+
+        self._append_id(row, memory_id)
+        self._append_timestamp(row, timestamp)
+        self._contents.append(content)
+
+        metadata = metadata or {}
+        schema = tuple(metadata)
+        schema_id = self._schema_ids.get(schema)
+        if schema_id is None:
+            schema_id = self._schema_ids[schema] = len(self._schemas)
+            self._schemas.append(schema)
+        self._metadata_schemas.append(schema_id)
+        self._metadata_values.append(tuple(metadata.values()) if schema else _EMPTY)
+
+        namespace = metadata.get('namespace')
+        if namespace is None:
+            self._namespace_ids.append(0)
+        else:
+            namespace_id = self._namespaces.get(namespace)
+            if namespace_id is None:
+                namespace_id = self._namespaces[namespace] = len(self._namespaces) + 1
+            self._namespace_ids.append(namespace_id)
+
+        for keyword in keywords:
+            self._keyword_ids.append(self.intern(keyword))
+        self._keyword_offsets.append(len(self._keyword_ids))
+
+        return row
+
+    def intern(self, keyword: str) -> int:
+        """แปลงคำสำคัญเป็นเลข id (สร้างใหม่หากยังไม่มี)"""
+        keyword_id = self._vocabulary.get(keyword)
+        if keyword_id is None:
+            keyword_id = self._vocabulary[keyword] = len(self._keywords)
+            self._keywords.append(keyword)
+        return keyword_id
+
+    def keyword_id(self, keyword: str) -> Optional[int]:
+        """ดู id ของคำสำคัญ (None หากไม่เคยพบ)"""
+        return self._vocabulary.get(keyword)
+
+    def keyword_ids(self, row: int) -> array:
+        """id ของคำสำคัญทั้งหมดในแถว"""
+        return self._keyword_ids[self._keyword_offsets[row]:self._keyword_offsets[row + 1]]
+
+    def keyword_count(self, row: int) -> int:
+        """จำนวนคำสำคัญ (ไม่ซ้ำ) ในแถว"""
+        return self._keyword_offsets[row + 1] - self._keyword_offsets[row]
+
+    def namespace_id(self, namespace: str) -> Optional[int]:
+        """ดู id ของ namespace (None หากไม่มีความจำใน namespace นี้)"""
+        return self._namespaces.get(namespace)
+
+    def namespace_ids(self) -> array:
+        """id ของ namespace ของทุกแถว (0 = ไม่มี namespace)"""
+        return self._namespace_ids
+
+    def timestamp_micros(self, row: int) -> Optional[int]:
+        """timestamp ของแถวเป็นไมโครวินาทีนับจาก epoch (None หากอ่านไม่ได้)"""
+        raw = self._raw_timestamps.get(row)
+        if raw is not None:
+            return timestamp_micros(raw)
+        return self._timestamps[row]
+
+    def get_field(self, row: int, field: str) -> Any:
+        """ถอดรหัสฟิลด์ของแถวเมื่อถูกเรียกใช้เท่านั้น"""
+        if field == 'content':
+            return self._contents[row]
+        if field == 'id':
+            raw = self._raw_ids.get(row)
+            if raw is not None:
+                return raw
+            return str(uuid.UUID(bytes=bytes(self._ids[row * 16:row * 16 + 16])))
+        if field == 'timestamp':
+            raw = self._raw_timestamps.get(row)
+            if raw is not None:
+                return raw
+            return (_EPOCH + self._timestamps[row] * _MICROSECOND).isoformat()
+        if field == 'metadata':
+            schema = self._schemas[self._metadata_schemas[row]]
+            return dict(zip(schema, self._metadata_values[row]))
+        if field == 'keywords':
+            return [self._keywords[keyword_id] for keyword_id in self.keyword_ids(row)]
+        raise KeyError(field)
+
+    def _append_id(self, row: int, memory_id: str):
+        try:
+            encoded = uuid.UUID(memory_id)
+        except (ValueError, TypeError, AttributeError):
+            encoded = None
+        if encoded is None or str(encoded) != memory_id:
+            self._raw_ids[row] = memory_id
+            self._ids += bytes(16)
+        else:
+            self._ids += encoded.bytes
+
+    def _append_timestamp(self, row: int, timestamp: str):
+        try:
+            parsed = datetime.fromisoformat(timestamp)
+        except (ValueError, TypeError):
+            parsed = None
+        if parsed is None or parsed.tzinfo is not None or parsed.isoformat() != timestamp:
+            self._raw_timestamps[row] = timestamp
+            self._timestamps.append(0)
+        else:
+            self._timestamps.append((parsed - _EPOCH) // _MICROSECOND)
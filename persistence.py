@@ -0,0 +1,240 @@
+# agent/persistence.py
+from typing import Dict, Any, Iterable, Iterator, IO, Optional
+from itertools import chain
+import json
+import os
+import tempfile
+import time
+
+# ขนาดของข้อมูลที่อ่านต่อครั้งเมื่อ stream ไฟล์ JSON
+READ_CHUNK_SIZE = 1 << 16
+
+
+def atomic_write(path: str,
+                 chunks: Iterable[Any],
+                 encoding: str = 'utf-8',
+                 binary: bool = False):
+    """เขียนไฟล์แบบ atomic: เขียนลงไฟล์ชั่วคราว, fsync แล้วจึง rename ทับ"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-', suffix=os.path.basename(path))
+    try:
+        with (os.fdopen(fd, 'wb') if binary else os.fdopen(fd, 'w', encoding=encoding)) as f:
+            for chunk in chunks:
+                f.write(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    _fsync_directory(directory)
+
+
+def iter_json_array(f: IO[str], chunk_size: int = READ_CHUNK_SIZE) -> Iterator[Any]:
+    """อ่านสมาชิกของ JSON array ทีละตัว โดยไม่โหลดข้อความทั้งไฟล์เข้าหน่วยความจำ"""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    started = False
+    eof = False
+
+    while True:
+        # ข้ามช่องว่างและตัวคั่น
+        while position < len(buffer) and buffer[position] in ' \t\r\n,':
+            position += 1
+        if position < len(buffer):
+            if not started:
+                if buffer[position] != '[':
+                    raise ValueError("ไฟล์ไม่ใช่ JSON array")
+                started = True
+                position += 1
+                continue
+            if buffer[position] == ']':
+                return
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                # ค่าที่ถูกตัดที่ขอบ chunk (เช่นตัวเลข) อาจ decode ได้บางส่วน
+                # จึงรับค่าเมื่อมีตัวคั่นตามหลังแล้วเท่านั้น
+                if eof or (end < len(buffer) and buffer[end] in ' \t\r\n,]'):
+                    yield item
+                    position = end
+                    continue
+        elif eof:
+            raise ValueError("JSON array ไม่สมบูรณ์")
+
+        chunk = f.read(chunk_size)
+        if not chunk:
+            eof = True
+        buffer = buffer[position:] + chunk
+        position = 0
+
+
+def json_array_chunks(items: Iterable[Dict[str, Any]]) -> Iterator[str]:
+    """แปลงรายการเป็น JSON array ทีละรายการ (อ่านกลับได้ด้วย json.load หรือ iter_json_array)"""
+    yield "[\n"
+    for position, item in enumerate(items):
+        separator = ",\n" if position else ""
+        yield separator + json.dumps(dict(item), ensure_ascii=False)
+    yield "\n]\n"
+
+
+class MemoryLog:
+    """write-ahead log (JSONL) พร้อม snapshot สำหรับบันทึกความจำแบบ append-only
+
+    - ทุกการเปลี่ยนแปลงถูกต่อท้าย wal.jsonl พร้อมเลขลำดับ (seq)
+    - fsync เป็นชุด: ทุก ๆ sync_every รายการ หรือเมื่อผ่านไป sync_interval วินาที
+    - compact() เขียน snapshot.jsonl ใหม่แบบ atomic แล้วเริ่ม log ใหม่
+    - clear()/replace() บันทึกการล้าง (หรือแทนที่ทั้งหมด) เป็น checkpoint ที่มี cleared=True
+      ซึ่งคงอยู่ข้ามการ compact
+    - replay() อ่าน snapshot ตามด้วย log ส่วนท้าย (ข้าม seq ที่อยู่ใน snapshot แล้ว)
+    """
+
+    def __init__(self,
+                 directory: str = "data/memory_log",
+                 sync_every: int = 64,
+                 sync_interval: float = 1.0):
+        self.directory = directory
+        self.snapshot_path = os.path.join(directory, "snapshot.jsonl")
+        self.log_path = os.path.join(directory, "wal.jsonl")
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+
+        self.last_seq = 0
+        self.log_records = 0
+        # ความจำเคยถูกล้างหลังเริ่ม log นี้ (ข้อมูลฐานจากภายนอก เช่น snapshot แบบ mmap ไม่ควรถูกรวมอีก)
+        self.cleared = False
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._file: Optional[IO[str]] = None
+
+        os.makedirs(directory, exist_ok=True)
+
+    def replay(self) -> Iterator[Dict[str, Any]]:
+        """อ่านบันทึกทั้งหมด (snapshot + log) ตามลำดับ แล้วเปิด log สำหรับเขียนต่อ"""
+        self.close()
+        snapshot_seq = 0
+        self.cleared = False
+
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                header = f.readline()
+                if header:
+                    header = json.loads(header)
+                    snapshot_seq = header.get('last_seq', 0)
+                    self.cleared = header.get('cleared', False)
+                for line in f:
+                    if line.strip():
+                        yield {'op': 'add', 'memory': json.loads(line)}
+
+        self.last_seq = snapshot_seq
+        self.log_records = 0
+        valid_length = 0
+
+        if os.path.exists(self.log_path):
+            with open(self.log_path, 'rb') as f:
+                for raw_line in f:
+                    # บรรทัดสุดท้ายที่เขียนไม่ครบ (crash ระหว่างเขียน) จะถูกตัดทิ้ง
+                    if not raw_line.endswith(b'\n'):
+                        break
+                    try:
+                        record = json.loads(raw_line)
+                    except ValueError:
+                        break
+                    valid_length += len(raw_line)
+                    if record['seq'] <= snapshot_seq:
+                        continue
+                    self.last_seq = record['seq']
+                    self.log_records += 1
+                    yield record
+
+            if valid_length != os.path.getsize(self.log_path):
+                with open(self.log_path, 'r+b') as f:
+                    f.truncate(valid_length)
+
+        self._open()
+
+    def append(self, op: str, **fields):
+        """ต่อท้ายบันทึกหนึ่งรายการลง log"""
+        if self._file is None:
+            self._open()
+        self.last_seq += 1
+        record = {'seq': self.last_seq, 'op': op, **fields}
+        self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self.log_records += 1
+        self._unsynced += 1
+
+        if (self._unsynced >= self.sync_every or
+                time.monotonic() - self._last_sync >= self.sync_interval):
+            self.sync()
+
+    def sync(self):
+        """flush และ fsync ข้อมูลที่ค้างอยู่"""
+        if self._file is None or not self._unsynced:
+            return
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def clear(self):
+        """บันทึกการล้างความจำทั้งหมดเป็น checkpoint (snapshot ว่าง, seq ใหม่) แล้วเริ่ม log ใหม่"""
+        self.replace([])
+
+    def replace(self, memories: Iterable[Dict[str, Any]]):
+        """บันทึกว่าความจำถูกแทนที่ทั้งหมดด้วย memories (ข้อมูลฐานจากภายนอกไม่ถูกรวมอีก)"""
+        self.last_seq += 1
+        self.cleared = True
+        self.compact(memories)
+
+    def compact(self, memories: Iterable[Dict[str, Any]]):
+        """เขียน snapshot ใหม่จากความจำปัจจุบัน แล้วเริ่ม log ใหม่"""
+        self.sync()
+        header = {'last_seq': self.last_seq}
+        if self.cleared:
+            header['cleared'] = True
+        header = json.dumps(header) + '\n'
+        atomic_write(
+            self.snapshot_path,
+            chain([header], (json.dumps(memory, ensure_ascii=False) + '\n' for memory in memories))
+        )
+
+        # snapshot ครอบคลุมทุก seq แล้ว ตัด log ได้อย่างปลอดภัย
+        self.close()
+        with open(self.log_path, 'w', encoding='utf-8') as f:
+            f.flush()
+            os.fsync(f.fileno())
+        self.log_records = 0
+        self._open()
+
+    def close(self):
+        """sync และปิดไฟล์ log"""
+        if self._file is not None:
+            self.sync()
+            self._file.close()
+            self._file = None
+
+    def _open(self):
+        self._file = open(self.log_path, 'a', encoding='utf-8')
+        self._last_sync = time.monotonic()
+
+
+def _fsync_directory(directory: str):
+    """fsync โฟลเดอร์เพื่อให้การ rename ถูกบันทึกถาวร (ข้ามบนระบบที่ไม่รองรับ)"""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
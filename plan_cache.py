@@ -0,0 +1,210 @@
+# agent/plan_cache.py
+from typing import List, Dict, Any, Optional, Tuple
+from collections import OrderedDict
+import copy
+import hashlib
+import json
+import re
+import threading
+
+# คำที่บอกชนิดของงาน
+INTENT_KEYWORDS = [
+    'วิเคราะห์', 'เปรียบเทียบ', 'สร้างรายงาน', 'ค้นหา',
+    'คำนวณ', 'สรุป', 'แปล', 'ตรวจสอบ', 'จัดการ'
+]
+
+_URL = re.compile(r'https?://\S+')
+_QUOTED = re.compile(r'"([^"]+)"|“([^”]+)”|\'([^\']+)\'')
+_PLACEHOLDER = '{{arg{}}}'
+
+
+def task_signature(task: str) -> Tuple[Tuple[str, ...], Tuple[str, ...], Tuple[str, ...], List[str]]:
+    """แยกงานเป็น (ชนิดของงาน, ชนิดของอาร์กิวเมนต์, คำที่เหลือ, อาร์กิวเมนต์)
+
+    ชนิดของงานคือคำใน INTENT_KEYWORDS ตามลำดับที่พบ อาร์กิวเมนต์คือ URL และข้อความในเครื่องหมายคำพูด
+    คำที่เหลือ (หลังตัดชนิดงานและอาร์กิวเมนต์ออก ตัวพิมพ์เล็ก) เป็นโครงสร้างของงาน
+    งานที่ใช้แผนเดียวกันได้ต้องมีสามส่วนแรกเหมือนกัน
+    """
+    intents = tuple(sorted((keyword for keyword in INTENT_KEYWORDS if keyword in task), key=task.index))
+
+    kinds, args = [], []
+    for url in _URL.findall(task):
+        kinds.append('url')
+        args.append(url)
+    rest = _URL.sub(' ', task)
+    for match in _QUOTED.finditer(rest):
+        kinds.append('quoted')
+        args.append(next(group for group in match.groups() if group))
+    rest = _QUOTED.sub(' ', rest)
+
+    for keyword in intents:
+        rest = rest.replace(keyword, ' ')
+    words = tuple(word for word in (word.strip('.,:;?!') for word in rest.lower().split()) if word)
+    return intents, tuple(kinds), words, args
+
+
+def tools_fingerprint(available_tools: List[str]) -> str:
+    """ลายนิ้วมือของชุดเครื่องมือ (เปลี่ยนเมื่อเพิ่ม/ลบเครื่องมือ)"""
+    return hashlib.sha256("\x00".join(sorted(available_tools)).encode('utf-8')).hexdigest()
+
+
+def validate_plan(plan: Any, available_tools: List[str]) -> Optional[str]:
+    """ตรวจโครงสร้างของแผน คืนค่าข้อความอธิบายปัญหา (None หากถูกต้อง)"""
+    if not isinstance(plan, dict):
+        return "แผนต้องเป็น object"
+    steps = plan.get('steps')
+    if not isinstance(steps, list) or not steps:
+        return "แผนต้องมี steps อย่างน้อย 1 ขั้นตอน"
+
+    step_ids = set()
+    for index, step in enumerate(steps):
+        if not isinstance(step, dict) or not isinstance(step.get('description'), str):
+            return f"ขั้นตอนที่ {index + 1} ไม่มี description"
+        tool = step.get('tool')
+        if tool and tool not in available_tools:
+            return f"ไม่มีเครื่องมือ {tool}"
+        if not isinstance(step.get('parameters', {}), dict):
+            return f"parameters ของขั้นตอนที่ {index + 1} ต้องเป็น object"
+        step_ids.add(str(step.get('step', index + 1)))
+
+    for step in steps:
+        depends_on = step.get('depends_on')
+        if depends_on is None:
+            continue
+        if not isinstance(depends_on, list):
+            depends_on = [depends_on]
+        if any(str(dep) not in step_ids for dep in depends_on):
+            return f"depends_on ของขั้นตอน {step.get('step')} อ้างถึงขั้นตอนที่ไม่มี"
+    return None
+
+
+class PlanCache:
+    """cache ของแผนที่ทำงานสำเร็จ จัดกลุ่มตาม task signature
+
+    แผนถูกเก็บเป็น template โดยแทนอาร์กิวเมนต์ของงานด้วย placeholder
+    เมื่องานใหม่มี signature เดียวกันจะเติมอาร์กิวเมนต์ใหม่ลงไปแทนการเรียก LLM
+    ทั้งหมดถูกล้างเมื่อชุดเครื่องมือเปลี่ยน
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._templates: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+        self._fingerprint = None
+        self._lock = threading.Lock()
+
+        self.metrics = {
+            "hits": 0,
+            "misses": 0,
+            "stored": 0,
+            "rejected": 0,
+            "invalidations": 0,
+            "llm_calls_avoided": 0
+        }
+
+    def lookup(self, task: str, available_tools: List[str]) -> Optional[Dict[str, Any]]:
+        """คืนแผนสำหรับงานนี้จาก template (None หากไม่มีหรือใช้ไม่ได้)"""
+        intents, kinds, words, args = task_signature(task)
+        if not intents:
+            return None
+
+        key = (intents, kinds, words)
+        with self._lock:
+            self._check_tools(available_tools)
+            template = self._templates.get(key)
+            if template is None:
+                self.metrics["misses"] += 1
+                return None
+            self._templates.move_to_end(key)
+
+        plan = self._fill(copy.deepcopy(template), args)
+        if validate_plan(plan, available_tools) is not None:
+            with self._lock:
+                self._templates.pop(key, None)
+                self.metrics["misses"] += 1
+            return None
+
+        plan['from_cache'] = True
+        with self._lock:
+            self.metrics["hits"] += 1
+            self.metrics["llm_calls_avoided"] += 1
+        return plan
+
+    def store(self, task: str, plan: Dict[str, Any], available_tools: List[str]) -> bool:
+        """เก็บแผนที่ทำงานสำเร็จเป็น template คืนค่า True หากเก็บได้
+
+        แผนที่ไม่ผ่านการตรวจ หรือไม่ได้ใช้อาร์กิวเมนต์ทุกตัวของงาน (เช่น LLM เรียบเรียงคำใหม่)
+        จะไม่ถูกเก็บ เพราะเติมอาร์กิวเมนต์ของงานถัดไปลงไปไม่ได้
+        """
+        intents, kinds, words, args = task_signature(task)
+        if (not intents or plan.get('from_cache') or plan.get('fallback')
+                or validate_plan(plan, available_tools) is not None):
+            self._count("rejected")
+            return False
+
+        serialized = json.dumps(plan, ensure_ascii=False)
+        if any(json.dumps(arg, ensure_ascii=False)[1:-1] not in serialized for arg in args):
+            self._count("rejected")
+            return False
+
+        template = self._extract(copy.deepcopy(plan), args)
+        with self._lock:
+            self._check_tools(available_tools)
+            self._templates[(intents, kinds, words)] = template
+            self._templates.move_to_end((intents, kinds, words))
+            while len(self._templates) > self.max_entries:
+                self._templates.popitem(last=False)
+            self.metrics["stored"] += 1
+        return True
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """สถิติการใช้ cache (รวมอัตรา hit)"""
+        with self._lock:
+            metrics = dict(self.metrics)
+            metrics["templates"] = len(self._templates)
+        lookups = metrics["hits"] + metrics["misses"]
+        metrics["hit_rate"] = metrics["hits"] / lookups if lookups else 0.0
+        return metrics
+
+    def clear(self):
+        with self._lock:
+            self._templates.clear()
+
+    def _check_tools(self, available_tools: List[str]):
+        fingerprint = tools_fingerprint(available_tools)
+        if fingerprint != self._fingerprint:
+            if self._templates:
+                self.metrics["invalidations"] += 1
+            self._templates.clear()
+            self._fingerprint = fingerprint
+
+    def _extract(self, value: Any, args: List[str]) -> Any:
+        """แทนอาร์กิวเมนต์ด้วย placeholder (อาร์กิวเมนต์ยาวก่อน เพื่อไม่ให้ตัวสั้นตัดกลางคำ)"""
+        order = sorted(range(len(args)), key=lambda i: -len(args[i]))
+
+        def replace(text: str) -> str:
+            for i in order:
+                text = text.replace(args[i], _PLACEHOLDER.format(i))
+            return text
+
+        return self._map_strings(value, replace)
+
+    def _fill(self, value: Any, args: List[str]) -> Any:
+        def replace(text: str) -> str:
+            for i, arg in enumerate(args):
+                text = text.replace(_PLACEHOLDER.format(i), arg)
+            return text
+
+        return self._map_strings(value, replace)
+
+    def _map_strings(self, value: Any, function) -> Any:
+        if isinstance(value, str):
+            return function(value)
+        if isinstance(value, list):
+            return [self._map_strings(item, function) for item in value]
+        if isinstance(value, dict):
+            return {key: self._map_strings(item, function) for key, item in value.items()}
+        return value
+
+    def _count(self, name: str):
+        with self._lock:
+            self.metrics[name] += 1
@@ -1,12 +1,45 @@
 # agent/planner.py
 from typing import List, Dict, Any
+import contextvars
 import json
-from langchain_openai import ChatOpenAI
-from langchain.schema import SystemMessage, HumanMessage
+import re
+from .plan_cache import PlanCache, validate_plan
+from .tracing import span, token_usage, payload_bytes
+from .lazy import lazy_import
+from .llm_scheduler import ScheduledChatModel, STEP
+
+# import เมื่อใช้งานจริง (ดู lazy.py)
+asyncio = lazy_import("asyncio")
+futures = lazy_import("concurrent.futures")
+schema = lazy_import("langchain.schema")
+
+_JSON_FENCE = re.compile(r'```(?:json)?\s*(.*?)```', re.S)
+
+
+def _step_llm(agent):
+    """LLM ของ agent สำหรับขั้นตอนย่อยของแผน (ได้คิวหลังคำตอบที่ผู้ใช้รออยู่)"""
+    if isinstance(agent.llm, ScheduledChatModel):
+        return agent.llm.with_priority(STEP)
+    return agent.llm
+
 
 class TaskPlanner:
-    def __init__(self, llm):
+    def __init__(self,
+                 llm,
+                 max_workers: int = 4,
+                 response_cache=None,
+                 model_name: str = None,
+                 temperature: float = None,
+                 plan_cache: PlanCache = None):
         self.llm = llm
+        # แผนที่เคยทำสำเร็จ ใช้ซ้ำกับงานชนิดเดียวกันโดยไม่ต้องเรียก LLM
+        self.plan_cache = plan_cache
+        # cache คำตอบของ LLM (LLMResponseCache) ใช้ model_name/temperature เป็นส่วนหนึ่งของ key
+        self.response_cache = response_cache
+        self.model_name = model_name
+        self.temperature = temperature
+        # จำนวนขั้นตอนที่ทำงานพร้อมกันได้สูงสุด
+        self.max_workers = max_workers
         self.planning_prompt = """
         คุณเป็นผู้วางแผนที่ฉลาด ได้รับงานจากผู้ใช้แล้วแบ่งออกเป็นขั้นตอนย่อย ๆ
         
@@ -21,96 +54,283 @@ class TaskPlanner:
                     "description": "คำอธิบายขั้นตอน",
                     "tool": "เครื่องมือที่ใช้ (หากมี)",
                     "parameters": {{"key": "value"}},
-                    "expected_output": "ผลลัพธ์ที่คาดหวัง"
+                    "expected_output": "ผลลัพธ์ที่คาดหวัง",
+                    "depends_on": []
                 }}
             ],
             "success_criteria": "เงื่อนไขความสำเร็จ"
         }}
         
+        depends_on คือรายการหมายเลขขั้นตอนที่ต้องเสร็จก่อน ขั้นตอนที่ไม่ขึ้นต่อกันให้ใส่ [] เพื่อให้ทำพร้อมกันได้
+        
         งานที่ได้รับ: {task}
         """
     
     def create_plan(self, task: str, available_tools: List[str]) -> Dict[str, Any]:
         """สร้างแผนการทำงาน"""
+        if self.plan_cache is not None:
+            plan = self.plan_cache.lookup(task, available_tools)
+            if plan is not None:
+                return plan
+        
+        messages = self._planning_messages(task, available_tools)
+        with span("llm", purpose="planning", prompt_bytes=payload_bytes(messages)) as current:
+            if self.response_cache is not None:
+                response = self.response_cache.invoke(self.llm, messages, self.model_name, self.temperature, query=task)
+            else:
+                response = self.llm.invoke(messages)
+            current.set(response_bytes=payload_bytes(response.content), **token_usage(response))
+        return self._parse_plan(response.content, task, available_tools)
+    
+    async def acreate_plan(self, task: str, available_tools: List[str]) -> Dict[str, Any]:
+        """สร้างแผนการทำงานแบบ async"""
+        if self.plan_cache is not None:
+            plan = self.plan_cache.lookup(task, available_tools)
+            if plan is not None:
+                return plan
+        
+        messages = self._planning_messages(task, available_tools)
+        with span("llm", purpose="planning", prompt_bytes=payload_bytes(messages)) as current:
+            if self.response_cache is not None:
+                response = await self.response_cache.ainvoke(self.llm, messages, self.model_name, self.temperature, query=task)
+            else:
+                response = await self.llm.ainvoke(messages)
+            current.set(response_bytes=payload_bytes(response.content), **token_usage(response))
+        return self._parse_plan(response.content, task, available_tools)
+    
+    def record_result(self, task: str, execution_result: Dict[str, Any], available_tools: List[str]) -> bool:
+        """เก็บแผนลง plan cache เมื่อดำเนินการสำเร็จครบทุกขั้นตอน"""
+        if self.plan_cache is None or not execution_result.get('completed'):
+            return False
+        return self.plan_cache.store(task, execution_result['plan'], available_tools)
+    
+    def _planning_messages(self, task: str, available_tools: List[str]) -> List:
         prompt = self.planning_prompt.format(
             tools=", ".join(available_tools),
             task=task
         )
         
-        messages = [SystemMessage(content=prompt)]
-        response = self.llm(messages)
+        return [schema.SystemMessage(content=prompt)]
+    
+    def _parse_plan(self, content: str, task: str, available_tools: List[str]) -> Dict[str, Any]:
+        plan = self._extract_json(content)
+        if validate_plan(plan, available_tools) is None:
+            return plan
+        
+        # ถ้า parse ไม่ได้หรือแผนไม่ถูกต้องให้สร้างแผนง่าย ๆ (ไม่เก็บลง plan cache)
+        return {
+            "goal": task,
+            "fallback": True,
+            "steps": [
+                {
+                    "step": 1,
+                    "description": f"ทำงาน: {task}",
+                    "tool": None,
+                    "parameters": {},
+                    "expected_output": "ผลลัพธ์ตามที่ร้องขอ"
+                }
+            ],
+            "success_criteria": "งานเสร็จสมบูรณ์"
+        }
+    
+    def _extract_json(self, content: str) -> Any:
+        """แยก JSON object จาก response: ทั้งข้อความ, ใน code block หรือ object แรกที่พบ"""
+        candidates = [content]
+        candidates.extend(match.group(1) for match in _JSON_FENCE.finditer(content))
+        for candidate in candidates:
+            try:
+                return json.loads(candidate)
+            except ValueError:
+                pass
+        
+        decoder = json.JSONDecoder()
+        start = content.find('{')
+        while start != -1:
+            try:
+                return decoder.raw_decode(content, start)[0]
+            except ValueError:
+                start = content.find('{', start + 1)
+        return None
+    
+    def execute_plan(self, plan: Dict[str, Any], tool_manager, agent) -> Dict[str, Any]:
+        """ดำเนินการตามแผน (ขั้นตอนที่ไม่ขึ้นต่อกันทำพร้อมกัน)"""
+        steps = plan['steps']
+        step_ids = [step.get('step', index + 1) for index, step in enumerate(steps)]
+        dependencies = self._resolve_dependencies(steps, step_ids)
+        
+        outcomes = {}
+        pending = set(range(len(steps)))
+        running = {}
+        skipped = []
+        
+        with futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending or running:
+                for index in sorted(pending):
+                    deps = dependencies[index]
+                    if any(dep in skipped or (dep in outcomes and not outcomes[dep]['success']) for dep in deps):
+                        # ขั้นตอนที่ขึ้นต่อขั้นตอนที่ล้มเหลวจะไม่ถูกทำ (หยุดเฉพาะสายนั้น)
+                        pending.discard(index)
+                        skipped.append(index)
+                    elif all(dep in outcomes for dep in deps):
+                        pending.discard(index)
+                        step = steps[index]
+                        print(f"กำลังดำเนินการขั้นตอนที่ {step_ids[index]}: {step['description']}")
+                        # ส่ง context (trace ปัจจุบัน) ไปยัง thread ที่ทำงาน
+                        future = executor.submit(contextvars.copy_context().run,
+                                                 self._execute_step, step, step_ids[index], tool_manager, agent)
+                        running[future] = index
+                
+                if not running:
+                    # เหลือแต่ขั้นตอนที่รอกันเป็นวง ทำต่อไม่ได้
+                    skipped.extend(sorted(pending))
+                    pending.clear()
+                    break
+                
+                done, _ = futures.wait(running, return_when=futures.FIRST_COMPLETED)
+                for future in done:
+                    outcomes[running.pop(future)] = future.result()
+        
+        # เรียงผลลัพธ์ตามลำดับในแผน
+        results = [outcomes[index] for index in range(len(steps)) if index in outcomes]
+        
+        return {
+            "plan": plan,
+            "results": results,
+            "skipped": [step_ids[index] for index in sorted(skipped)],
+            "completed": not skipped and all(r['success'] for r in results)
+        }
+    
+    async def aexecute_plan(self, plan: Dict[str, Any], tool_manager, agent) -> Dict[str, Any]:
+        """ดำเนินการตามแผนแบบ async (กติกาเดียวกับ execute_plan)"""
+        steps = plan['steps']
+        step_ids = [step.get('step', index + 1) for index, step in enumerate(steps)]
+        dependencies = self._resolve_dependencies(steps, step_ids)
+        limit = asyncio.Semaphore(self.max_workers)
+        tasks = {}
+        
+        async def run(index: int):
+            # รอขั้นตอนที่ขึ้นต่อ หากล้มเหลวหรือถูกข้ามให้ข้ามขั้นตอนนี้ด้วย (คืนค่า None)
+            for dep in dependencies[index]:
+                outcome = await tasks[dep]
+                if outcome is None or not outcome['success']:
+                    return None
+            async with limit:
+                step = steps[index]
+                print(f"กำลังดำเนินการขั้นตอนที่ {step_ids[index]}: {step['description']}")
+                return await self._aexecute_step(step, step_ids[index], tool_manager, agent)
+        
+        order = self._topological_order(dependencies)
+        for index in order:
+            tasks[index] = asyncio.ensure_future(run(index))
+        if tasks:
+            await asyncio.gather(*tasks.values())
+        
+        outcomes = {index: task.result() for index, task in tasks.items()}
+        results = [outcomes[index] for index in range(len(steps)) if outcomes.get(index) is not None]
+        skipped = [index for index in range(len(steps)) if outcomes.get(index) is None]
+        
+        return {
+            "plan": plan,
+            "results": results,
+            "skipped": [step_ids[index] for index in skipped],
+            "completed": not skipped and all(r['success'] for r in results)
+        }
+    
+    def _topological_order(self, dependencies: List[List[int]]) -> List[int]:
+        """ลำดับขั้นตอนที่ทุกขั้นตอนมาหลังขั้นตอนที่มันขึ้นต่อ (ขั้นตอนที่วนกันจะไม่อยู่ในผลลัพธ์)"""
+        order = []
+        placed = set()
+        remaining = list(range(len(dependencies)))
+        while remaining:
+            ready = [index for index in remaining if all(dep in placed for dep in dependencies[index])]
+            if not ready:
+                break
+            order.extend(ready)
+            placed.update(ready)
+            remaining = [index for index in remaining if index not in placed]
+        return order
+    
+    def _resolve_dependencies(self, steps: List[Dict[str, Any]], step_ids: List[Any]) -> List[List[int]]:
+        """แปลง depends_on เป็นตำแหน่งของขั้นตอน (ไม่ระบุ = ขึ้นต่อขั้นตอนก่อนหน้า เหมือนการทำตามลำดับ)"""
+        positions = {str(step_id): index for index, step_id in enumerate(step_ids)}
+        dependencies = []
+        for index, step in enumerate(steps):
+            declared = step.get('depends_on')
+            if declared is None:
+                dependencies.append([index - 1] if index else [])
+                continue
+            if not isinstance(declared, list):
+                declared = [declared]
+            dependencies.append([positions[str(dep)] for dep in declared
+                                 if str(dep) in positions and positions[str(dep)] != index])
+        return dependencies
+    
+    def _execute_step(self, step: Dict[str, Any], step_id: Any, tool_manager, agent) -> Dict[str, Any]:
+        """ทำงานหนึ่งขั้นตอน"""
+        step_result = {
+            "step": step_id,
+            "description": step['description'],
+            "success": False,
+            "output": None,
+            "error": None
+        }
         
         try:
-            # แยก JSON จาก response
-            content = response.content
-            if "```json" in content:
-                json_str = content.split("```json")[1].split("```")[0]
+            if step.get('tool'):
+                # ใช้เครื่องมือ
+                tool_result = tool_manager.use_tool(
+                    step['tool'], 
+                    **step.get('parameters', {})
+                )
+                
+                if tool_result['success']:
+                    step_result['success'] = True
+                    step_result['output'] = tool_result['result']
+                else:
+                    step_result['error'] = tool_result['error']
             else:
-                json_str = content
+                # ทำงานโดยตรง
+                with span("llm", purpose="step", step=step_id) as current:
+                    response = _step_llm(agent).invoke([schema.HumanMessage(content=step['description'])])
+                    current.set(response_bytes=payload_bytes(response.content), **token_usage(response))
+                step_result['success'] = True
+                step_result['output'] = response.content
             
-            plan = json.loads(json_str)
-            return plan
         except Exception as e:
-            # ถ้า parse ไม่ได้ให้สร้างแผนง่าย ๆ
-            return {
-                "goal": task,
-                "steps": [
-                    {
-                        "step": 1,
-                        "description": f"ทำงาน: {task}",
-                        "tool": None,
-                        "parameters": {},
-                        "expected_output": "ผลลัพธ์ตามที่ร้องขอ"
-                    }
-                ],
-                "success_criteria": "งานเสร็จสมบูรณ์"
-            }
+            step_result['error'] = str(e)
+        
+        return step_result
     
-    def execute_plan(self, plan: Dict[str, Any], tool_manager, agent) -> Dict[str, Any]:
-        """ดำเนินการตามแผน"""
-        results = []
+    async def _aexecute_step(self, step: Dict[str, Any], step_id: Any, tool_manager, agent) -> Dict[str, Any]:
+        """ทำงานหนึ่งขั้นตอนแบบ async"""
+        step_result = {
+            "step": step_id,
+            "description": step['description'],
+            "success": False,
+            "output": None,
+            "error": None
+        }
         
-        for step in plan['steps']:
-            print(f"กำลังดำเนินการขั้นตอนที่ {step['step']}: {step['description']}")
-            
-            step_result = {
-                "step": step['step'],
-                "description": step['description'],
-                "success": False,
-                "output": None,
-                "error": None
-            }
-            
-            try:
-                if step.get('tool'):
-                    # ใช้เครื่องมือ
-                    tool_result = tool_manager.use_tool(
-                        step['tool'], 
-                        **step.get('parameters', {})
-                    )
-                    
-                    if tool_result['success']:
-                        step_result['success'] = True
-                        step_result['output'] = tool_result['result']
-                    else:
-                        step_result['error'] = tool_result['error']
-                else:
-                    # ทำงานโดยตรง
-                    response = agent.llm([HumanMessage(content=step['description'])])
-                    step_result['success'] = True
-                    step_result['output'] = response.content
+        try:
+            if step.get('tool'):
+                tool_result = await tool_manager.ause_tool(
+                    step['tool'], 
+                    **step.get('parameters', {})
+                )
                 
-            except Exception as e:
-                step_result['error'] = str(e)
-            
-            results.append(step_result)
+                if tool_result['success']:
+                    step_result['success'] = True
+                    step_result['output'] = tool_result['result']
+                else:
+                    step_result['error'] = tool_result['error']
+            else:
+                with span("llm", purpose="step", step=step_id) as current:
+                    response = await _step_llm(agent).ainvoke([schema.HumanMessage(content=step['description'])])
+                    current.set(response_bytes=payload_bytes(response.content), **token_usage(response))
+                step_result['success'] = True
+                step_result['output'] = response.content
             
-            # ถ้าขั้นตอนล้มเหลวให้หยุด
-            if not step_result['success']:
-                break
+        except Exception as e:
+            step_result['error'] = str(e)
         
-        return {
-            "plan": plan,
-            "results": results,
-            "completed": all(r['success'] for r in results)
-        }
\ No newline at end of file
+        return step_result
\ No newline at end of file
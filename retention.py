@@ -0,0 +1,148 @@
+# agent/retention.py
+from typing import List, Dict, Any, Iterable, Optional, Tuple
+from datetime import datetime, timedelta
+import heapq
+import json
+import os
+
+from .memory_store import timestamp_micros
+
+
+class RetentionPolicy:
+    """นโยบายการเก็บความจำ: จำนวนสูงสุด, ขนาดสูงสุด (ไบต์), อายุ (TTL) และ LRU ตามจำนวนครั้งที่ถูกค้นเจอ
+
+    เมื่อเกินขีดจำกัดจะคัดออกจนเหลือ (1 - evict_fraction) ของขีดจำกัด
+    เพื่อไม่ต้องคัดเลือกใหม่ทุกครั้งที่เพิ่มความจำ
+    """
+
+    def __init__(self,
+                 max_entries: int = None,
+                 max_bytes: int = None,
+                 ttl_seconds: float = None,
+                 lru: bool = False,
+                 evict_fraction: float = 0.1):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.lru = lru
+        self.evict_fraction = evict_fraction
+
+    def expiry_cutoff(self, now: datetime = None, grace: float = 0.0) -> Optional[int]:
+        """timestamp (ไมโครวินาที) ที่เก่ากว่านี้ถือว่าหมดอายุ"""
+        if self.ttl_seconds is None:
+            return None
+        now = now or datetime.now()
+        age = timedelta(seconds=self.ttl_seconds * (1 + grace))
+        return timestamp_micros((now - age).isoformat())
+
+    def needs_eviction(self, count: int, total_bytes: int, oldest_timestamp: Optional[int]) -> bool:
+        """ตรวจแบบ O(1) ว่าต้องคัดความจำออกหรือไม่
+
+        สำหรับ TTL จะรอจนความจำเก่าสุดเกินอายุไปอีก evict_fraction ของ TTL
+        แล้วคัดทุกรายการที่หมดอายุออกพร้อมกัน
+        """
+        if self.max_entries is not None and count > self.max_entries:
+            return True
+        if self.max_bytes is not None and total_bytes > self.max_bytes:
+            return True
+        cutoff = self.expiry_cutoff(grace=self.evict_fraction)
+        return cutoff is not None and oldest_timestamp is not None and oldest_timestamp < cutoff
+
+    def select(self, entries: Iterable[Tuple[Any, int, int, int]], now: datetime = None) -> List[Any]:
+        """เลือกความจำที่จะคัดออก
+
+        entries: (key, timestamp_micros, size_bytes, hits) ของความจำที่ยังอยู่
+        คืนค่า key ของความจำที่ต้องคัดออก
+        """
+        cutoff = self.expiry_cutoff(now)
+        victims = []
+        kept = []
+        for entry in entries:
+            if cutoff is not None and entry[1] is not None and entry[1] < cutoff:
+                victims.append(entry[0])
+            else:
+                kept.append(entry)
+
+        count = len(kept)
+        total_bytes = sum(entry[2] for entry in kept)
+        keep_fraction = 1 - self.evict_fraction
+        target_entries = (int(self.max_entries * keep_fraction)
+                          if self.max_entries is not None and count > self.max_entries else None)
+        target_bytes = (int(self.max_bytes * keep_fraction)
+                        if self.max_bytes is not None and total_bytes > self.max_bytes else None)
+        if target_entries is None and target_bytes is None:
+            return victims
+
+        # LRU: ถูกค้นเจอน้อยที่สุดก่อน (เท่ากันให้เก่าสุดก่อน) ไม่เช่นนั้นเก่าสุดก่อน (FIFO)
+        if self.lru:
+            order = sorted(kept, key=lambda entry: (entry[3], entry[1] or 0))
+        else:
+            order = sorted(kept, key=lambda entry: entry[1] or 0)
+
+        for entry in order:
+            over_entries = target_entries is not None and count > target_entries
+            over_bytes = target_bytes is not None and total_bytes > target_bytes
+            if not (over_entries or over_bytes):
+                break
+            victims.append(entry[0])
+            count -= 1
+            total_bytes -= entry[2]
+        return victims
+
+
+class ColdTier:
+    """ที่เก็บความจำที่ถูกคัดออกบนดิสก์ (JSONL) ค้นหาเมื่อ hot tier ได้ผลลัพธ์ไม่พอเท่านั้น"""
+
+    def __init__(self, path: str = "data/cold_memory.jsonl"):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def append(self, memories: Iterable[Dict[str, Any]]) -> int:
+        """ต่อท้ายความจำที่ถูกคัดออก คืนค่าจำนวนที่บันทึก"""
+        count = 0
+        with open(self.path, 'a', encoding='utf-8') as f:
+            for memory in memories:
+                f.write(json.dumps(dict(memory), ensure_ascii=False) + '\n')
+                count += 1
+            f.flush()
+            os.fsync(f.fileno())
+        return count
+
+    def search(self, query_keywords: List[str], n_results: int, namespace: str = None) -> List[Dict[str, Any]]:
+        """ค้นหาแบบ Jaccard โดยอ่านไฟล์ทีละบรรทัด (ไม่โหลดทั้งไฟล์) เฉพาะ namespace ที่ระบุ (ถ้ามี)"""
+        if not query_keywords or n_results <= 0 or not os.path.exists(self.path):
+            return []
+
+        query_set = set(query_keywords)
+
+        def scored():
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line_number, line in enumerate(f):
+                    if not line.strip():
+                        continue
+                    memory = json.loads(line)
+                    if namespace is not None and (memory.get('metadata') or {}).get('namespace') != namespace:
+                        continue
+                    keywords = set(memory.get('keywords') or ())
+                    intersection = len(query_set & keywords)
+                    if intersection:
+                        union = len(query_set) + len(keywords) - intersection
+                        yield 1 - intersection / union, line_number, memory
+
+        best = heapq.nsmallest(n_results, scored(), key=lambda item: item[:2])
+        return [{**memory, 'distance': distance} for distance, _, memory in best]
+
+    def clear(self):
+        """ลบความจำทั้งหมดใน cold tier (ตัดไฟล์ให้ว่าง)"""
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.flush()
+            os.fsync(f.fileno())
+
+    def count(self) -> int:
+        """จำนวนความจำใน cold tier"""
+        if not os.path.exists(self.path):
+            return 0
+        with open(self.path, 'rb') as f:
+            return sum(1 for line in f if line.strip())
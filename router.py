@@ -0,0 +1,511 @@
+# agent/router.py
+"""เลือกเส้นทางการประมวลผลคำขอตามจำนวนครั้งที่คาดว่าจะเรียก LLM
+
+เส้นทาง:
+- fast: คำขอที่ตอบได้ด้วยเครื่องมือโดยตรง (เวลา, เลขคณิต) ไม่เรียก LLM เลย
+- direct: ตอบด้วย LLM หนึ่งครั้ง
+- plan: วางแผน (LLM หนึ่งครั้ง เว้นแต่แผนอยู่ใน cache) แล้วทำตามแผน (LLM หนึ่งครั้งต่อขั้นตอนที่ไม่ใช้เครื่องมือ)
+
+คุณลักษณะของคำขอหาด้วย Aho–Corasick (ผ่านข้อความครั้งเดียวได้ทุก pattern) แล้วประเมินความน่าจะเป็น
+ที่ต้องใช้เครื่องมือ/หลายขั้นตอนด้วย logistic regression ขนาดเล็ก ซึ่ง train ได้ offline จาก log:
+
+    python -m agent.router train --log data/routing_log.jsonl
+    python -m agent.router evaluate --log data/routing_log.jsonl
+"""
+from .persistence import atomic_write
+from .thai_tokenizer import tokenize
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
+from collections import deque
+from datetime import datetime
+import argparse
+import json
+import math
+import os
+import random
+import re
+import threading
+import zlib
+
+DEFAULT_MODEL_PATH = "data/router_model.json"
+# ตำแหน่ง log เริ่มต้นของคำสั่ง train/evaluate (Router ไม่เขียน log จนกว่าจะระบุ log_path เอง)
+DEFAULT_LOG_PATH = "data/routing_log.jsonl"
+
+# pattern ของคุณลักษณะแต่ละกลุ่ม (จับแบบ substring ไม่สนตัวพิมพ์เล็ก/ใหญ่ จึงใช้กับภาษาไทยที่ไม่เว้นวรรคได้)
+CUES = {
+    "search": ["ค้นหา", "หาข้อมูล", "ข่าว", "ล่าสุด", "search", "google", "news", "latest"],
+    "web": ["http://", "https://", "www.", "เว็บ", "website", "url"],
+    "file": ["ไฟล์", "บันทึกลง", "บันทึกโน้ต", "บันทึกโน๊ต", ".txt", ".md", "file", "save"],
+    "data": [".csv", ".parquet", "ตาราง", "คอลัมน์", "ยอดขาย", "dataset", "column", "group by"],
+    "math": ["คำนวณ", "บวก", "ลบ", "คูณ", "หาร", "เปอร์เซ็นต์", "ร้อยละ", "calculate", "compute",
+             "+", "*", "/", "^", "%"],
+    "time": ["กี่โมง", "เวลา", "วันที่", "what time", "date", "time"],
+    "analysis": ["วิเคราะห์", "เปรียบเทียบ", "สร้างรายงาน", "รายงาน", "สรุป", "ตรวจสอบ", "จัดการ",
+                 "analy", "compare", "report", "summar"],
+    "sequence": ["แล้ว", "จากนั้น", "หลังจากนั้น", "ต่อด้วย", "ขั้นตอน", "ทีละ", "then", "after that", "step"],
+    "translate": ["แปล", "translate"],
+    "chitchat": ["สวัสดี", "ขอบคุณ", "คุณคือใคร", "ชื่ออะไร", "hello", "thank"],
+    "explain": ["คืออะไร", "อธิบาย", "ทำไม", "อย่างไร", "ยังไง", "what is", "why", "how", "explain"],
+}
+
+# น้ำหนักเริ่มต้นก่อน train (ใกล้เคียง keyword เดิมแต่ไม่นับงานที่ LLM ตอบเองได้ เช่น แปล/สรุป/อธิบาย)
+DEFAULT_WEIGHTS = {
+    "cue:search": 2.0, "cue:web": 2.0, "cue:file": 2.0, "cue:data": 2.0,
+    "cue:math": 1.0, "cue:time": 0.5, "cue:analysis": 1.0, "cue:sequence": 1.0,
+    "cue:translate": -0.5, "cue:chitchat": -2.0, "cue:explain": -1.0,
+    "len:long": 0.5, "cues:many": 0.5,
+}
+DEFAULT_BIAS = -1.5
+
+# คำขอเวลา: ต้องมีคำหลักอย่างน้อยหนึ่งคำ และทุกคำต้องอยู่ในชุด _TIME_WORDS
+_TIME_CORE = ("กี่โมง", "เวลา", "วันที่", "time", "date")
+_TIME_WORDS = {
+    "โมง", "เวลา", "วันที่", "time", "date", "ตอนนี้", "ขณะนี้", "กี่", "วันนี้", "วัน", "ที่",
+    "เท่าไร", "เท่าไหร่", "แล้ว", "บอก", "ขอ", "ดู", "ช่วย", "หน่อย", "ครับ", "ค่ะ", "คะ", "นะ",
+    "what", "is", "it", "now", "the", "current", "today", "s"
+}
+# เลขคณิต: ตัดคำนำ/คำท้ายออก แปลงคำเป็นเครื่องหมาย แล้วส่วนที่เหลือต้องเป็นนิพจน์ล้วน
+_MATH_PREFIX = re.compile(r'^\s*(ช่วย)?\s*(คำนวณ|คิดเลข|หาค่า(ของ)?|calculate|compute|what\s+is|what\'s)?\s*', re.I)
+_MATH_SUFFIX = re.compile(
+    r'\s*(=|เท่ากับ|ได้)?\s*(เท่าไร|เท่าไหร่|อะไร)?\s*(ครับ|ค่ะ|คะ|หน่อย|นะ)*\s*[?？]*\s*$', re.I
+)
+_MATH_WORDS = [("บวก", "+"), ("ลบ", "-"), ("คูณ", "*"), ("หาร", "/"), ("×", "*"), ("x", "*"),
+               ("÷", "/"), ("^", "**")]
+_ARITHMETIC = re.compile(r'^[\d\s.+\-*/()%]+$')
+_OPERATOR = re.compile(r'\d\s*(\*\*|[+\-*/%])\s*[\d(]')
+_THOUSANDS = re.compile(r'(?<=\d),(?=\d{3}\b)')
+
+
+class AhoCorasick:
+    """ค้นหาหลาย pattern ในข้อความด้วยการอ่านครั้งเดียว (เวลาไม่ขึ้นกับจำนวน pattern)"""
+
+    def __init__(self, patterns: Dict[str, Iterable[str]]):
+        # goto[state][char] -> state, fail[state], output[state] = [(pattern, label)]
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[Tuple[str, str]]] = [[]]
+        for label, words in patterns.items():
+            for word in words:
+                self._add(word.lower(), label)
+        self._build()
+
+    def _add(self, word: str, label: str):
+        state = 0
+        for char in word:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = next_state
+        self._output[state].append((word, label))
+
+    def _build(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def find(self, text: str) -> Iterator[Tuple[int, str, str]]:
+        """yield (ตำแหน่งท้าย, pattern, label) ของทุก pattern ที่พบ (รวมที่ซ้อนกัน)"""
+        state = 0
+        for position, char in enumerate(text.lower()):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            for word, label in self._output[state]:
+                yield position, word, label
+
+
+def legacy_complexity(task: str) -> float:
+    """คะแนนความซับซ้อนแบบเดิม (keyword ละ 0.2 + ความยาว) ใช้เปรียบเทียบใน evaluate"""
+    complex_keywords = [
+        'วิเคราะห์', 'เปรียบเทียบ', 'สร้างรายงาน', 'ค้นหา',
+        'คำนวณ', 'สรุป', 'แปล', 'ตรวจสอบ', 'จัดการ'
+    ]
+    score = 0.3 + 0.2 * sum(1 for keyword in complex_keywords if keyword in task)
+    if len(task.split()) > 10:
+        score += 0.2
+    return min(score, 1.0)
+
+
+def llm_calls(response_data: Dict[str, Any]) -> Optional[int]:
+    """จำนวนครั้งที่เรียก LLM จริง นับจาก span "llm" ใน trace (ไม่นับที่ได้จาก cache)"""
+    trace = response_data.get("trace")
+    if not trace:
+        return None
+    return sum(1 for current in trace.get("spans", [])
+               if current["name"] == "llm" and not current["attributes"].get("cached"))
+
+
+def label_of(record: Dict[str, Any]) -> Optional[str]:
+    """เส้นทางที่ควรใช้ของคำขอใน log: "plan" หรือ "direct" (None = ไม่ใช้ train)
+
+    label ที่ระบุเองใน record["label"] มาก่อน ไม่เช่นนั้นงานที่วางแผนแล้วมีขั้นตอนที่ใช้เครื่องมือสำเร็จ = plan,
+    วางแผนแต่ทุกขั้นตอนเป็น LLM ล้วน หรือตอบตรงได้สำเร็จ = direct
+    """
+    if record.get("label") in ("plan", "direct"):
+        return record["label"]
+    if record.get("route") == "fast":
+        return None
+    if record.get("planning_used"):
+        return "plan" if record.get("tool_steps", 0) > 0 else "direct"
+    return "direct" if record.get("success") else None
+
+
+class Router:
+    """เลือกเส้นทาง fast/direct/plan ที่คาดว่าเรียก LLM น้อยที่สุด
+
+    ต้นทุนที่คาดหวัง (จำนวนครั้งที่เรียก LLM):
+    - direct = direct_calls + p(plan) * miss_cost  (ตอบตรงทั้งที่ต้องใช้เครื่องมือ ผู้ใช้ต้องถามซ้ำ)
+    - plan   = plan_calls
+    direct_calls และ plan_calls เรียนจาก log (รวมผลของ cache แล้ว) miss_cost กำหนดเอง
+
+    log สำหรับ train เปิดเมื่อระบุ log_path เท่านั้น (เช่น Router.load(log_path=DEFAULT_LOG_PATH))
+    แต่ละบรรทัดเก็บข้อความคำขอของผู้ใช้ตามจริง และไฟล์โตขึ้นเรื่อย ๆ ไม่มีการหมุนไฟล์
+    """
+
+    def __init__(self,
+                 weights: Dict[str, float] = None,
+                 bias: float = DEFAULT_BIAS,
+                 direct_calls: float = 1.0,
+                 plan_calls: float = 2.5,
+                 miss_cost: float = 3.0,
+                 fast_path: bool = True,
+                 log_path: Optional[str] = None,
+                 cues: Dict[str, List[str]] = None):
+        self.weights = dict(DEFAULT_WEIGHTS if weights is None else weights)
+        self.bias = bias
+        self.direct_calls = direct_calls
+        self.plan_calls = plan_calls
+        self.miss_cost = miss_cost
+        self.fast_path = fast_path
+        self.log_path = log_path
+        self.matcher = AhoCorasick(cues or CUES)
+        self.trained_on = 0
+        self._lock = threading.Lock()
+        self._routes = {"fast": 0, "direct": 0, "plan": 0}
+        self._calls_saved = 0.0
+
+    # ---------- การเลือกเส้นทาง ----------
+
+    def features(self, text: str) -> Dict[str, float]:
+        """คุณลักษณะแบบ binary ของคำขอ: กลุ่ม cue, pattern ที่พบ, ความยาว และตัวเลข/URL"""
+        found = {}
+        labels = set()
+        for _, word, label in self.matcher.find(text):
+            found[f"kw:{word}"] = 1.0
+            labels.add(label)
+        for label in labels:
+            found[f"cue:{label}"] = 1.0
+        if len(labels) >= 3:
+            found["cues:many"] = 1.0
+        words = len(tokenize(text))
+        found["len:long" if words > 20 else "len:medium" if words > 6 else "len:short"] = 1.0
+        if any(char.isdigit() for char in text):
+            found["digits"] = 1.0
+        return found
+
+    def predict(self, text: str) -> float:
+        """ความน่าจะเป็นที่คำขอต้องใช้เครื่องมือ/หลายขั้นตอน"""
+        return self._probability(self.features(text))
+
+    def _probability(self, features: Dict[str, float]) -> float:
+        z = self.bias + sum(self.weights.get(name, 0.0) * value for name, value in features.items())
+        return 1.0 / (1.0 + math.exp(-max(-30.0, min(30.0, z))))
+
+    def expected_calls(self, probability: float) -> Dict[str, float]:
+        return {
+            "direct": self.direct_calls + probability * self.miss_cost,
+            "plan": self.plan_calls
+        }
+
+    def _choose(self, probability: float, use_planning: bool) -> str:
+        costs = self.expected_calls(probability)
+        return "plan" if use_planning and costs["plan"] < costs["direct"] else "direct"
+
+    def route(self, text: str, use_planning: bool = True) -> Dict[str, Any]:
+        """เลือกเส้นทาง คืนค่า {"route", "complexity", "expected_calls", "tool", "arguments"}"""
+        if self.fast_path:
+            fast = self.fast_route(text)
+            if fast is not None:
+                return self._count({"route": "fast", "complexity": 0.0,
+                                    "expected_calls": {"fast": 0.0}, **fast}, text, use_planning)
+
+        probability = self.predict(text)
+        costs = self.expected_calls(probability)
+        return self._count({
+            "route": self._choose(probability, use_planning),
+            "complexity": round(probability, 4),
+            "expected_calls": {name: round(cost, 3) for name, cost in costs.items()},
+            "tool": None,
+            "arguments": {}
+        }, text, use_planning)
+
+    def fast_route(self, text: str) -> Optional[Dict[str, Any]]:
+        """คำขอที่เครื่องมือตอบได้ทันที: {"tool", "arguments"} หรือ None"""
+        expression = arithmetic_expression(text)
+        if expression is not None:
+            return {"tool": "calculator", "arguments": {"expression": expression}}
+        lowered = text.lower()
+        if any(core in lowered for core in _TIME_CORE) and all(word in _TIME_WORDS for word in tokenize(lowered)):
+            return {"tool": "get_time", "arguments": {}}
+        return None
+
+    def _count(self, decision: Dict[str, Any], text: str, use_planning: bool) -> Dict[str, Any]:
+        # ประมาณจำนวนครั้งที่ประหยัดได้เทียบกับเกณฑ์เดิม (complexity > 0.7 = วางแผน)
+        legacy = self.plan_calls if use_planning and legacy_complexity(text) > 0.7 else self.direct_calls
+        chosen = {"fast": 0.0, "direct": self.direct_calls, "plan": self.plan_calls}[decision["route"]]
+        with self._lock:
+            self._routes[decision["route"]] += 1
+            self._calls_saved += legacy - chosen
+        return decision
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "routes": dict(self._routes),
+                "estimated_llm_calls_saved": round(self._calls_saved, 2),
+                "trained_on": self.trained_on,
+                "direct_calls": self.direct_calls,
+                "plan_calls": self.plan_calls
+            }
+
+    # ---------- log สำหรับ train ----------
+
+    def record(self, response_data: Dict[str, Any]):
+        """เพิ่มผลของคำขอ (รวมข้อความของผู้ใช้) ลง log (JSONL) ไม่ทำอะไรถ้า log_path เป็น None"""
+        if self.log_path is None:
+            return
+        plan = response_data.get("plan") or {}
+        execution = response_data.get("execution_result") or {}
+        tool_steps = {step.get("step", index + 1) for index, step in enumerate(plan.get("steps", []))
+                      if step.get("tool")}
+        entry = {
+            "timestamp": datetime.now().isoformat(),
+            "input": response_data.get("user_input", ""),
+            "route": response_data.get("route"),
+            "complexity": response_data.get("complexity_score"),
+            "planning_used": bool(response_data.get("planning_used")),
+            "success": bool(response_data.get("success")),
+            "llm_calls": llm_calls(response_data),
+            "steps": len(plan.get("steps", [])),
+            "tool_steps": sum(1 for result in execution.get("results", [])
+                              if result["success"] and result["step"] in tool_steps),
+            "plan_cached": bool(plan.get("from_cache"))
+        }
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            directory = os.path.dirname(self.log_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+    # ---------- train / evaluate ----------
+
+    def train(self,
+              records: Iterable[Dict[str, Any]],
+              epochs: int = 30,
+              learning_rate: float = 0.2,
+              l2: float = 1e-3,
+              min_records: int = 20) -> Dict[str, Any]:
+        """train logistic regression และต้นทุนของแต่ละเส้นทางจาก log (น้อยกว่า min_records = คงค่าเดิม)"""
+        records = list(records)
+        samples = [(self.features(record["input"]), 1.0 if label == "plan" else 0.0)
+                   for record, label in ((record, label_of(record)) for record in records) if label]
+        self._learn_costs(records)
+        if len(samples) < min_records:
+            return {"trained": False, "samples": len(samples)}
+
+        weights: Dict[str, float] = {}
+        bias = 0.0
+        order = list(range(len(samples)))
+        shuffle = random.Random(0)
+        for epoch in range(epochs):
+            shuffle.shuffle(order)
+            rate = learning_rate / (1 + epoch * 0.1)
+            for index in order:
+                features, target = samples[index]
+                z = bias + sum(weights.get(name, 0.0) * value for name, value in features.items())
+                error = 1.0 / (1.0 + math.exp(-max(-30.0, min(30.0, z)))) - target
+                bias -= rate * error
+                for name, value in features.items():
+                    weight = weights.get(name, 0.0)
+                    weights[name] = weight - rate * (error * value + l2 * weight)
+
+        self.weights = {name: round(weight, 4) for name, weight in weights.items() if abs(weight) > 1e-4}
+        self.bias = round(bias, 4)
+        self.trained_on = len(samples)
+        return {"trained": True, "samples": len(samples), "features": len(self.weights)}
+
+    def _learn_costs(self, records: List[Dict[str, Any]]):
+        """ค่าเฉลี่ยจำนวนครั้งที่เรียก LLM ของแต่ละเส้นทางจาก log (ต้องมีอย่างน้อย 5 รายการ)"""
+        for route, attribute in (("direct", "direct_calls"), ("plan", "plan_calls")):
+            calls = [record["llm_calls"] for record in records
+                     if record.get("llm_calls") is not None and record.get("route", route) == route
+                     and bool(record.get("planning_used")) == (route == "plan")]
+            if len(calls) >= 5:
+                setattr(self, attribute, round(sum(calls) / len(calls), 3))
+
+    def evaluate(self, records: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+        """ความแม่นยำของการเลือกเส้นทางและจำนวนครั้งที่เรียก LLM เทียบกับเกณฑ์เดิม
+
+        ต้นทุนของเส้นทางที่ตรงกับที่ log ไว้ใช้จำนวนจริง เส้นทางอื่นใช้ค่าเฉลี่ย
+        (ตอบตรงทั้งที่ต้องวางแผนบวก miss_cost)
+        """
+        total = labeled = correct = legacy_correct = fast = 0
+        router_calls = legacy_calls = 0.0
+        for record in records:
+            label = label_of(record)
+            text = record["input"]
+            is_fast = self.fast_path and self.fast_route(text) is not None
+            if label is None and not is_fast:
+                continue
+            total += 1
+            fast += is_fast
+            predicted = "fast" if is_fast else self._choose(self.predict(text), True)
+            legacy = "plan" if legacy_complexity(text) > 0.7 else "direct"
+            if label is not None:
+                labeled += 1
+                # fast path นับว่าถูกเมื่อคำขอตอบตรงได้
+                correct += predicted == label or (predicted == "fast" and label == "direct")
+                legacy_correct += legacy == label
+            router_calls += self._cost(predicted, record, label)
+            legacy_calls += self._cost(legacy, record, label)
+        return {
+            "records": total,
+            "labeled": labeled,
+            "fast_path": fast,
+            "accuracy": round(correct / labeled, 4) if labeled else None,
+            "legacy_accuracy": round(legacy_correct / labeled, 4) if labeled else None,
+            "llm_calls": round(router_calls, 1),
+            "legacy_llm_calls": round(legacy_calls, 1),
+            "llm_calls_saved": round(legacy_calls - router_calls, 1)
+        }
+
+    def _cost(self, route: str, record: Dict[str, Any], label: Optional[str]) -> float:
+        if route == "fast":
+            return 0.0
+        logged = "plan" if record.get("planning_used") else "direct"
+        if route == logged and record.get("llm_calls") is not None and record.get("route") != "fast":
+            return record["llm_calls"]
+        cost = self.plan_calls if route == "plan" else self.direct_calls
+        if route == "direct" and label == "plan":
+            cost += self.miss_cost
+        return cost
+
+    # ---------- บันทึก/โหลดโมเดล ----------
+
+    def save(self, path: str = DEFAULT_MODEL_PATH):
+        state = {
+            "weights": self.weights,
+            "bias": self.bias,
+            "direct_calls": self.direct_calls,
+            "plan_calls": self.plan_calls,
+            "miss_cost": self.miss_cost,
+            "trained_on": self.trained_on
+        }
+        atomic_write(path, [json.dumps(state, ensure_ascii=False, indent=2)])
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_MODEL_PATH, **options) -> "Router":
+        """โหลดโมเดลที่ train แล้ว (ไม่มีไฟล์ = ใช้น้ำหนักเริ่มต้น)"""
+        if not os.path.exists(path):
+            return cls(**options)
+        with open(path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        router = cls(weights=state["weights"],
+                     bias=state["bias"],
+                     direct_calls=state.get("direct_calls", 1.0),
+                     plan_calls=state.get("plan_calls", 2.5),
+                     miss_cost=state.get("miss_cost", 3.0),
+                     **options)
+        router.trained_on = state.get("trained_on", 0)
+        return router
+
+
+def arithmetic_expression(text: str) -> Optional[str]:
+    """คืนค่านิพจน์เลขคณิตหากคำขอเป็นการคำนวณล้วน เช่น "คำนวณ 2+3*4", "5 คูณ 3 เท่ากับเท่าไร" """
+    expression = _MATH_SUFFIX.sub("", _MATH_PREFIX.sub("", text, count=1), count=1)
+    expression = _THOUSANDS.sub("", expression)
+    for word, operator in _MATH_WORDS:
+        expression = expression.replace(word, f" {operator} ")
+    expression = " ".join(expression.split())
+    if not expression or not _ARITHMETIC.match(expression) or not _OPERATOR.search(expression):
+        return None
+    return expression
+
+
+def load_log(path: str = DEFAULT_LOG_PATH) -> List[Dict[str, Any]]:
+    records = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue  # บรรทัดที่เขียนไม่ครบ (เช่น process ถูกหยุดกลางทาง)
+    return records
+
+
+def _split(records: List[Dict[str, Any]], holdout: float) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """แบ่งชุด train/test ตาม hash ของข้อความ (คำขอเดิมอยู่ชุดเดียวกันเสมอ)"""
+    train, test = [], []
+    for record in records:
+        bucket = zlib.crc32(record["input"].encode("utf-8")) % 1000 / 1000
+        (test if bucket < holdout else train).append(record)
+    return train, test
+
+
+def print_report(title: str, report: Dict[str, Any]):
+    print(f"{title}: {report['records']} คำขอ (fast path {report['fast_path']})")
+    if report["labeled"]:
+        print(f"  ความแม่นยำ: {report['accuracy']:.1%} (เกณฑ์เดิม {report['legacy_accuracy']:.1%})")
+        print(f"  เรียก LLM: {report['llm_calls']:.0f} ครั้ง (เกณฑ์เดิม {report['legacy_llm_calls']:.0f}, "
+              f"ประหยัด {report['llm_calls_saved']:.0f})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="train/evaluate ตัวเลือกเส้นทางจาก log ของ response_data")
+    parser.add_argument("command", choices=["train", "evaluate"])
+    parser.add_argument("--log", default=DEFAULT_LOG_PATH)
+    parser.add_argument("--model", default=DEFAULT_MODEL_PATH)
+    parser.add_argument("--holdout", type=float, default=0.2, help="สัดส่วนที่กันไว้ทดสอบตอน train")
+    parser.add_argument("--miss-cost", type=float, default=None)
+    args = parser.parse_args()
+
+    records = load_log(args.log)
+    options = {"log_path": None}
+    if args.miss_cost is not None:
+        options["miss_cost"] = args.miss_cost
+
+    if args.command == "evaluate":
+        print_report("ประเมิน", Router.load(args.model, **options).evaluate(records))
+        return
+
+    train, test = _split(records, args.holdout)
+    router = Router(**options)
+    result = router.train(train)
+    if not result["trained"]:
+        print(f"ข้อมูลไม่พอสำหรับ train ({result['samples']} รายการที่มี label)")
+        return
+    print(f"train จาก {result['samples']} รายการ ({result['features']} คุณลักษณะ), "
+          f"LLM ต่อคำขอ: direct {router.direct_calls}, plan {router.plan_calls}")
+    if test:
+        print_report("ชุดทดสอบ", router.evaluate(test))
+    router.save(args.model)
+    print(f"บันทึกโมเดลที่ {args.model}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+# agent/server.py
+from typing import List, Dict, Any
+from collections import OrderedDict
+import threading
+import time
+import uuid
+import weakref
+
+from .core import AdvancedAgenticAI
+from .lazy import lazy_import
+
+asyncio = lazy_import("asyncio")
+
+
+class Session:
+    """สถานะของผู้ใช้หนึ่งคน: agent ที่ใช้ส่วนประกอบร่วมกัน (มีแค่ประวัติการสนทนาและ namespace ของตัวเอง)"""
+
+    def __init__(self, session_id: str, agent: AdvancedAgenticAI):
+        self.session_id = session_id
+        self.agent = agent
+        self.created_at = time.time()
+        self.last_active = time.monotonic()
+        self.requests = 0
+        self.active_requests = 0
+        # คำขอของ session เดียวกันทำทีละคำขอ เพื่อให้ประวัติการสนทนาเรียงลำดับถูกต้อง
+        self._lock = threading.Lock()
+        self._async_locks = weakref.WeakKeyDictionary()
+
+    def async_lock(self) -> "asyncio.Lock":
+        loop = asyncio.get_running_loop()
+        lock = self._async_locks.get(loop)
+        if lock is None:
+            lock = self._async_locks[loop] = asyncio.Lock()
+        return lock
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "session_id": self.session_id,
+            "created_at": self.created_at,
+            "idle_seconds": time.monotonic() - self.last_active,
+            "requests": self.requests,
+            "active_requests": self.active_requests,
+            "history_length": len(self.agent.conversation_history)
+        }
+
+
+class SessionManager:
+    """ให้บริการหลาย session ด้วยส่วนประกอบชุดเดียว
+
+    LLM client, ToolManager (HTTP connection pool และ cache), cache ของคำตอบ/แผน, tracer
+    และความจำ ถูกสร้างครั้งเดียวใน agent หลักแล้วใช้ร่วมกันทุก session
+    แต่ละ session มีประวัติการสนทนาของตัวเอง และความจำถูกแยกด้วย namespace (= session_id)
+
+    - session ที่ไม่ได้ใช้งานเกิน idle_timeout วินาที หรือเกิน max_sessions (LRU) จะถูกคัดออก
+      (ความจำใน namespace ยังอยู่ หาก session_id เดิมกลับมาจะค้นเจอความจำเดิม)
+    - คำขอทำงานพร้อมกันได้ไม่เกิน max_concurrency คำขอ รอคิวได้อีก max_pending คำขอ
+      เกินกว่านั้น หรือรอนานเกิน queue_timeout วินาที จะได้ผลลัพธ์ error = "busy" ทันที
+    """
+
+    def __init__(self,
+                 agent: AdvancedAgenticAI = None,
+                 idle_timeout: float = 1800.0,
+                 max_sessions: int = 10000,
+                 max_concurrency: int = 32,
+                 max_pending: int = 128,
+                 queue_timeout: float = 30.0,
+                 **agent_options):
+        # agent_options ส่งต่อให้ AdvancedAgenticAI (เช่น model_name, llm, response_cache, plan_cache)
+        self.shared = agent or AdvancedAgenticAI(**agent_options)
+        self.idle_timeout = idle_timeout
+        self.max_sessions = max_sessions
+        self.max_concurrency = max_concurrency
+        self.max_pending = max_pending
+        self.queue_timeout = queue_timeout
+
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        # process ใช้ semaphore ของ thread ส่วน aprocess ใช้ semaphore ของแต่ละ event loop
+        self._thread_slots = threading.BoundedSemaphore(max_concurrency)
+        self._async_slots = weakref.WeakKeyDictionary()
+
+        self.metrics = {
+            "requests": 0,
+            "rejected": 0,
+            "sessions_created": 0,
+            "sessions_evicted": 0,
+            "peak_in_flight": 0
+        }
+
+    def get_session(self, session_id: str = None) -> Session:
+        """ดึง session (สร้างใหม่หากยังไม่มี หรือไม่ระบุ session_id)"""
+        now = time.monotonic()
+        with self._lock:
+            self._evict(now)
+            if session_id is None:
+                session_id = str(uuid.uuid4())
+            session = self._sessions.get(session_id)
+            if session is None:
+                agent = AdvancedAgenticAI(shared=self.shared, namespace=session_id)
+                session = self._sessions[session_id] = Session(session_id, agent)
+                self.metrics["sessions_created"] += 1
+            else:
+                self._sessions.move_to_end(session_id)
+            session.last_active = now
+            return session
+
+    def close_session(self, session_id: str) -> bool:
+        """ปิด session (ความจำใน namespace ยังอยู่)"""
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def evict_idle(self) -> int:
+        """คัด session ที่ไม่ได้ใช้งานออก คืนค่าจำนวนที่ถูกคัดออก"""
+        with self._lock:
+            return self._evict(time.monotonic())
+
+    def process(self, session_id: str, user_input: str, use_planning: bool = True) -> Dict[str, Any]:
+        """ประมวลผลคำขอของ session (แบบ sync ใช้ได้จากหลาย thread)"""
+        if not self._admit():
+            return self._busy(session_id)
+        try:
+            if not self._thread_slots.acquire(timeout=self.queue_timeout):
+                return self._busy(session_id)
+            try:
+                session = self._begin(session_id)
+                try:
+                    with session._lock:
+                        response_data = session.agent.process(user_input, use_planning)
+                finally:
+                    self._end(session)
+            finally:
+                self._thread_slots.release()
+        finally:
+            self._leave()
+        response_data["session_id"] = session.session_id
+        return response_data
+
+    async def aprocess(self, session_id: str, user_input: str, use_planning: bool = True) -> Dict[str, Any]:
+        """ประมวลผลคำขอของ session แบบ async"""
+        if not self._admit():
+            return self._busy(session_id)
+        try:
+            slots = self._loop_slots()
+            try:
+                await asyncio.wait_for(slots.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                return self._busy(session_id)
+            try:
+                session = self._begin(session_id)
+                try:
+                    async with session.async_lock():
+                        response_data = await session.agent.aprocess(user_input, use_planning)
+                finally:
+                    self._end(session)
+            finally:
+                slots.release()
+        finally:
+            self._leave()
+        response_data["session_id"] = session.session_id
+        return response_data
+
+    def list_sessions(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [session.info() for session in self._sessions.values()]
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """สถิติของ server (จำนวน session, คำขอที่ทำงานอยู่ และคำขอที่ถูกปฏิเสธ)"""
+        with self._lock:
+            metrics = dict(self.metrics)
+            metrics["sessions"] = len(self._sessions)
+            metrics["in_flight"] = self._in_flight
+        metrics["stages"] = self.shared.tracer.get_metrics()
+        return metrics
+
+    def _admit(self) -> bool:
+        """นับคำขอเข้า ปฏิเสธทันทีหากคำขอที่ทำงานอยู่และรอคิวเต็ม"""
+        with self._lock:
+            if self._in_flight >= self.max_concurrency + self.max_pending:
+                return False
+            self._in_flight += 1
+            self.metrics["requests"] += 1
+            self.metrics["peak_in_flight"] = max(self.metrics["peak_in_flight"], self._in_flight)
+            return True
+
+    def _leave(self):
+        with self._lock:
+            self._in_flight -= 1
+
+    def _begin(self, session_id: str) -> Session:
+        session = self.get_session(session_id)
+        with self._lock:
+            session.active_requests += 1
+            session.requests += 1
+        return session
+
+    def _end(self, session: Session):
+        with self._lock:
+            session.active_requests -= 1
+            session.last_active = time.monotonic()
+
+    def _loop_slots(self) -> "asyncio.Semaphore":
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            slots = self._async_slots.get(loop)
+            if slots is None:
+                slots = self._async_slots[loop] = asyncio.Semaphore(self.max_concurrency)
+            return slots
+
+    def _busy(self, session_id: str) -> Dict[str, Any]:
+        with self._lock:
+            self.metrics["rejected"] += 1
+        return {
+            "session_id": session_id,
+            "success": False,
+            "error": "busy",
+            "response": "ระบบมีคำขอมากเกินไป กรุณาลองใหม่ภายหลัง"
+        }
+
+    def _evict(self, now: float) -> int:
+        """คัด session ที่ว่างนานเกิน idle_timeout และ session ที่เกิน max_sessions (ต้องถือ self._lock)"""
+        evicted = 0
+        for session_id, session in list(self._sessions.items()):
+            idle = now - session.last_active > self.idle_timeout
+            over = len(self._sessions) > self.max_sessions
+            if not (idle or over):
+                # เรียงตามการใช้งานล่าสุด session ที่เหลือจึงยังใหม่อยู่
+                break
+            if session.active_requests:
+                continue
+            del self._sessions[session_id]
+            evicted += 1
+        self.metrics["sessions_evicted"] += evicted
+        return evicted
@@ -1,13 +1,63 @@
 # agent/simple_memory.py
 from typing import List, Dict, Any
+from collections import defaultdict
+from array import array
+import heapq
 import uuid
 from datetime import datetime
 import json
-import re
+from .memory_store import MemoryStore, MemoryRecord
+from .persistence import MemoryLog, atomic_write, iter_json_array, json_array_chunks
+from .snapshot import MappedSnapshot, write_snapshot
+from .retention import RetentionPolicy, ColdTier
+from .thai_tokenizer import STOPWORDS, tokenize, tokenize_many
+
+def extract_keywords(text: str) -> List[str]:
+    """แยกคำสำคัญจากข้อความ (ใช้ร่วมกันทั้งตอนเก็บและตอนค้นหา)"""
+    # แยกคำ (ภาษาไทยตัดคำด้วยพจนานุกรม ดู thai_tokenizer.py)
+    return _keywords(tokenize(text.lower()))
+
+def extract_keywords_many(texts: List[str]) -> List[List[str]]:
+    """extract_keywords หลายข้อความพร้อมกัน (ใช้ตอนโหลดไฟล์หรือสร้าง index ใหม่)"""
+    return [_keywords(words) for words in tokenize_many([text.lower() for text in texts])]
+
+def _keywords(words: List[str]) -> List[str]:
+    # กรองคำที่สั้นเกินไปและคำไวยากรณ์ภาษาไทย แล้วลบคำที่ซ้ำ (คงลำดับเดิม)
+    return list(dict.fromkeys(word for word in words if len(word) >= 2 and word not in STOPWORDS))
 
 class SimpleVectorMemory:
-    def __init__(self):
-        self.memories = []
+    def __init__(self,
+                 persist_directory: str = None,
+                 sync_every: int = 64,
+                 compact_every: int = 10000,
+                 snapshot_path: str = None,
+                 retention: RetentionPolicy = None,
+                 cold_tier: ColdTier = None,
+                 summarizer=None):
+        # snapshot แบบอ่านอย่างเดียว (mmap) เป็นฐาน ความจำใหม่จะเก็บใน self.memories
+        self._base = MappedSnapshot(snapshot_path) if snapshot_path else None
+        
+        # ความจำเก็บแบบ columnar (ดู memory_store.py) อ่านผ่าน MemoryRecord view
+        self.memories = MemoryStore()
+        
+        # inverted index: id ของคำสำคัญ -> แถวของความจำใน self.memories
+        self._index = defaultdict(lambda: array('I'))
+        # จำนวนครั้งที่ถูกค้นเจอ (สำหรับ LRU) และขนาดรวมของเนื้อหา (ไบต์)
+        self._hits = array('I')
+        self._content_bytes = 0
+        
+        # นโยบายการเก็บ (snapshot ฐานเป็นแบบอ่านอย่างเดียวจึงไม่ถูกคัดออก)
+        # ความจำที่ถูกคัดออกจะย้ายไป cold_tier และ/หรือสรุปด้วย summarizer(memories) -> str
+        self.retention = retention
+        self.cold_tier = cold_tier
+        self.summarizer = summarizer
+        
+        # บันทึกแบบ append-only (write-ahead log) หากระบุ persist_directory
+        self._log = None
+        self.compact_every = compact_every
+        if persist_directory:
+            self._log = MemoryLog(persist_directory, sync_every=sync_every)
+            self._replay_log()
     
     def add_memory(self, 
                    content: str, 
@@ -22,60 +72,294 @@ class SimpleVectorMemory:
             'timestamp': datetime.now().isoformat(),
             'keywords': self._extract_keywords(content)
         }
+        self._append_memory(memory)
+        
+        if self._log is not None:
+            self._log.append('add', memory=memory)
+        
+        if self.retention is not None and self.retention.needs_eviction(
+                len(self.memories), self._content_bytes,
+                self.memories.timestamp_micros(0) if self.memories else None):
+            self.enforce_retention()
         
-        self.memories.append(memory)
+        if self._log is not None and self._log.log_records >= self.compact_every:
+            self.compact_log()
         return memory_id
     
     def search_memory(self, 
                       query: str, 
-                      n_results: int = 5) -> List[Dict[str, Any]]:
-        """ค้นหาความจำที่เกี่ยวข้อง (แบบง่าย)"""
+                      n_results: int = 5,
+                      namespace: str = None) -> List[Dict[str, Any]]:
+        """ค้นหาความจำที่เกี่ยวข้อง (แบบง่าย) เฉพาะ metadata["namespace"] ที่ระบุ (ถ้ามี)"""
         if not query.strip():
-            return self.memories[-n_results:] if self.memories else []
+            return self._recent_records(n_results, namespace)
         
         query_keywords = self._extract_keywords(query.lower())
+        if not query_keywords or n_results <= 0:
+            return []
         
-        # คำนวณคะแนนความเกี่ยวข้อง
-        scored_memories = []
-        for memory in self.memories:
-            score = self._calculate_similarity(query_keywords, memory['keywords'])
-            if score > 0:
-                scored_memories.append({
-                    **memory,
-                    'distance': 1 - score  # แปลงเป็น distance (ต่ำ = เกี่ยวข้องมาก)
-                })
+        # นับจำนวนคำที่ซ้ำกัน เฉพาะความจำที่มีคำสำคัญร่วมกับ query อย่างน้อย 1 คำ
+        overlaps = defaultdict(int)
+        for keyword in query_keywords:
+            keyword_id = self.memories.keyword_id(keyword)
+            if keyword_id is None:
+                continue
+            for position in self._index.get(keyword_id, ()):
+                overlaps[position] += 1
         
-        # เรียงลำดับตามคะแนน
-        scored_memories.sort(key=lambda x: x['distance'])
+        if namespace is not None:
+            namespace_id = self.memories.namespace_id(namespace)
+            namespace_ids = self.memories.namespace_ids()
+            overlaps = {
+                position: count for position, count in overlaps.items()
+                if namespace_ids[position] == namespace_id
+            }
         
-        return scored_memories[:n_results]
+        # คำนวณ Jaccard similarity จาก intersection และจำนวนคำสำคัญที่เก็บไว้แล้ว
+        query_size = len(query_keywords)
+        keyword_count = self.memories.keyword_count
+        scored = (
+            (1 - intersection / (query_size + keyword_count(position) - intersection), position)
+            for position, intersection in overlaps.items()
+        )
+        
+        # เลือก n_results อันดับแรกด้วย heap (distance ต่ำ = เกี่ยวข้องมาก)
+        best = heapq.nsmallest(n_results, scored)
+        for _, position in best:
+            self._hits[position] += 1
+        
+        if self._base is None:
+            results = [
+                MemoryRecord(self.memories, position, distance)
+                for distance, position in best
+            ]
+        else:
+            # รวมผลจาก snapshot (แถวเก่ากว่า มาก่อนเมื่อคะแนนเท่ากัน) กับความจำใหม่
+            merged = heapq.nsmallest(n_results, [
+                *((distance, 0, row) for distance, row in self._base.search(
+                    query_keywords, n_results, self._base_filter(namespace))),
+                *((distance, 1, position) for distance, position in best)
+            ])
+            results = [
+                self._base.record(row, distance) if source == 0
+                else MemoryRecord(self.memories, row, distance)
+                for distance, source, row in merged
+            ]
+        
+        # ค้นใน cold tier เฉพาะเมื่อ hot tier ได้ผลลัพธ์ไม่พอ
+        if self.cold_tier is not None and len(results) < n_results:
+            results.extend(self.cold_tier.search(query_keywords, n_results - len(results), namespace))
+        return results
     
-    def get_recent_memories(self, limit: int = 10) -> List[Dict[str, Any]]:
+    def get_recent_memories(self, limit: int = 10, namespace: str = None) -> List[Dict[str, Any]]:
         """ดึงความจำล่าสุด"""
-        return self.memories[-limit:] if self.memories else []
+        return self._recent_records(limit, namespace)
     
     def clear_memory(self):
         """ล้างความจำทั้งหมด"""
-        self.memories = []
+        self._reset()
+        self._detach_snapshot()
+        if self.cold_tier is not None:
+            self.cold_tier.clear()
+        if self._log is not None:
+            # checkpoint ว่างที่ติด cleared ไว้: เริ่มใหม่แล้วไม่ได้ความจำเดิม (รวมถึง snapshot ฐาน) กลับมา
+            self._log.clear()
         print("ล้างความจำเรียบร้อยแล้ว")
     
     def get_collection_info(self):
         """ดูข้อมูลของ memory"""
         return {
             "name": "simple_memory",
-            "count": len(self.memories)
+            "count": len(self.memories) + (len(self._base) if self._base is not None else 0)
         }
     
     def _extract_keywords(self, text: str) -> List[str]:
         """แยกคำสำคัญจากข้อความ"""
-        # ลบสัญลักษณ์พิเศษและแยกคำ
-        words = re.findall(r'\b\w+\b', text.lower())
+        return extract_keywords(text)
+    
+    def _reset(self):
+        """ล้าง store และ inverted index"""
+        self.memories = MemoryStore()
+        self._index = defaultdict(lambda: array('I'))
+        self._hits = array('I')
+        self._content_bytes = 0
+    
+    def _replay_log(self):
+        """สร้างความจำและ index ใหม่จาก snapshot + log ส่วนท้าย"""
+        self._reset()
+        deleted_ids = set()
+        for record in self._log.replay():
+            if record['op'] == 'add':
+                self._append_memory(record['memory'])
+            elif record['op'] == 'delete':
+                deleted_ids.update(record['ids'])
+            elif record['op'] == 'clear':
+                # log รุ่นเก่าที่บันทึกการล้างเป็นรายการใน log
+                self._reset()
+                deleted_ids.clear()
+                self._detach_snapshot()
+        if self._log.cleared:
+            # snapshot ฐานเป็นข้อมูลก่อนการล้าง
+            self._detach_snapshot()
+        
+        if deleted_ids:
+            self._rebuild(
+                row for row in range(len(self.memories))
+                if self.memories.get_field(row, 'id') in deleted_ids
+            )
+    
+    def enforce_retention(self) -> int:
+        """คัดความจำออกตาม retention policy คืนค่าจำนวนที่ถูกคัดออก"""
+        if self.retention is None or not self.memories:
+            return 0
+        
+        entries = (
+            (row,
+             self.memories.timestamp_micros(row),
+             len(self.memories.get_field(row, 'content').encode('utf-8')),
+             self._hits[row])
+            for row in range(len(self.memories))
+        )
+        victims = sorted(self.retention.select(entries))
+        if not victims:
+            return 0
         
-        # กรองคำที่สั้นเกินไป
-        keywords = [word for word in words if len(word) >= 2]
+        evicted = [dict(self.memories[row]) for row in victims]
+        if self.cold_tier is not None:
+            self.cold_tier.append(evicted)
         
-        # ลบคำที่ซ้ำ
-        return list(set(keywords))
+        self._rebuild(victims)
+        if self._log is not None:
+            self._log.append('delete', ids=[memory['id'] for memory in evicted])
+        
+        # สรุปความจำที่ถูกคัดออกเป็นความจำใหม่หนึ่งรายการ (ถ้ามี summarizer)
+        if self.summarizer is not None:
+            summary = {
+                'id': str(uuid.uuid4()),
+                'content': self.summarizer(evicted),
+                'metadata': {'type': 'summary', 'summarized_count': len(evicted)},
+                'timestamp': datetime.now().isoformat()
+            }
+            summary['keywords'] = self._extract_keywords(summary['content'])
+            self._append_memory(summary)
+            if self._log is not None:
+                self._log.append('add', memory=summary)
+        
+        return len(evicted)
+    
+    def _rebuild(self, removed_rows):
+        """สร้าง store และ index ใหม่โดยไม่รวมแถวที่ถูกลบ (คงจำนวน hits เดิมไว้)"""
+        removed = set(removed_rows)
+        if not removed:
+            return
+        old_store, old_hits = self.memories, self._hits
+        self._reset()
+        for row in range(len(old_store)):
+            if row in removed:
+                continue
+            position = self._append_memory(dict(old_store[row]))
+            self._hits[position] = old_hits[row]
+    
+    def save_snapshot(self, path: str = "data/memory.snapshot") -> int:
+        """เขียนความจำทั้งหมดเป็น snapshot แบบ mmap (เปิดใช้ด้วย snapshot_path)"""
+        count = write_snapshot(self._iter_all(), path)
+        print(f"บันทึก snapshot {path} แล้ว ({count} รายการ)")
+        return count
+    
+    def _recent_records(self, limit: int, namespace: str = None) -> List[Dict[str, Any]]:
+        """ความจำล่าสุด limit รายการ (รวมส่วนท้ายของ snapshot หากความจำใหม่ไม่พอ)"""
+        if limit <= 0:
+            return []
+        if namespace is not None:
+            return self._recent_in_namespace(limit, namespace)
+        recent = self.memories[-limit:] if self.memories else []
+        missing = limit - len(recent)
+        if self._base is None or missing <= 0:
+            return recent
+        start = max(0, len(self._base) - missing)
+        return [self._base[row] for row in range(start, len(self._base))] + recent
+    
+    def _recent_in_namespace(self, limit: int, namespace: str) -> List[Dict[str, Any]]:
+        """ความจำล่าสุดของ namespace (ไล่จากแถวใหม่สุดย้อนกลับ)"""
+        recent = []
+        namespace_id = self.memories.namespace_id(namespace)
+        if namespace_id is not None:
+            namespace_ids = self.memories.namespace_ids()
+            for row in range(len(self.memories) - 1, -1, -1):
+                if namespace_ids[row] == namespace_id:
+                    recent.append(self.memories[row])
+                    if len(recent) >= limit:
+                        break
+        if self._base is not None and len(recent) < limit:
+            accept = self._base_filter(namespace)
+            for row in range(len(self._base) - 1, -1, -1):
+                if accept(row):
+                    recent.append(self._base[row])
+                    if len(recent) >= limit:
+                        break
+        recent.reverse()
+        return recent
+    
+    def _base_filter(self, namespace: str = None):
+        """ตัวกรองแถวของ snapshot ตาม namespace (None = ไม่กรอง)"""
+        if namespace is None:
+            return None
+        # id ของ namespace เก็บเป็นคอลัมน์ใน snapshot จึงกรองได้โดยไม่ต้องถอดรหัส JSON ของแถว
+        return self._base.namespace_filter(namespace)
+    
+    def _iter_all(self):
+        """วนความจำทั้งหมด: snapshot ก่อน ตามด้วยความจำใหม่"""
+        if self._base is not None:
+            for row in range(len(self._base)):
+                yield self._base[row]
+        yield from self.memories
+    
+    def _detach_snapshot(self):
+        """เลิกใช้ snapshot ฐาน (เมื่อความจำถูกล้างหรือแทนที่ทั้งหมด)"""
+        if self._base is not None:
+            self._base.close()
+            self._base = None
+    
+    def compact_log(self):
+        """รวม log เป็น snapshot ใหม่ (ขนาด log กลับเป็นศูนย์)"""
+        if self._log is None:
+            return
+        self._log.compact(dict(memory) for memory in self.memories)
+    
+    def close(self):
+        """sync log ที่ค้างอยู่และปิดไฟล์"""
+        if self._log is not None:
+            self._log.close()
+        self._detach_snapshot()
+    
+    def _append_batch(self, memories: List[Dict[str, Any]], reindex: bool = False):
+        """เพิ่มความจำหลายรายการ แยกคำสำคัญของทั้งชุดในครั้งเดียว"""
+        pending = [memory for memory in memories if reindex or memory.get('keywords') is None]
+        if pending:
+            keywords = extract_keywords_many([memory.get('content', '') for memory in pending])
+            for memory, memory_keywords in zip(pending, keywords):
+                memory['keywords'] = memory_keywords
+        for memory in memories:
+            self._append_memory(memory)
+    
+    def _append_memory(self, memory: Dict[str, Any]) -> int:
+        """เพิ่มความจำลง store และ inverted index"""
+        keywords = memory.get('keywords')
+        if keywords is None:
+            keywords = self._extract_keywords(memory.get('content', ''))
+        
+        position = self.memories.append(
+            memory_id=memory['id'],
+            content=memory.get('content', ''),
+            metadata=memory.get('metadata') or {},
+            timestamp=memory.get('timestamp', ''),
+            keywords=dict.fromkeys(keywords)
+        )
+        for keyword_id in self.memories.keyword_ids(position):
+            self._index[keyword_id].append(position)
+        self._hits.append(0)
+        self._content_bytes += len(self.memories.get_field(position, 'content').encode('utf-8'))
+        return position
     
     def _calculate_similarity(self, keywords1: List[str], keywords2: List[str]) -> float:
         """คำนวณความคล้ายคลึง (Jaccard similarity)"""
@@ -93,17 +377,38 @@ class SimpleVectorMemory:
     def save_to_file(self, filename: str = "memory_backup.json"):
         """บันทึกความจำลงไฟล์"""
         try:
-            with open(f"data/{filename}", 'w', encoding='utf-8') as f:
-                json.dump(self.memories, f, ensure_ascii=False, indent=2)
+            # เขียนทีละรายการลงไฟล์ชั่วคราวแล้ว rename ทับ ไฟล์เดิมจึงไม่เสียหายหาก crash กลางทาง
+            atomic_write(f"data/{filename}", json_array_chunks(self._iter_all()))
             print(f"บันทึกความจำลงไฟล์ {filename} แล้ว")
         except Exception as e:
             print(f"บันทึกไฟล์ไม่สำเร็จ: {e}")
     
-    def load_from_file(self, filename: str = "memory_backup.json"):
-        """โหลดความจำจากไฟล์"""
+    def load_from_file(self, filename: str = "memory_backup.json", reindex: bool = False, batch_size: int = 1024):
+        """โหลดความจำจากไฟล์
+        
+        reindex=True แยกคำสำคัญใหม่ทุกรายการ (เช่น ไฟล์ที่บันทึกก่อนมีการตัดคำภาษาไทย)
+        รายการที่ไม่มีคำสำคัญจะถูกแยกคำเป็นชุดละ batch_size รายการเสมอ
+        """
+        previous = (self.memories, self._index, self._hits, self._content_bytes)
         try:
             with open(f"data/{filename}", 'r', encoding='utf-8') as f:
-                self.memories = json.load(f)
-            print(f"โหลดความจำจากไฟล์ {filename} แล้ว ({len(self.memories)} รายการ)")
+                # อ่านทีละรายการ ไม่ต้องเก็บข้อความ JSON ทั้งไฟล์ไว้ในหน่วยความจำ
+                self._reset()
+                batch = []
+                for memory in iter_json_array(f):
+                    batch.append(memory)
+                    if len(batch) >= batch_size:
+                        self._append_batch(batch, reindex)
+                        batch = []
+                self._append_batch(batch, reindex)
         except Exception as e:
-            print(f"โหลดไฟล์ไม่สำเร็จ: {e}")
\ No newline at end of file
+            self.memories, self._index, self._hits, self._content_bytes = previous
+            print(f"โหลดไฟล์ไม่สำเร็จ: {e}")
+            return
+        self._detach_snapshot()
+        
+        # ความจำถูกแทนที่ทั้งหมด จึงเขียน snapshot ใหม่แทนการต่อท้าย log
+        # (checkpoint ติด cleared ไว้ เริ่มใหม่แล้ว snapshot ฐานจึงไม่ถูกรวมกลับมา)
+        if self._log is not None:
+            self._log.replace(dict(memory) for memory in self.memories)
+        print(f"โหลดความจำจากไฟล์ {filename} แล้ว ({len(self.memories)} รายการ)")
@@ -0,0 +1,318 @@
+# agent/snapshot.py
+from typing import List, Dict, Any, Callable, Iterable, Optional, Tuple
+from collections import defaultdict
+from collections.abc import Mapping
+from array import array
+import heapq
+import json
+import mmap
+import struct
+import sys
+
+from .persistence import atomic_write
+
+# รูปแบบไฟล์ snapshot (little-endian, ทุก section จัดแนว 8 ไบต์):
+#
+#   header            MAGIC + จำนวนแถว/คำสำคัญ + offset ของแต่ละ section
+#   keyword_offsets   uint64[K+1]  ตำแหน่งของคำสำคัญ (เรียงตาม utf-8 bytes) ใน keyword_blob
+#   keyword_blob      คำสำคัญ utf-8 ต่อกัน
+#   posting_offsets   uint64[K+1]  ตำแหน่งเริ่มของ posting list ของแต่ละคำ
+#   postings          uint32[]     เลขแถวที่มีคำสำคัญนั้น
+#   row_counts        uint32[N]    จำนวนคำสำคัญของแต่ละแถว
+#   content_offsets   uint64[N+1]  ตำแหน่งของแต่ละแถวใน content_blob
+#   content_blob      JSON (utf-8) ของแต่ละแถว ถอดรหัสเมื่อถูกเรียกใช้เท่านั้น
+#   namespace_offsets uint64[S+1]  ตำแหน่งของ metadata["namespace"] (JSON) แต่ละค่าใน namespace_blob
+#   namespace_blob    ค่า namespace (JSON utf-8) ต่อกัน
+#   row_namespaces    uint32[N]    id ของ namespace ของแต่ละแถว (0 = ไม่มี, i = ค่าลำดับที่ i-1)
+#
+# ไฟล์รุ่นแรก (AGMSNAP1) ไม่มีสาม section สุดท้าย ยังเปิดได้ แต่การกรอง namespace ต้องถอดรหัสแถว
+MAGIC = b'AGMSNAP2'
+_HEADER = struct.Struct('<8sQQQ' + 'Q' * 10)
+_SECTIONS = ('keyword_offsets', 'keyword_blob', 'posting_offsets', 'postings',
+             'row_counts', 'content_offsets', 'content_blob',
+             'namespace_offsets', 'namespace_blob', 'row_namespaces')
+MAGIC_V1 = b'AGMSNAP1'
+_HEADER_V1 = struct.Struct('<8sQQQQQQQQQ')
+_NATIVE_LITTLE = sys.byteorder == 'little'
+
+
+def write_snapshot(memories: Iterable[Dict[str, Any]], path: str) -> int:
+    """เขียน snapshot แบบอ่านอย่างเดียวจากความจำ (dict หรือ MemoryRecord) คืนค่าจำนวนแถว"""
+    postings = defaultdict(lambda: array('I'))
+    row_counts = array('I')
+    content_offsets = array('Q', [0])
+    content_blob = bytearray()
+    namespaces: Dict[bytes, int] = {}
+    row_namespaces = array('I')
+
+    for row, memory in enumerate(memories):
+        keywords = list(dict.fromkeys(memory.get('keywords') or ()))
+        for keyword in keywords:
+            postings[keyword.encode('utf-8')].append(row)
+        row_counts.append(len(keywords))
+
+        record = {
+            'id': memory['id'],
+            'content': memory['content'],
+            'metadata': memory.get('metadata') or {},
+            'timestamp': memory.get('timestamp', ''),
+            'keywords': keywords
+        }
+        content_blob += json.dumps(record, ensure_ascii=False).encode('utf-8')
+        content_offsets.append(len(content_blob))
+
+        namespace = record['metadata'].get('namespace')
+        if namespace is None:
+            row_namespaces.append(0)
+        else:
+            encoded = _encode_namespace(namespace)
+            row_namespaces.append(namespaces.setdefault(encoded, len(namespaces) + 1))
+
+    sorted_keywords = sorted(postings)
+    keyword_offsets = array('Q', [0])
+    keyword_blob = bytearray()
+    posting_offsets = array('Q', [0])
+    all_postings = array('I')
+    for keyword in sorted_keywords:
+        keyword_blob += keyword
+        keyword_offsets.append(len(keyword_blob))
+        all_postings.extend(postings[keyword])
+        posting_offsets.append(len(all_postings))
+
+    namespace_offsets = array('Q', [0])
+    namespace_blob = bytearray()
+    for encoded in namespaces:
+        namespace_blob += encoded
+        namespace_offsets.append(len(namespace_blob))
+
+    sections = [keyword_offsets, keyword_blob, posting_offsets, all_postings,
+                row_counts, content_offsets, content_blob,
+                namespace_offsets, namespace_blob, row_namespaces]
+    payloads = [_to_little_endian(section) for section in sections]
+
+    offsets = []
+    position = _HEADER.size
+    for payload in payloads:
+        position += _padding(position)
+        offsets.append(position)
+        position += len(payload)
+
+    header = _HEADER.pack(MAGIC, len(row_counts), len(sorted_keywords), len(namespaces), *offsets)
+
+    def chunks():
+        written = len(header)
+        yield header
+        for offset, payload in zip(offsets, payloads):
+            yield bytes(offset - written)
+            yield payload
+            written = offset + len(payload)
+
+    atomic_write(path, chunks(), binary=True)
+    return len(row_counts)
+
+
+class SnapshotRecord(Mapping):
+    """มุมมองของความจำหนึ่งแถวใน snapshot (ถอดรหัส JSON เมื่ออ่านครั้งแรก)"""
+    __slots__ = ('_snapshot', '_row', '_distance', '_data')
+
+    def __init__(self, snapshot: 'MappedSnapshot', row: int, distance: Optional[float] = None):
+        self._snapshot = snapshot
+        self._row = row
+        self._distance = distance
+        self._data = None
+
+    def _decoded(self) -> Dict[str, Any]:
+        if self._data is None:
+            self._data = self._snapshot.decode_row(self._row)
+        return self._data
+
+    def __getitem__(self, key: str) -> Any:
+        if key == 'distance' and self._distance is not None:
+            return self._distance
+        return self._decoded()[key]
+
+    def __iter__(self):
+        yield from self._decoded()
+        if self._distance is not None:
+            yield 'distance'
+
+    def __len__(self) -> int:
+        return len(self._decoded()) + (self._distance is not None)
+
+    def __repr__(self) -> str:
+        return f"SnapshotRecord({dict(self)!r})"
+
+
+class MappedSnapshot:
+    """เปิด snapshot ด้วย mmap และค้นหาได้ทันทีโดยไม่ต้องโหลดข้อมูลทั้งไฟล์"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # ไฟล์ว่าง (mmap ขนาด 0 ไม่ได้)
+            self._file.close()
+            raise ValueError(f"snapshot {path} ไม่ถูกต้อง")
+
+        magic = self._mmap[:len(MAGIC)]
+        if magic == MAGIC and len(self._mmap) >= _HEADER.size:
+            fields = _HEADER.unpack_from(self._mmap, 0)
+            self.row_count, self.keyword_count, namespace_count = fields[1:4]
+            self._offsets = dict(zip(_SECTIONS, fields[4:]))
+        elif magic == MAGIC_V1 and len(self._mmap) >= _HEADER_V1.size:
+            fields = _HEADER_V1.unpack_from(self._mmap, 0)
+            self.row_count, self.keyword_count, namespace_count = fields[1], fields[2], None
+            self._offsets = dict(zip(_SECTIONS, fields[3:]))
+        else:
+            self.close()
+            raise ValueError(f"snapshot {path} ไม่ถูกต้อง")
+
+        self._view = memoryview(self._mmap)
+        self._keyword_offsets = self._uint_section('keyword_offsets', 'Q', self.keyword_count + 1)
+        self._posting_offsets = self._uint_section('posting_offsets', 'Q', self.keyword_count + 1)
+        self._row_counts = self._uint_section('row_counts', 'I', self.row_count)
+        self._content_offsets = self._uint_section('content_offsets', 'Q', self.row_count + 1)
+
+        # namespace (JSON) -> id ถอดรหัสครั้งเดียวตอนเปิด (จำนวนเท่ากับ namespace ที่ต่างกัน ไม่ใช่จำนวนแถว)
+        self._namespace_ids: Optional[Dict[bytes, int]] = None
+        self._row_namespaces = None
+        if namespace_count is not None:
+            offsets = self._uint_section('namespace_offsets', 'Q', namespace_count + 1)
+            base = self._offsets['namespace_blob']
+            self._namespace_ids = {
+                self._mmap[base + offsets[index]:base + offsets[index + 1]]: index + 1
+                for index in range(namespace_count)
+            }
+            if isinstance(offsets, memoryview):
+                offsets.release()
+            self._row_namespaces = self._uint_section('row_namespaces', 'I', self.row_count)
+
+    def __len__(self) -> int:
+        return self.row_count
+
+    def __getitem__(self, row: int) -> SnapshotRecord:
+        if row < 0:
+            row += self.row_count
+        if not 0 <= row < self.row_count:
+            raise IndexError("snapshot row out of range")
+        return SnapshotRecord(self, row)
+
+    def record(self, row: int, distance: Optional[float] = None) -> SnapshotRecord:
+        """view ของแถว พร้อม distance จากการค้นหา"""
+        return SnapshotRecord(self, row, distance)
+
+    def find_keyword(self, keyword: str) -> Optional[int]:
+        """ค้นหาคำสำคัญด้วย binary search บน keyword_blob (คืนค่า index หรือ None)"""
+        target = keyword.encode('utf-8')
+        base = self._offsets['keyword_blob']
+        low, high = 0, self.keyword_count
+        while low < high:
+            middle = (low + high) // 2
+            start = base + self._keyword_offsets[middle]
+            end = base + self._keyword_offsets[middle + 1]
+            candidate = self._mmap[start:end]
+            if candidate < target:
+                low = middle + 1
+            elif candidate > target:
+                high = middle
+            else:
+                return middle
+        return None
+
+    def postings(self, keyword_index: int):
+        """เลขแถวทั้งหมดที่มีคำสำคัญนี้ (อ่านจาก mmap โดยตรง)"""
+        start = self._posting_offsets[keyword_index]
+        end = self._posting_offsets[keyword_index + 1]
+        return self._uint_slice(self._offsets['postings'] + start * 4, 'I', end - start)
+
+    def namespace_filter(self, namespace: Any) -> Callable[[int], bool]:
+        """ตัวกรองแถวที่ metadata["namespace"] เท่ากับ namespace (ใช้เป็น accept ของ search)"""
+        if self._row_namespaces is None:
+            # snapshot รุ่นแรก: ไม่มีคอลัมน์ namespace ต้องถอดรหัสแถว
+            return lambda row: (self.decode_row(row)['metadata'] or {}).get('namespace') == namespace
+        namespace_id = self._namespace_ids.get(_encode_namespace(namespace))
+        if namespace_id is None:
+            return lambda row: False
+        row_namespaces = self._row_namespaces
+        return lambda row: row_namespaces[row] == namespace_id
+
+    def search(self,
+               query_keywords: List[str],
+               n_results: int,
+               accept: Callable[[int], bool] = None) -> List[Tuple[float, int]]:
+        """คืนค่า (distance, row) ที่ดีที่สุด n_results รายการ ด้วย Jaccard similarity
+
+        accept(row) ใช้กรองแถว (เช่น ตาม namespace) ก่อนจัดอันดับ
+        """
+        if not query_keywords or n_results <= 0:
+            return []
+
+        overlaps = defaultdict(int)
+        for keyword in query_keywords:
+            keyword_index = self.find_keyword(keyword)
+            if keyword_index is None:
+                continue
+            for row in self.postings(keyword_index):
+                overlaps[row] += 1
+        if accept is not None:
+            overlaps = {row: count for row, count in overlaps.items() if accept(row)}
+
+        query_size = len(query_keywords)
+        row_counts = self._row_counts
+        scored = (
+            (1 - intersection / (query_size + row_counts[row] - intersection), row)
+            for row, intersection in overlaps.items()
+        )
+        return heapq.nsmallest(n_results, scored)
+
+    def decode_row(self, row: int) -> Dict[str, Any]:
+        """ถอดรหัส JSON ของแถวเดียว"""
+        base = self._offsets['content_blob']
+        start = base + self._content_offsets[row]
+        end = base + self._content_offsets[row + 1]
+        return json.loads(self._mmap[start:end].decode('utf-8'))
+
+    def close(self):
+        """ปิด mmap และไฟล์"""
+        for name in ('_keyword_offsets', '_posting_offsets', '_row_counts', '_content_offsets', '_row_namespaces',
+                     '_view'):
+            view = getattr(self, name, None)
+            if isinstance(view, memoryview):
+                view.release()
+        try:
+            self._mmap.close()
+        except BufferError:
+            # ยังมี posting view ที่ผู้เรียกถืออยู่ ปล่อยให้ GC ปิดแทน
+            pass
+        self._file.close()
+
+    def _uint_section(self, section: str, code: str, count: int):
+        return self._uint_slice(self._offsets[section], code, count)
+
+    def _uint_slice(self, start: int, code: str, count: int):
+        size = struct.calcsize(code) * count
+        if _NATIVE_LITTLE:
+            return self._view[start:start + size].cast(code)
+        values = array(code)
+        values.frombytes(self._mmap[start:start + size])
+        values.byteswap()
+        return values
+
+
+def _encode_namespace(namespace: Any) -> bytes:
+    return json.dumps(namespace, ensure_ascii=False).encode('utf-8')
+
+
+def _to_little_endian(section) -> bytes:
+    if isinstance(section, array):
+        if not _NATIVE_LITTLE:
+            section = array(section.typecode, section)
+            section.byteswap()
+        return section.tobytes()
+    return bytes(section)
+
+
+def _padding(position: int) -> int:
+    return -position % 8
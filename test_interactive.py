@@ -39,11 +39,20 @@ def interactive_test():
             break
         
         if user_input.strip():
-            print("\n🤖 AI: กำลังประมวลผล...")
+            print("\n🤖 AI: ", end="", flush=True)
             
             try:
-                response_data = agent.process(user_input)
-                print(f"🤖 AI: {response_data['response']}")
+                # แสดงคำตอบทีละส่วนทันทีที่ได้รับ
+                response_data = {}
+                for event in agent.process_stream(user_input):
+                    if event["type"] == "token":
+                        print(event["content"], end="", flush=True)
+                    else:
+                        response_data = event
+                print()
+                
+                if not response_data.get("success", True):
+                    print(f"🤖 AI: {response_data['response']}")
                 
                 # แสดงข้อมูลเพิ่มเติม
                 if response_data.get("planning_used"):
@@ -0,0 +1,22 @@
+# agent/tests/conftest.py
+"""ให้ import โมดูลของ repo นี้เป็น package agent ได้ ไม่ว่าโฟลเดอร์จะชื่ออะไร (เช่น agent.core)"""
+import os
+import sys
+import types
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+if "agent" not in sys.modules:
+    package = types.ModuleType("agent")
+    package.__path__ = [ROOT]
+    sys.modules["agent"] = package
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """รันในโฟลเดอร์ชั่วคราวที่มี data/ (เครื่องมือและ log ใช้ path สัมพันธ์กับโฟลเดอร์ปัจจุบัน)"""
+    (tmp_path / "data").mkdir()
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
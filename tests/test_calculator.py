@@ -0,0 +1,24 @@
+# agent/tests/test_calculator.py
+import pytest
+
+pytest.importorskip("numpy")
+
+from agent.calculator import batch_evaluate
+
+
+def test_batch_reports_numpy_errors_per_expression():
+    results = batch_evaluate(["1+2", "max([])", "x/0", "sum(x)"], {"x": [1, 2, 3]})
+
+    assert results[0] == {"expression": "1+2", "result": 3}
+    assert results[1]["expression"] == "max([])"
+    assert results[1]["error"].startswith("คำนวณไม่ได้")
+    assert results[2] == {"expression": "x/0", "error": "หารด้วยศูนย์"}
+    assert results[3] == {"expression": "sum(x)", "result": 6}
+
+
+def test_assignment_after_failed_expression_still_runs():
+    results = batch_evaluate(["total = price * qty", "min([])", "sum(total)"],
+                             {"price": [10, 20], "qty": [1, 3]})
+
+    assert "error" in results[1]
+    assert results[2]["result"] == 70
@@ -0,0 +1,27 @@
+# agent/tests/test_core.py
+import json
+
+from agent.benchmarks.fake_llm import FakeChatModel
+from agent.core import AdvancedAgenticAI
+from agent.router import Router
+from agent.simple_memory import SimpleVectorMemory
+
+
+def _agent(**options) -> AdvancedAgenticAI:
+    return AdvancedAgenticAI(llm=FakeChatModel(latency=0), router=Router(log_path=None), **options)
+
+
+def test_related_memories_are_plain_dicts(workdir):
+    base = SimpleVectorMemory()
+    base.add_memory("ราคาทองคำวันนี้สูงขึ้น", {"namespace": "u1"})
+    base.save_snapshot("data/base.snapshot")
+
+    agent = _agent(memory_snapshot="data/base.snapshot")
+    agent.memory.add_memory("ราคาทองคำเมื่อวานลดลง", {"namespace": "u1"})
+
+    memories = agent._search_memories("ราคาทองคำ")
+    assert len(memories) == 2
+    assert all(type(memory) is dict for memory in memories)
+    assert {memory["content"] for memory in memories} == {"ราคาทองคำวันนี้สูงขึ้น", "ราคาทองคำเมื่อวานลดลง"}
+    json.dumps({"related_memories": memories}, ensure_ascii=False)
+    agent.memory.close()
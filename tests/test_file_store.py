@@ -0,0 +1,48 @@
+# agent/tests/test_file_store.py
+from agent.file_store import FileStore
+
+
+def _disk(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def test_stale_write_behind_batch_does_not_overwrite_newer_write(workdir):
+    store = FileStore(write_behind=True, flush_delay=60)
+    store.write("note.txt", "old")
+
+    # thread เบื้องหลังรับชุดที่รอเขียนไปแล้ว แต่ยังไม่ได้เขียนลงดิสก์
+    with store._lock:
+        batch, store._pending = store._pending, {}
+        store._flushing.update(batch)
+
+    store.write("note.txt", "newer")
+    store.flush()
+    store._write_pending(batch)
+
+    assert _disk("data/note.txt") == b"newer"
+    assert store.read("note.txt") == "newer"
+    assert store.get_stats()["pending_writes"] == 0
+
+
+def test_direct_write_replaces_pending_write_behind(workdir):
+    store = FileStore(write_behind=True, flush_delay=60)
+    store.write("note.txt", "deferred")
+    store.write_behind = False
+    store.write("note.txt", "direct")
+    store.flush()
+
+    assert _disk("data/note.txt") == b"direct"
+    assert store.get_stats()["pending_writes"] == 0
+
+
+def test_reads_translate_crlf_like_text_mode(workdir):
+    with open("data/notes.txt", "wb") as f:
+        f.write(b"first\r\nsecond\r\nthird\rfourth\n")
+    store = FileStore()
+
+    with open("data/notes.txt", "r", encoding="utf-8") as f:
+        assert store.read("notes.txt") == f.read()
+    assert store.read_lines("notes.txt", 2, 2) == "second\n"
+    assert store.read_lines("notes.txt", 3) == "third\nfourth\n"
+    assert store.grep("notes.txt", "second")["matches"] == [{"line": 2, "text": "second"}]
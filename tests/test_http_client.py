@@ -0,0 +1,177 @@
+# agent/tests/test_http_client.py
+import asyncio
+import os
+
+import pytest
+
+pytest.importorskip("requests")
+
+from agent.benchmarks.fixture_server import FixtureServer
+from agent.http_client import HttpCache, HttpClient, AsyncHttpClient
+from agent.tools import ToolManager
+
+
+@pytest.fixture
+def server():
+    with FixtureServer() as fixture:
+        yield fixture
+
+
+def test_streaming_scrape_is_served_from_cache(server):
+    client = HttpClient(cache=HttpCache())
+    tools = ToolManager(http_client=client)
+    url = f"{server.base_url}/page/1?kb=64&max_age=600"
+
+    results = [tools.web_scrape(url) for _ in range(3)]
+
+    assert server.requests == 1
+    assert client.get_metrics()["cache_hits"] == 2
+    assert results[0]["title"] == "หน้าทดสอบ 1"
+    assert results[0] == results[1] == results[2]
+    # body ที่เก็บจากการ stream ใช้กับ get ได้ด้วย
+    assert client.get(url).content == server.page(1, 64)
+    assert server.requests == 1
+    client.close()
+
+
+def test_async_streaming_scrape_is_served_from_cache(server):
+    pytest.importorskip("aiohttp")
+    client = AsyncHttpClient(cache=HttpCache())
+    tools = ToolManager(async_http_client=client)
+    url = f"{server.base_url}/page/2?kb=64&max_age=600"
+
+    async def scrape():
+        try:
+            return [await tools.aweb_scrape(url) for _ in range(3)]
+        finally:
+            await client.close()
+
+    results = asyncio.run(scrape())
+    assert server.requests == 1
+    assert client.get_metrics()["cache_hits"] == 2
+    assert results[0]["title"] == "หน้าทดสอบ 2"
+    assert client.cache.get(url).content == server.page(2, 64)
+
+
+def test_truncated_and_uncacheable_streams_are_not_cached(server):
+    client = HttpClient(cache=HttpCache())
+    truncated = f"{server.base_url}/page/3?kb=64&max_age=600"
+    no_store = f"{server.base_url}/page/4?kb=8"
+
+    for _ in range(2):
+        with client.stream(truncated, max_bytes=4096) as body:
+            assert len(b"".join(body)) == 4096
+        with client.stream(no_store) as body:
+            assert b"".join(body) == server.page(4, 8)
+
+    assert server.requests == 4
+    assert client.cache.get(truncated) is None
+    assert client.cache.get(no_store) is None
+    client.close()
+
+
+def test_aborted_stream_is_not_cached(server):
+    client = HttpClient(cache=HttpCache())
+    url = f"{server.base_url}/page/5?kb=64&max_age=600"
+
+    with pytest.raises(RuntimeError):
+        with client.stream(url) as body:
+            next(iter(body))
+            raise RuntimeError("ยกเลิก")
+
+    assert client.cache.get(url) is None
+    client.close()
+
+
+def test_async_client_closes_sessions_of_finished_loops(server):
+    pytest.importorskip("aiohttp")
+    client = AsyncHttpClient(cache=HttpCache())
+    url = f"{server.base_url}/search?q=test"
+    sessions = []
+
+    async def fetch():
+        await client.get(url, use_cache=False)
+        sessions.append(client._sessions[asyncio.get_running_loop()][0])
+
+    for _ in range(3):
+        asyncio.run(fetch())
+
+    assert len(set(map(id, sessions))) == 3
+    assert all(session.closed for session in sessions)
+    assert len(client._sessions) == 1
+
+    async def reuse():
+        await client.get(url, use_cache=False)
+        session = client._sessions[asyncio.get_running_loop()][0]
+        await client.close()
+        return session
+
+    assert asyncio.run(reuse()).closed
+    assert client._sessions == {}
+
+
+def test_stale_stream_is_revalidated_with_etag(server):
+    client = HttpClient(cache=HttpCache())
+    url = f"{server.base_url}/page/6?kb=16&max_age=0"
+
+    for _ in range(3):
+        with client.stream(url) as body:
+            assert b"".join(body) == server.page(6, 16)
+
+    assert server.requests == 3
+    assert server.not_modified == 2
+    assert client.get_metrics()["revalidated"] == 2
+    client.close()
+
+
+def test_async_stale_stream_is_revalidated_with_etag(server):
+    pytest.importorskip("aiohttp")
+    client = AsyncHttpClient(cache=HttpCache())
+    url = f"{server.base_url}/page/7?kb=16&max_age=0"
+
+    async def read_twice():
+        bodies = []
+        try:
+            for _ in range(2):
+                async with client.stream(url) as body:
+                    bodies.append(b"".join([chunk async for chunk in body]))
+        finally:
+            await client.close()
+        return bodies
+
+    assert asyncio.run(read_twice()) == [server.page(7, 16)] * 2
+    assert server.not_modified == 1
+    assert client.get_metrics()["revalidated"] == 1
+
+
+def _response(url, size):
+    from agent.http_client import CachedResponse
+    return CachedResponse(url=url, status_code=200, headers={}, content=b"x" * size, expires_at=1e12)
+
+
+def test_disk_cache_is_bounded(workdir):
+    cache = HttpCache(max_entries=1, directory="data/http", max_disk_entries=3, max_disk_bytes=10_000)
+    for number in (2, 3, 4):
+        cache.put(f"http://example/{number}", _response(f"http://example/{number}", 1000))
+    assert len(os.listdir("data/http")) == 6
+    for number in (2, 3, 4):
+        path = os.path.join("data/http", cache._name(f"http://example/{number}") + ".json")
+        os.utime(path, (number, number))
+
+    # รายการที่เขียนนานที่สุดถูกลบจากดิสก์ และนับรวมไฟล์ที่มีอยู่แล้วเมื่อเปิดใหม่
+    reopened = HttpCache(directory="data/http", max_disk_entries=3, max_disk_bytes=2500)
+    assert len(os.listdir("data/http")) == 4
+    assert reopened.get("http://example/0") is None
+    assert reopened.get("http://example/2") is None
+    assert reopened.get("http://example/3").content == b"x" * 1000
+    assert reopened.get("http://example/4").content == b"x" * 1000
+
+
+def test_clear_removes_disk_entries(workdir):
+    cache = HttpCache(directory="data/http")
+    cache.put("http://example/a", _response("http://example/a", 10))
+    cache.clear()
+
+    assert os.listdir("data/http") == []
+    assert cache.get("http://example/a") is None
+    assert HttpCache(directory="data/http").get("http://example/a") is None
@@ -0,0 +1,22 @@
+# agent/tests/test_llm_cache.py
+from agent.llm_cache import LLMResponseCache
+
+
+def _messages(question: str):
+    return ["คุณคือผู้ช่วย", question]
+
+
+def test_semantic_rebuild_is_silent_and_keeps_live_entries(capsys):
+    cache = LLMResponseCache(max_entries=4, path=None, similarity_threshold=0.5)
+    questions = [f"สภาพอากาศ เมือง{name} วันนี้" for name in
+                 ("alpha", "beta", "gamma", "delta", "epsilon", "zeta", "eta", "theta", "iota", "kappa")]
+    for question in questions:
+        cache.put(_messages(question), "model", 0.0, f"ตอบ {question}", query=question)
+
+    assert capsys.readouterr().out == ""
+    assert cache._semantic_size <= 2 * cache.max_entries + 1
+    assert cache.get(_messages("ถามใหม่"), "model", 0.0, query="สภาพอากาศ เมืองkappa วันนี้ไหม") == \
+        f"ตอบ {questions[-1]}"
+
+    cache.clear()
+    assert capsys.readouterr().out == ""
@@ -0,0 +1,36 @@
+# agent/tests/test_memory.py
+import pytest
+
+pytest.importorskip("chromadb")
+
+from agent.memory import VectorMemory
+
+
+class FlakyEmbedding:
+    """embedding function ที่ผิดพลาดในครั้งแรก"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, texts):
+        self.calls += 1
+        if self.calls == 1:
+            raise RuntimeError("embedding ไม่พร้อม")
+        return [[float(len(text)), 1.0] for text in texts]
+
+
+def test_failed_flush_keeps_batch(workdir):
+    memory = VectorMemory(collection_name="flaky", batch_size=100, flush_interval=60,
+                          embedding_function=FlakyEmbedding())
+    memory.add_memory("ประชุม alpha")
+    memory.add_memory("ประชุม beta")
+
+    with pytest.raises(RuntimeError):
+        memory.flush()
+    assert memory.stats["flush_errors"] == 1
+    assert len(memory._pending) == 2
+
+    memory.flush()
+    assert memory._pending == []
+    assert memory.collection.count() == 2
+    memory.close()
@@ -0,0 +1,100 @@
+# agent/tests/test_persistence.py
+import os
+
+from agent.persistence import MemoryLog
+from agent.simple_memory import SimpleVectorMemory
+
+
+def _contents(memory: SimpleVectorMemory):
+    return [record["content"] for record in memory.get_recent_memories(limit=100)]
+
+
+def test_replay_restores_log_after_restart(workdir):
+    memory = SimpleVectorMemory(persist_directory="data/log", sync_every=1000)
+    notes = ["ประชุม alpha", "ประชุม beta", "ประชุม gamma"]
+    for note in notes:
+        memory.add_memory(note)
+    memory.close()
+
+    reopened = SimpleVectorMemory(persist_directory="data/log")
+    assert _contents(reopened) == notes
+    assert reopened.search_memory("beta", n_results=1)[0]["content"] == "ประชุม beta"
+    reopened.close()
+
+
+def test_replay_after_compaction_and_tail(workdir):
+    memory = SimpleVectorMemory(persist_directory="data/log")
+    memory.add_memory("ก่อน compact")
+    memory.compact_log()
+    memory.add_memory("หลัง compact")
+    memory.close()
+
+    log = MemoryLog("data/log")
+    records = list(log.replay())
+    log.close()
+    assert [record["memory"]["content"] for record in records] == ["ก่อน compact", "หลัง compact"]
+    assert records[-1]["seq"] == log.last_seq == 2
+
+
+def test_torn_tail_is_truncated(workdir):
+    memory = SimpleVectorMemory(persist_directory="data/log")
+    memory.add_memory("ครบถ้วน")
+    memory.close()
+    wal = os.path.join("data/log", "wal.jsonl")
+    size = os.path.getsize(wal)
+    with open(wal, "a", encoding="utf-8") as f:
+        f.write('{"seq": 2, "op": "add", "memory": {"content": "ขาด')
+
+    reopened = SimpleVectorMemory(persist_directory="data/log")
+    assert _contents(reopened) == ["ครบถ้วน"]
+    assert os.path.getsize(wal) == size
+    reopened.add_memory("ต่อท้ายได้")
+    reopened.close()
+
+    again = SimpleVectorMemory(persist_directory="data/log")
+    assert _contents(again) == ["ครบถ้วน", "ต่อท้ายได้"]
+    again.close()
+
+
+def test_clear_survives_restart_with_base_snapshot(workdir):
+    base = SimpleVectorMemory()
+    base.add_memory("ความจำใน snapshot ฐาน")
+    base.save_snapshot("data/base.snapshot")
+
+    memory = SimpleVectorMemory(persist_directory="data/log", snapshot_path="data/base.snapshot")
+    memory.add_memory("ความจำใน log")
+    assert memory.get_collection_info()["count"] == 2
+    memory.clear_memory()
+    memory.add_memory("หลังล้าง")
+    memory.close()
+
+    reopened = SimpleVectorMemory(persist_directory="data/log", snapshot_path="data/base.snapshot")
+    assert _contents(reopened) == ["หลังล้าง"]
+    assert reopened.search_memory("snapshot ฐาน") == []
+    # การ compact หลังล้างต้องไม่ทำให้ snapshot ฐานกลับมา
+    reopened.compact_log()
+    reopened.close()
+
+    compacted = SimpleVectorMemory(persist_directory="data/log", snapshot_path="data/base.snapshot")
+    assert compacted.get_collection_info()["count"] == 1
+    compacted.close()
+
+
+def test_load_from_file_replaces_base_snapshot_after_restart(workdir):
+    base = SimpleVectorMemory()
+    base.add_memory("ประชุม alpha")
+    base.save_snapshot("data/base.snapshot")
+    backup = SimpleVectorMemory()
+    backup.add_memory("ประชุม beta")
+    backup.save_to_file("b.json")
+
+    memory = SimpleVectorMemory(persist_directory="data/log", snapshot_path="data/base.snapshot")
+    memory.load_from_file("b.json")
+    assert memory.search_memory("alpha") == []
+    memory.close()
+
+    reopened = SimpleVectorMemory(persist_directory="data/log", snapshot_path="data/base.snapshot")
+    assert reopened.search_memory("alpha") == []
+    assert _contents(reopened) == ["ประชุม beta"]
+    assert reopened.get_collection_info()["count"] == 1
+    reopened.close()
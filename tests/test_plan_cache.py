@@ -0,0 +1,95 @@
+# agent/tests/test_plan_cache.py
+from agent.plan_cache import PlanCache, task_signature
+
+TOOLS = ["web_search", "web_scrape", "save_note"]
+
+
+def _plan(url, topic):
+    return {
+        "goal": f"สรุป {url}",
+        "steps": [
+            {"step": 1, "description": f"อ่าน {url}", "tool": "web_scrape",
+             "parameters": {"url": url}, "depends_on": []},
+            {"step": 2, "description": f"สรุปเรื่อง {topic}", "tool": None,
+             "parameters": {}, "depends_on": [1]},
+        ],
+    }
+
+
+def test_signature_separates_intent_structure_and_arguments():
+    intents, kinds, words, args = task_signature('สรุป https://a.example/x เรื่อง "ภาษี"')
+    assert intents == ("สรุป",)
+    assert kinds == ("url", "quoted")
+    assert words == ("เรื่อง",)
+    assert args == ["https://a.example/x", "ภาษี"]
+
+
+def test_lookup_fills_arguments_of_new_task():
+    cache = PlanCache()
+    assert cache.store('สรุป https://a.example/one "ภาษี"', _plan("https://a.example/one", "ภาษี"), TOOLS)
+
+    plan = cache.lookup('สรุป https://b.example/two "ดอกเบี้ย"', TOOLS)
+    assert plan["from_cache"] is True
+    assert plan["steps"][0]["parameters"] == {"url": "https://b.example/two"}
+    assert plan["steps"][1]["description"] == "สรุปเรื่อง ดอกเบี้ย"
+    assert plan["steps"][1]["depends_on"] == [1]
+
+    metrics = cache.get_metrics()
+    assert (metrics["hits"], metrics["stored"], metrics["llm_calls_avoided"]) == (1, 1, 1)
+
+
+def test_lookup_returns_independent_copies():
+    cache = PlanCache()
+    task = 'สรุป https://a.example/one "ภาษี"'
+    cache.store(task, _plan("https://a.example/one", "ภาษี"), TOOLS)
+
+    first = cache.lookup(task, TOOLS)
+    first["steps"][0]["parameters"]["url"] = "changed"
+    assert cache.lookup(task, TOOLS)["steps"][0]["parameters"]["url"] == "https://a.example/one"
+
+
+def test_plans_that_cannot_be_templated_are_rejected():
+    cache = PlanCache()
+    # ไม่ได้ใช้อาร์กิวเมนต์ "ภาษี" ของงาน
+    assert not cache.store('สรุป https://a.example/one "ภาษี"', _plan("https://a.example/one", "อื่น"), TOOLS)
+    # แผนจาก cache หรือ fallback ไม่ถูกเก็บซ้ำ
+    assert not cache.store('สรุป https://a.example/one "ภาษี"',
+                           dict(_plan("https://a.example/one", "ภาษี"), from_cache=True), TOOLS)
+    # ใช้เครื่องมือที่ไม่มี
+    assert not cache.store('สรุป https://a.example/one "ภาษี"', _plan("https://a.example/one", "ภาษี"), ["save_note"])
+    # งานที่ไม่มีคำบอกชนิดงาน
+    assert not cache.store('https://a.example/one "ภาษี"', _plan("https://a.example/one", "ภาษี"), TOOLS)
+    assert cache.get_metrics()["rejected"] == 4
+    assert cache.lookup('สรุป https://b.example/two "ดอกเบี้ย"', TOOLS) is None
+
+
+def test_changing_tools_invalidates_templates():
+    cache = PlanCache()
+    cache.store('สรุป https://a.example/one "ภาษี"', _plan("https://a.example/one", "ภาษี"), TOOLS)
+
+    assert cache.lookup('สรุป https://b.example/two "ดอกเบี้ย"', TOOLS + ["calculator"]) is None
+    metrics = cache.get_metrics()
+    assert (metrics["invalidations"], metrics["templates"]) == (1, 0)
+
+
+def test_least_recently_used_template_is_evicted():
+    cache = PlanCache(max_entries=2)
+    cache.store('สรุป https://a.example/one "ภาษี"', _plan("https://a.example/one", "ภาษี"), TOOLS)
+    cache.store('ค้นหา "ภาษี"', {"steps": [{"step": 1, "description": "ค้นหา ภาษี", "tool": "web_search",
+                                            "parameters": {"query": "ภาษี"}}]}, TOOLS)
+    assert cache.lookup('สรุป https://b.example/two "ดอกเบี้ย"', TOOLS) is not None
+    cache.store('แปล "ภาษี"', {"steps": [{"step": 1, "description": "แปล ภาษี"}]}, TOOLS)
+
+    assert cache.lookup('ค้นหา "ดอกเบี้ย"', TOOLS) is None
+    assert cache.lookup('สรุป https://c.example/three "หุ้น"', TOOLS) is not None
+    assert cache.lookup('แปล "หุ้น"', TOOLS)["steps"][0]["description"] == "แปล หุ้น"
+
+
+def test_same_intent_with_different_structure_misses():
+    cache = PlanCache()
+    cache.store('สรุป https://a.example/one "ภาษี"', _plan("https://a.example/one", "ภาษี"), TOOLS)
+
+    assert cache.lookup('สรุป https://b.example/two "ดอกเบี้ย" แล้วส่งอีเมล', TOOLS) is None
+    assert cache.lookup('สรุป https://b.example/two "ดอกเบี้ย" ให้สั้นที่สุด', TOOLS) is None
+    assert cache.lookup('สรุป https://b.example/two "ดอกเบี้ย"', TOOLS) is not None
+    assert cache.get_metrics()["misses"] == 2
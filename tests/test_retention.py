@@ -0,0 +1,38 @@
+# agent/tests/test_retention.py
+import pytest
+
+from agent.retention import ColdTier, RetentionPolicy
+from agent.simple_memory import SimpleVectorMemory
+
+
+def _memory_classes():
+    classes = [SimpleVectorMemory]
+    try:
+        from agent.vector_memory import NumpyVectorMemory
+    except ImportError:
+        return classes
+    return classes + [lambda **options: NumpyVectorMemory(dim=64, **options)]
+
+
+def test_cold_tier_clear_removes_entries(workdir):
+    cold = ColdTier("data/cold.jsonl")
+    cold.append([{"id": "1", "content": "secret gamma", "keywords": ["secret", "gamma"], "metadata": {}}])
+    assert cold.count() == 1
+
+    cold.clear()
+    assert cold.count() == 0
+    assert cold.search(["gamma"], 5) == []
+
+
+@pytest.mark.parametrize("memory_class", _memory_classes())
+def test_clear_memory_clears_cold_tier(workdir, memory_class):
+    memory = memory_class(retention=RetentionPolicy(max_entries=1),
+                          cold_tier=ColdTier("data/cold.jsonl"))
+    memory.add_memory("secret gamma one")
+    memory.add_memory("secret gamma two")
+    assert memory.cold_tier.count() >= 1
+    assert memory.search_memory("gamma")
+
+    memory.clear_memory()
+    assert memory.search_memory("gamma") == []
+    assert memory.cold_tier.count() == 0
@@ -0,0 +1,53 @@
+# agent/tests/test_router.py
+import os
+
+from agent.router import Router, label_of, load_log
+
+
+def _response(steps, results, user_input="ค้นหาข่าวล่าสุดแล้วบันทึกลงไฟล์"):
+    return {
+        "user_input": user_input,
+        "route": "plan",
+        "complexity_score": 0.9,
+        "planning_used": True,
+        "success": True,
+        "plan": {"steps": steps},
+        "execution_result": {"results": results},
+    }
+
+
+def test_record_round_trip_uses_plan_step_numbers(workdir):
+    router = Router(log_path="data/routing_log.jsonl")
+    # เลขขั้นตอนไม่ได้เริ่มที่ 1 และไม่ตรงกับลำดับใน list
+    steps = [
+        {"step": 3, "action": "สรุป", "tool": None},
+        {"step": 7, "action": "ค้นหา", "tool": "web_search"},
+    ]
+    results = [
+        {"step": 3, "success": True},
+        {"step": 7, "success": True},
+    ]
+    router.record(_response(steps, results))
+    router.record(_response(steps[:1], results[:1], user_input="สรุปบทความนี้ให้หน่อย"))
+
+    records = load_log("data/routing_log.jsonl")
+    assert [record["tool_steps"] for record in records] == [1, 0]
+    assert [label_of(record) for record in records] == ["plan", "direct"]
+    assert records[0]["input"] == "ค้นหาข่าวล่าสุดแล้วบันทึกลงไฟล์"
+
+
+def test_failed_tool_step_is_not_counted(workdir):
+    router = Router(log_path="data/routing_log.jsonl")
+    steps = [{"step": 2, "action": "ค้นหา", "tool": "web_search"}]
+    router.record(_response(steps, [{"step": 2, "success": False}]))
+
+    record, = load_log("data/routing_log.jsonl")
+    assert record["tool_steps"] == 0
+    assert label_of(record) == "direct"
+
+
+def test_logging_is_opt_in(workdir):
+    steps = [{"step": 1, "action": "ค้นหา", "tool": "web_search"}]
+    Router().record(_response(steps, [{"step": 1, "success": True}]))
+    Router.load("data/missing_model.json").record(_response(steps, [{"step": 1, "success": True}]))
+    assert not os.path.exists("data/routing_log.jsonl")
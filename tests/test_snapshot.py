@@ -0,0 +1,85 @@
+# agent/tests/test_snapshot.py
+import struct
+
+import pytest
+
+from agent import snapshot
+from agent.snapshot import MappedSnapshot, write_snapshot
+from agent.simple_memory import SimpleVectorMemory, extract_keywords
+
+MEMORIES = [
+    ("รายงานยอดขาย north", {"namespace": "u1"}),
+    ("รายงานยอดขาย south", {"namespace": "u2"}),
+    ("รายงานยอดขาย east", {}),
+    ("รายงานยอดขาย west", {"namespace": 7}),
+    ("รายงานยอดขาย central", {"namespace": "u1"}),
+]
+
+
+def _rows():
+    return [
+        {"id": f"m{row}", "content": content, "metadata": metadata, "keywords": extract_keywords(content)}
+        for row, (content, metadata) in enumerate(MEMORIES)
+    ]
+
+
+@pytest.fixture
+def snapshot_path(tmp_path):
+    path = str(tmp_path / "memory.snapshot")
+    assert write_snapshot(_rows(), path) == len(MEMORIES)
+    return path
+
+
+def _search(mapped: MappedSnapshot, namespace):
+    results = mapped.search(extract_keywords("รายงานยอดขาย"), 10, mapped.namespace_filter(namespace))
+    return sorted(mapped[row]["content"] for _, row in results)
+
+
+def test_namespace_filter_reads_column_without_decoding(snapshot_path, monkeypatch):
+    mapped = MappedSnapshot(snapshot_path)
+    decoded = []
+    original = MappedSnapshot.decode_row
+    monkeypatch.setattr(MappedSnapshot, "decode_row", lambda self, row: decoded.append(row) or original(self, row))
+
+    accept = mapped.namespace_filter("u1")
+    assert [row for row in range(len(mapped)) if accept(row)] == [0, 4]
+    assert [row for row in range(len(mapped)) if mapped.namespace_filter(7)(row)] == [3]
+    assert not any(mapped.namespace_filter("missing")(row) for row in range(len(mapped)))
+    assert decoded == []
+
+    assert _search(mapped, "u1") == ["รายงานยอดขาย central", "รายงานยอดขาย north"]
+    mapped.close()
+
+
+def test_first_version_snapshot_still_filters(snapshot_path):
+    # เขียน header รุ่นแรกทับ (section ทั้งเจ็ดแรกอยู่ตำแหน่งเดิม)
+    with open(snapshot_path, "rb") as f:
+        data = bytearray(f.read())
+    fields = snapshot._HEADER.unpack_from(data, 0)
+    header = snapshot._HEADER_V1.pack(snapshot.MAGIC_V1, fields[1], fields[2], *fields[4:11])
+    data[:len(header)] = header
+    with open(snapshot_path, "wb") as f:
+        f.write(data)
+
+    mapped = MappedSnapshot(snapshot_path)
+    assert _search(mapped, "u1") == ["รายงานยอดขาย central", "รายงานยอดขาย north"]
+    assert _search(mapped, 7) == ["รายงานยอดขาย west"]
+    mapped.close()
+
+
+def test_memory_namespace_search_over_snapshot(snapshot_path):
+    memory = SimpleVectorMemory(snapshot_path=snapshot_path)
+    memory.add_memory("รายงานยอดขาย online", {"namespace": "u2"})
+
+    found = memory.search_memory("รายงานยอดขาย", n_results=10, namespace="u2")
+    assert sorted(record["content"] for record in found) == ["รายงานยอดขาย online", "รายงานยอดขาย south"]
+    recent = memory.get_recent_memories(limit=10, namespace="u1")
+    assert [record["content"] for record in recent] == ["รายงานยอดขาย north", "รายงานยอดขาย central"]
+    memory.close()
+
+
+def test_rejects_unknown_format(tmp_path):
+    path = tmp_path / "bad.snapshot"
+    path.write_bytes(b"NOTASNAP" + struct.pack("<Q", 0) * 12)
+    with pytest.raises(ValueError):
+        MappedSnapshot(str(path))
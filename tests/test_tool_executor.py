@@ -0,0 +1,58 @@
+# agent/tests/test_tool_executor.py
+import asyncio
+
+import pytest
+
+from agent.benchmarks.fixture_server import FixtureServer
+from agent.tool_executor import ToolExecutor, ToolExecutionError
+from agent.tools import ToolManager
+
+
+class Label(str):
+    """str subclass (เหมือน NavigableString) ที่ไม่ควรถูกส่งกลับจาก worker"""
+
+
+def label_result(text: str):
+    return {"items": [1, 2.5, None, (text, b"raw")], "label": Label(text)}
+
+
+def plain_result(text: str):
+    return {"items": [1, 2.5, None, (text, b"raw")], "label": text}
+
+
+@pytest.fixture(scope="module")
+def executor():
+    executor = ToolExecutor(max_workers=1, timeout=30)
+    yield executor
+    executor.close()
+
+
+def test_only_plain_values_cross_the_pool(executor):
+    assert executor.run(plain_result, "ok") == {"items": [1, 2.5, None, ("ok", b"raw")], "label": "ok"}
+    with pytest.raises(ToolExecutionError, match="Label"):
+        executor.run(label_result, "ok")
+    assert executor.get_metrics()["errors"] == 1
+
+
+def test_non_streaming_scrape_through_executor(executor):
+    pytest.importorskip("bs4")
+    pytest.importorskip("requests")
+    tools = ToolManager(executor=executor)
+    with FixtureServer() as server:
+        url = f"{server.base_url}/page/3?kb=64"
+        result = tools.web_scrape(url, streaming=False)
+        async_result = asyncio.run(tools.aweb_scrape(url, streaming=False))
+
+    assert "error" not in result, result
+    assert type(result["title"]) is str and result["title"] == "หน้าทดสอบ 3"
+    assert type(result["content"]) is str and len(result["content"]) == 5000
+    assert "var items" not in result["content"]
+    assert async_result == result
+
+
+def test_calculator_results_are_plain(executor):
+    pytest.importorskip("numpy")
+    tools = ToolManager(executor=executor)
+    assert tools.calculator("2 ** 10") == 1024.0
+    results = tools.batch_calculator(["x * 2", "total = x + 1", "sum(total)"], {"x": [1, 2, 3]})
+    assert [result["result"] for result in results] == [[2.0, 4.0, 6.0], [2.0, 3.0, 4.0], 9.0]
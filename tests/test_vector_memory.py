@@ -0,0 +1,27 @@
+# agent/tests/test_vector_memory.py
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from agent.vector_memory import NumpyVectorMemory
+
+
+def test_failed_load_keeps_existing_memory(workdir):
+    memory = NumpyVectorMemory(dim=64)
+    memory.add_memory("ราคาน้ำมันวันนี้")
+    memory.add_memory("ตารางประชุมสัปดาห์หน้า")
+    memory.save_to_file("backup.json")
+    with open("data/backup.json", encoding="utf-8") as f:
+        text = f.read()
+    with open("data/truncated.json", "w", encoding="utf-8") as f:
+        f.write(text[:len(text) // 2])
+
+    for filename in ("missing.json", "truncated.json"):
+        memory.load_from_file(filename)
+        assert memory.get_collection_info()["count"] == 2
+        assert memory.search_memory("ราคาน้ำมัน", n_results=1)[0]["content"] == "ราคาน้ำมันวันนี้"
+
+    restored = NumpyVectorMemory(dim=64)
+    restored.load_from_file("backup.json")
+    assert [record["content"] for record in restored.get_recent_memories()] == \
+        ["ราคาน้ำมันวันนี้", "ตารางประชุมสัปดาห์หน้า"]
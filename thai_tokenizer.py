@@ -0,0 +1,180 @@
+# agent/thai_tokenizer.py
+from typing import List, Dict, Iterable, Optional, Tuple
+from functools import lru_cache
+import os
+import re
+import threading
+
+WORDS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "thai_words.txt")
+
+# ช่วงอักษรไทย (ไม่รวมเลขไทย ๐-๙ ซึ่งนับเป็นตัวเลขเหมือน \w)
+_TOKENS = re.compile(r'[ก-๏]+|[^\W฀-๏]+')
+_THAI = re.compile(r'[ก-๏]')
+# สระหน้า: ตัดคำหลังตัวอักษรเหล่านี้ไม่ได้
+_LEADING = set('เแโใไ')
+# สระบน/ล่าง/หลัง วรรณยุกต์ และการันต์: ตัดคำก่อนตัวอักษรเหล่านี้ไม่ได้
+_FOLLOWING = set('ะัาำิีึืฺุูๅ็่้๊๋์ํ๎')
+
+# คำไวยากรณ์ที่พบบ่อยจนไม่ช่วยแยกความจำ (ไม่ใช้เป็นคำสำคัญ)
+STOPWORDS = frozenset("""
+กับ แก่ และ หรือ แต่ เพราะ ถ้า หาก เมื่อ ของ ใน บน จาก โดย ด้วย ตาม สำหรับ เพื่อ ที่ ซึ่ง อัน ว่า คือ
+เป็น อยู่ มี ได้ ให้ จะ ก็ ไม่ แล้ว ยัง อีก เลย นะ นะคะ ครับ ค่ะ คะ จ้ะ จ้า ครับผม หน่อย บ้าง กัน นี้ นั้น
+นี่ นั่น การ ความ ไหม มั้ย ช่วย กรุณา โปรด ขอ ฉัน ผม ดิฉัน เรา คุณ เขา เธอ มัน อะไร อย่างไร ยังไง ทำไม
+""".split())
+
+
+class ThaiTokenizer:
+    """ตัดคำภาษาไทยด้วยพจนานุกรม (trie + maximal matching) ไม่ต้องใช้เครือข่ายหรือ dependency เพิ่ม
+
+    - ข้อความส่วนที่ไม่ใช่ภาษาไทยแยกตาม \\w เหมือนเดิม
+    - ภาษาไทยเลือกการตัดที่มีอักษรนอกพจนานุกรมน้อยที่สุด แล้วจึงจำนวนคำน้อยที่สุด
+      ส่วนที่ไม่รู้จักตัดตามขอบเขตพยางค์ (ไม่แยกสระ/วรรณยุกต์ออกจากพยัญชนะ) และรวมเป็นคำเดียว
+    - ผลการตัดของแต่ละช่วงข้อความไทยถูกเก็บใน LRU cache (cache_size ช่วง)
+    """
+
+    def __init__(self,
+                 words: Iterable[str] = None,
+                 extra_words: Iterable[str] = None,
+                 cache_size: int = 65536):
+        self._trie: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self.word_count = 0
+        self.add_words(load_words() if words is None else words)
+        if extra_words:
+            self.add_words(extra_words)
+        self._segment_cached = lru_cache(maxsize=cache_size)(self._segment_run)
+
+    def add_words(self, words: Iterable[str]):
+        """เพิ่มคำในพจนานุกรม (ล้าง cache ผลการตัดคำเดิม)"""
+        with self._lock:
+            for word in words:
+                word = word.strip().lower()
+                if not word:
+                    continue
+                node = self._trie
+                for char in word:
+                    node = node.setdefault(char, {})
+                if '' not in node:
+                    node[''] = True
+                    self.word_count += 1
+        if hasattr(self, '_segment_cached'):
+            self._segment_cached.cache_clear()
+
+    def tokenize(self, text: str) -> List[str]:
+        """แยกข้อความเป็นรายการคำ (ตามลำดับในข้อความ)"""
+        if _THAI.search(text) is None:
+            return _TOKENS.findall(text)
+        tokens = []
+        for match in _TOKENS.finditer(text):
+            token = match.group()
+            if 'ก' <= token[0] <= '๏':
+                tokens.extend(self._segment_cached(token))
+            else:
+                tokens.append(token)
+        return tokens
+
+    def tokenize_many(self, texts: Iterable[str]) -> List[List[str]]:
+        """tokenize หลายข้อความ ช่วงข้อความไทยที่ซ้ำกันในชุดตัดคำครั้งเดียว (ใช้ตอนโหลด/สร้าง index ใหม่)"""
+        segmented: Dict[str, Tuple[str, ...]] = {}
+        results = []
+        for text in texts:
+            tokens = []
+            for match in _TOKENS.finditer(text):
+                token = match.group()
+                if 'ก' <= token[0] <= '๏':
+                    words = segmented.get(token)
+                    if words is None:
+                        words = segmented[token] = self._segment_run(token)
+                    tokens.extend(words)
+                else:
+                    tokens.append(token)
+            results.append(tokens)
+        return results
+
+    def cache_info(self):
+        return self._segment_cached.cache_info()
+
+    def _segment_run(self, run: str) -> Tuple[str, ...]:
+        """ตัดคำข้อความไทยที่ไม่มีช่องว่าง ด้วย dynamic programming บนตำแหน่งที่ตัดได้"""
+        n = len(run)
+        # best[i] = (จำนวนอักษรที่ไม่รู้จัก, จำนวนคำ) ที่ดีที่สุดสำหรับ run[:i]
+        best: List[Optional[Tuple[int, int]]] = [None] * (n + 1)
+        back: List[Tuple[int, bool]] = [(0, True)] * (n + 1)
+        best[0] = (0, 0)
+        for start in range(n):
+            if best[start] is None:
+                continue
+            unknown, count = best[start]
+
+            node = self._trie
+            for end in range(start, n):
+                node = node.get(run[end])
+                if node is None:
+                    break
+                if '' in node and _can_split(run, end + 1):
+                    _relax(best, back, end + 1, (unknown, count + 1), start, True)
+
+            # ไม่มีในพจนานุกรม: ข้ามไปหนึ่งพยางค์ (ถึงตำแหน่งถัดไปที่ตัดได้)
+            end = start + 1
+            while end < n and not _can_split(run, end):
+                end += 1
+            _relax(best, back, end, (unknown + end - start, count + 1), start, False)
+
+        pieces: List[Tuple[str, bool]] = []
+        end = n
+        while end > 0:
+            start, known = back[end]
+            pieces.append((run[start:end], known))
+            end = start
+        pieces.reverse()
+
+        # รวมส่วนที่ไม่รู้จักที่ติดกันเป็นคำเดียว (เช่น ชื่อเฉพาะ)
+        words: List[str] = []
+        previous_known = True
+        for piece, known in pieces:
+            if not known and not previous_known:
+                words[-1] += piece
+            else:
+                words.append(piece)
+            previous_known = known
+        return tuple(words)
+
+
+def _can_split(run: str, position: int) -> bool:
+    if position <= 0 or position >= len(run):
+        return True
+    return run[position] not in _FOLLOWING and run[position - 1] not in _LEADING
+
+
+def _relax(best: list, back: list, position: int, cost: Tuple[int, int], start: int, known: bool):
+    if best[position] is None or cost < best[position]:
+        best[position] = cost
+        back[position] = (start, known)
+
+
+def load_words(path: str = WORDS_FILE) -> List[str]:
+    """อ่านรายการคำ (หนึ่งคำต่อบรรทัด ข้ามบรรทัดว่างและบรรทัดที่ขึ้นต้นด้วย #)"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith('#')]
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def default_tokenizer() -> ThaiTokenizer:
+    """tokenizer ที่ใช้ร่วมกันทั้ง process (โหลดพจนานุกรมเมื่อใช้ครั้งแรก)"""
+    global _default
+    if _default is None:
+        with _default_lock:
+            if _default is None:
+                _default = ThaiTokenizer()
+    return _default
+
+
+def tokenize(text: str) -> List[str]:
+    return default_tokenizer().tokenize(text)
+
+
+def tokenize_many(texts: Iterable[str]) -> List[List[str]]:
+    return default_tokenizer().tokenize_many(texts)
@@ -0,0 +1,240 @@
+# agent/tool_executor.py
+from typing import Dict, Any, Callable
+import os
+import signal
+import threading
+import time
+
+try:
+    import resource
+except ImportError:
+    # ไม่มีบน Windows: ยังใช้ timeout ได้แต่ไม่จำกัด CPU/หน่วยความจำ
+    resource = None
+
+from .lazy import lazy_import
+from .tracing import Histogram, span
+
+# multiprocessing และ asyncio import เมื่อสร้าง pool หรือรอผลครั้งแรก
+asyncio = lazy_import("asyncio")
+futures = lazy_import("concurrent.futures")
+process_pool = lazy_import("concurrent.futures.process")
+
+
+class ToolExecutionError(Exception):
+    """เครื่องมือทำงานใน process pool ไม่สำเร็จ (worker ตาย หรือเกินขีดจำกัด)"""
+
+
+class ToolTimeoutError(ToolExecutionError):
+    """เกินเวลา (wall-clock) หรือ CPU time ที่กำหนด"""
+
+
+class _CPUTimeExceeded(Exception):
+    pass
+
+
+# ชนิดข้อมูลที่ส่งกลับจาก worker ได้ (ตรวจชนิดตรงตัว: subclass เช่น NavigableString ของ bs4 ไม่ผ่าน)
+_PLAIN_TYPES = frozenset((type(None), bool, int, float, str, bytes))
+
+
+def _check_plain(value: Any):
+    """ผลลัพธ์ต้องเป็นข้อมูลธรรมดา (ตัวเลข/str/list/tuple/dict) object อื่นอาจอ้างถึงโครงสร้างใหญ่
+    ที่ pickle ไม่ได้หรือช้ามาก (เช่น parse tree ทั้งต้น) จึงแจ้งเป็นข้อผิดพลาดของเครื่องมือแทน"""
+    pending = [value]
+    while pending:
+        value = pending.pop()
+        value_type = type(value)
+        if value_type in _PLAIN_TYPES:
+            continue
+        if value_type is list or value_type is tuple:
+            pending.extend(item for item in value if type(item) not in _PLAIN_TYPES)
+        elif value_type is dict:
+            pending.extend(value.keys())
+            pending.extend(item for item in value.values() if type(item) not in _PLAIN_TYPES)
+        else:
+            raise ToolExecutionError(f"ผลลัพธ์จาก worker ต้องเป็นข้อมูลธรรมดา ไม่ใช่ {value_type.__name__}")
+
+
+def _init_worker(memory_bytes: int):
+    """ตั้งค่า worker ครั้งเดียวตอนเริ่ม process"""
+    if resource is None:
+        return
+    if memory_bytes:
+        soft, hard = resource.getrlimit(resource.RLIMIT_AS)
+        limit = memory_bytes if hard == resource.RLIM_INFINITY else min(memory_bytes, hard)
+        resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+    # เมื่อเกิน soft limit ของ CPU จะได้ SIGXCPU: แปลงเป็น exception แทนการปิด process
+    signal.signal(signal.SIGXCPU, _raise_cpu_exceeded)
+
+
+def _raise_cpu_exceeded(signum, frame):
+    raise _CPUTimeExceeded()
+
+
+def _run_in_worker(function: Callable, args: tuple, kwargs: Dict[str, Any], submitted: float, cpu_seconds: float):
+    """ทำงานใน worker: จำกัด CPU time ของการเรียกนี้ คืนค่า (ผลลัพธ์, เวลารอคิว, เวลาทำงาน)"""
+    started = time.time()
+    previous = None
+    if resource is not None and cpu_seconds:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        previous = resource.getrlimit(resource.RLIMIT_CPU)
+        hard = previous[1]
+        limit = int(usage.ru_utime + usage.ru_stime + cpu_seconds) + 1
+        if hard != resource.RLIM_INFINITY:
+            limit = min(limit, hard)
+        resource.setrlimit(resource.RLIMIT_CPU, (limit, hard))
+    try:
+        result = function(*args, **kwargs)
+        _check_plain(result)
+    except _CPUTimeExceeded:
+        raise ToolTimeoutError(f"ใช้ CPU เกิน {cpu_seconds} วินาที") from None
+    except MemoryError:
+        raise ToolExecutionError("ใช้หน่วยความจำเกินขีดจำกัด") from None
+    finally:
+        if previous is not None:
+            resource.setrlimit(resource.RLIMIT_CPU, previous)
+    return result, started - submitted, time.time() - started
+
+
+class ToolExecutor:
+    """รันเครื่องมือที่ใช้ CPU มาก (calculator, แยก HTML ฯลฯ) ใน process pool ที่ถูกใช้ซ้ำ
+
+    - ทุกการเรียกถูกจำกัด CPU time (cpu_seconds) ผ่าน RLIMIT_CPU และเวลารวม (timeout)
+    - worker แต่ละตัวจำกัดหน่วยความจำ (memory_bytes) ผ่าน RLIMIT_AS
+    - เกิน timeout แล้ว worker จะถูกปิดและสร้าง pool ใหม่ (process ที่ค้างอยู่ใน C หยุดด้วยวิธีอื่นไม่ได้)
+    - function ต้อง pickle ได้ (ฟังก์ชันระดับ module) เพราะถูกส่งไปยัง process อื่น
+      และต้องคืนค่าเป็นข้อมูลธรรมดา (ตัวเลข/str/list/tuple/dict) ไม่เช่นนั้นจะได้ ToolExecutionError
+    - สถิติเวลารอคิวและเวลาทำงานแยกตามชื่อฟังก์ชัน ดูได้จาก get_metrics()
+    """
+
+    def __init__(self,
+                 max_workers: int = None,
+                 cpu_seconds: float = 5.0,
+                 memory_bytes: int = 1024 * 1024 * 1024,
+                 timeout: float = 10.0):
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+        self.cpu_seconds = cpu_seconds
+        self.memory_bytes = memory_bytes
+        self.timeout = timeout
+
+        self._pool = None
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, Histogram] = {}
+        self.metrics = {
+            "calls": 0,
+            "errors": 0,
+            "timeouts": 0,
+            "restarts": 0
+        }
+
+    def run(self, function: Callable, *args, timeout: float = None, **kwargs) -> Any:
+        """เรียก function(*args, **kwargs) ใน process pool และรอผลลัพธ์"""
+        timeout = self.timeout if timeout is None else timeout
+        self._count("calls")
+        with span("process_pool", function=function.__name__) as current:
+            pool = self._get_pool()
+            future = pool.submit(_run_in_worker, function, args, kwargs, time.time(), self.cpu_seconds)
+            try:
+                result, queued, elapsed = future.result(timeout=timeout)
+            except futures.TimeoutError:
+                self._timed_out(pool)
+                raise ToolTimeoutError(f"{function.__name__} ใช้เวลาเกิน {timeout} วินาที") from None
+            except process_pool.BrokenProcessPool:
+                self._broken(pool)
+                raise ToolExecutionError(f"worker ของ {function.__name__} หยุดทำงาน") from None
+            except ToolTimeoutError:
+                self._count("timeouts")
+                raise
+            except Exception:
+                self._count("errors")
+                raise
+            current.set(queue_ms=queued * 1000, exec_ms=elapsed * 1000)
+        self._record(function.__name__, queued, elapsed)
+        return result
+
+    async def arun(self, function: Callable, *args, timeout: float = None, **kwargs) -> Any:
+        """run แบบ async (ไม่บล็อก event loop ระหว่างรอ worker)"""
+        timeout = self.timeout if timeout is None else timeout
+        self._count("calls")
+        with span("process_pool", function=function.__name__) as current:
+            pool = self._get_pool()
+            future = pool.submit(_run_in_worker, function, args, kwargs, time.time(), self.cpu_seconds)
+            try:
+                result, queued, elapsed = await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+            except asyncio.TimeoutError:
+                self._timed_out(pool)
+                raise ToolTimeoutError(f"{function.__name__} ใช้เวลาเกิน {timeout} วินาที") from None
+            except process_pool.BrokenProcessPool:
+                self._broken(pool)
+                raise ToolExecutionError(f"worker ของ {function.__name__} หยุดทำงาน") from None
+            except ToolTimeoutError:
+                self._count("timeouts")
+                raise
+            except Exception:
+                self._count("errors")
+                raise
+            current.set(queue_ms=queued * 1000, exec_ms=elapsed * 1000)
+        self._record(function.__name__, queued, elapsed)
+        return result
+
+    def warm(self):
+        """เริ่ม worker ทุกตัวล่วงหน้า (การเรียกครั้งแรกจะไม่ต้องรอสร้าง process)"""
+        pool = self._get_pool()
+        pending = [pool.submit(time.sleep, 0.01) for _ in range(self.max_workers)]
+        for future in pending:
+            future.result()
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """จำนวนการเรียก/ข้อผิดพลาด และ p50/p95/p99 ของเวลารอคิวและเวลาทำงาน (มิลลิวินาที)"""
+        with self._lock:
+            metrics = dict(self.metrics)
+            metrics["latency_ms"] = {name: histogram.summary() for name, histogram in sorted(self._histograms.items())}
+        return metrics
+
+    def close(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def _get_pool(self) -> "process_pool.ProcessPoolExecutor":
+        with self._lock:
+            if self._pool is None:
+                self._pool = process_pool.ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    initializer=_init_worker,
+                    initargs=(self.memory_bytes,)
+                )
+            return self._pool
+
+    def _timed_out(self, pool: "process_pool.ProcessPoolExecutor"):
+        self._count("timeouts")
+        self._restart(pool)
+
+    def _broken(self, pool: "process_pool.ProcessPoolExecutor"):
+        self._count("errors")
+        self._restart(pool)
+
+    def _restart(self, pool: "process_pool.ProcessPoolExecutor"):
+        """ปิด worker ทั้งหมดของ pool ที่มีปัญหา (การเรียกครั้งถัดไปจะสร้าง pool ใหม่)"""
+        with self._lock:
+            if self._pool is not pool:
+                return
+            self._pool = None
+            self.metrics["restarts"] += 1
+        processes = list((getattr(pool, '_processes', None) or {}).values())
+        pool.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+    def _record(self, name: str, queued: float, elapsed: float):
+        with self._lock:
+            for kind, value in ((f"{name}.queue", queued), (f"{name}.exec", elapsed)):
+                histogram = self._histograms.get(kind)
+                if histogram is None:
+                    histogram = self._histograms[kind] = Histogram()
+                histogram.record(value * 1000)
+
+    def _count(self, name: str):
+        with self._lock:
+            self.metrics[name] += 1
@@ -1,20 +1,145 @@
 # agent/tools.py
-import requests
-from bs4 import BeautifulSoup
+import importlib
 import json
-from typing import Dict, Any, List
+import threading
+from collections.abc import Mapping
+from typing import Dict, Any, List, Callable, Iterator, Union
 from datetime import datetime
+from .http_client import HttpCache, HttpClient, AsyncHttpClient
+from .html_extract import extract_text_streaming, aextract_text_streaming, extract_text_soup
+from .calculator import evaluate, batch_evaluate
+from .data_tool import query_data, describe_data
+from .file_store import FileStore
+from .lazy import lazy_import
+from .tool_executor import ToolExecutor
+from .tracing import span, payload_bytes
+
+asyncio = lazy_import("asyncio")
+
+class ToolRegistry(Mapping):
+    """ชื่อเครื่องมือ -> ฟังก์ชัน ที่ resolve เมื่อเรียกใช้ครั้งแรก
+    
+    target เป็นได้ทั้ง callable, ชื่อเมธอดของ owner (เช่น "calculator") หรือ "โมดูล:ชื่อ"
+    (เช่น "mytools.weather:get_weather") ซึ่งโมดูลจะถูก import ตอนใช้เครื่องมือครั้งแรกเท่านั้น
+    การดูรายชื่อเครื่องมือ (keys, in) ไม่ import อะไรเพิ่ม
+    """
+    
+    def __init__(self, owner: Any = None, targets: Dict[str, Union[str, Callable]] = None):
+        self._owner = owner
+        self._targets: Dict[str, Union[str, Callable]] = dict(targets or {})
+        self._resolved: Dict[str, Callable] = {}
+        self._lock = threading.Lock()
+    
+    def register(self, name: str, target: Union[str, Callable]):
+        """เพิ่มหรือแทนที่เครื่องมือ"""
+        with self._lock:
+            self._targets[name] = target
+            self._resolved.pop(name, None)
+    
+    def unregister(self, name: str):
+        with self._lock:
+            self._targets.pop(name, None)
+            self._resolved.pop(name, None)
+    
+    def is_loaded(self, name: str) -> bool:
+        return name in self._resolved
+    
+    def __getitem__(self, name: str) -> Callable:
+        tool = self._resolved.get(name)
+        if tool is not None:
+            return tool
+        target = self._targets[name]
+        tool = target if callable(target) else self._resolve(target)
+        with self._lock:
+            if self._targets.get(name) is target:
+                self._resolved[name] = tool
+        return tool
+    
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._targets))
+    
+    def __len__(self) -> int:
+        return len(self._targets)
+    
+    def __contains__(self, name: object) -> bool:
+        return name in self._targets
+    
+    def _resolve(self, target: str) -> Callable:
+        if ":" in target:
+            module_name, attribute = target.split(":", 1)
+            module = importlib.import_module(module_name, __package__ if module_name.startswith(".") else None)
+            return getattr(module, attribute)
+        return getattr(self._owner, target)
 
 class ToolManager:
-    def __init__(self):
-        self.tools = {
-            "web_search": self.web_search,
-            "web_scrape": self.web_scrape,
-            "calculator": self.calculator,
-            "get_time": self.get_time,
-            "save_note": self.save_note,
-            "read_file": self.read_file
-        }
+    def __init__(self,
+                 http_client: HttpClient = None,
+                 async_http_client: AsyncHttpClient = None,
+                 executor: ToolExecutor = None,
+                 file_store: FileStore = None):
+        # HTTP client ที่ใช้ร่วมกัน (connection pool + cache) สำหรับเครื่องมือเว็บ
+        # สร้างเมื่อใช้เครื่องมือเว็บครั้งแรก (requests/aiohttp import นาน) โดยใช้ cache ร่วมกัน
+        self._http = http_client
+        self._ahttp = async_http_client
+        if http_client is not None:
+            self._http_cache = http_client.cache
+        elif async_http_client is not None:
+            self._http_cache = async_http_client.cache
+        else:
+            self._http_cache = HttpCache()
+        self._clients_lock = threading.Lock()
+        self.search_endpoint = "https://api.duckduckgo.com/"
+        # process pool สำหรับงานที่ใช้ CPU มาก (จำกัด CPU time, หน่วยความจำ และเวลา) สร้างเมื่อใช้ครั้งแรก
+        self.executor = executor or ToolExecutor()
+        # อ่าน/เขียนไฟล์ใน data/ (cache เนื้อหา, mmap สำหรับไฟล์ใหญ่, เขียนแบบ atomic)
+        self.files = file_store or FileStore()
+        
+        # ชื่อเครื่องมือ -> เมธอด (resolve เมื่อใช้ครั้งแรก เพิ่มเครื่องมือได้ด้วย register_tool)
+        self.tools = ToolRegistry(self, {
+            "web_search": "web_search",
+            "web_scrape": "web_scrape",
+            "calculator": "calculator",
+            "batch_calculator": "batch_calculator",
+            "data_query": "data_query",
+            "data_describe": "data_describe",
+            "get_time": "get_time",
+            "save_note": "save_note",
+            "read_file": "read_file"
+        })
+        
+        # เครื่องมือที่มีเวอร์ชัน async (ที่เหลือรันใน thread pool)
+        self.async_tools = ToolRegistry(self, {
+            "web_search": "aweb_search",
+            "web_scrape": "aweb_scrape",
+            "calculator": "acalculator",
+            "batch_calculator": "abatch_calculator",
+            "data_query": "adata_query",
+            "data_describe": "adata_describe"
+        })
+    
+    @property
+    def http(self) -> HttpClient:
+        if self._http is None:
+            with self._clients_lock:
+                if self._http is None:
+                    self._http = HttpClient(cache=self._http_cache)
+        return self._http
+    
+    @property
+    def ahttp(self) -> AsyncHttpClient:
+        if self._ahttp is None:
+            with self._clients_lock:
+                if self._ahttp is None:
+                    self._ahttp = AsyncHttpClient(cache=self._http_cache)
+        return self._ahttp
+    
+    def register_tool(self, name: str, target: Union[str, Callable], async_target: Union[str, Callable] = None):
+        """เพิ่มเครื่องมือ (target ดู ToolRegistry) async_target ไม่ระบุ = รัน target ใน thread pool"""
+        self.tools.register(name, target)
+        if async_target is not None:
+            self.async_tools.register(name, async_target)
+        else:
+            self.async_tools.unregister(name)
     
     def get_available_tools(self) -> List[str]:
         """ดูเครื่องมือที่มี"""
@@ -28,63 +153,123 @@ class ToolManager:
                 "error": f"เครื่องมือ {tool_name} ไม่มีอยู่"
             }
         
-        try:
-            result = self.tools[tool_name](**kwargs)
-            return {
-                "success": True,
-                "result": result
-            }
-        except Exception as e:
+        with span("tool", tool=tool_name) as current:
+            try:
+                result = self.tools[tool_name](**kwargs)
+                current.set(success=True, result_bytes=payload_bytes(result))
+                return {
+                    "success": True,
+                    "result": result
+                }
+            except Exception as e:
+                current.set(success=False)
+                return {
+                    "success": False,
+                    "error": str(e)
+                }
+    
+    async def ause_tool(self, tool_name: str, **kwargs) -> Dict[str, Any]:
+        """ใช้เครื่องมือแบบ async (ผลลัพธ์เหมือน use_tool)"""
+        if tool_name not in self.tools:
             return {
                 "success": False,
-                "error": str(e)
+                "error": f"เครื่องมือ {tool_name} ไม่มีอยู่"
             }
+        
+        with span("tool", tool=tool_name) as current:
+            try:
+                if tool_name in self.async_tools:
+                    result = await self.async_tools[tool_name](**kwargs)
+                else:
+                    result = await asyncio.to_thread(self.tools[tool_name], **kwargs)
+                current.set(success=True, result_bytes=payload_bytes(result))
+                return {
+                    "success": True,
+                    "result": result
+                }
+            except Exception as e:
+                current.set(success=False)
+                return {
+                    "success": False,
+                    "error": str(e)
+                }
     
     def web_search(self, query: str, num_results: int = 5) -> List[Dict[str, str]]:
         """ค้นหาข้อมูลจากเว็บ"""
         # ตัวอย่างการใช้ DuckDuckGo API (ฟรี)
-        url = f"https://api.duckduckgo.com/?q={query}&format=json&no_html=1&skip_disambig=1"
+        params = {"q": query, "format": "json", "no_html": 1, "skip_disambig": 1}
         
         try:
-            response = requests.get(url, timeout=10)
-            data = response.json()
-            
-            results = []
-            for topic in data.get('RelatedTopics', [])[:num_results]:
-                if 'Text' in topic:
-                    results.append({
-                        'title': topic.get('FirstURL', '').split('/')[-1],
-                        'snippet': topic['Text'],
-                        'url': topic.get('FirstURL', '')
-                    })
-            
-            return results
+            response = self.http.get(self.search_endpoint, params=params, timeout=10)
+            return self._search_results(response.json(), num_results)
         except Exception as e:
             return [{"error": f"การค้นหาล้มเหลว: {str(e)}"}]
     
-    def web_scrape(self, url: str) -> Dict[str, str]:
+    async def aweb_search(self, query: str, num_results: int = 5) -> List[Dict[str, str]]:
+        """ค้นหาข้อมูลจากเว็บแบบ async"""
+        params = {"q": query, "format": "json", "no_html": 1, "skip_disambig": 1}
+        
+        try:
+            response = await self.ahttp.get(self.search_endpoint, params=params, timeout=10)
+            return self._search_results(response.json(), num_results)
+        except Exception as e:
+            return [{"error": f"การค้นหาล้มเหลว: {str(e)}"}]
+    
+    def _search_results(self, data: Dict[str, Any], num_results: int) -> List[Dict[str, str]]:
+        results = []
+        for topic in data.get('RelatedTopics', [])[:num_results]:
+            if 'Text' in topic:
+                results.append({
+                    'title': topic.get('FirstURL', '').split('/')[-1],
+                    'snippet': topic['Text'],
+                    'url': topic.get('FirstURL', '')
+                })
+        
+        return results
+    
+    def web_scrape(self,
+                   url: str,
+                   streaming: bool = True,
+                   max_bytes: int = 2 * 1024 * 1024,
+                   max_chars: int = 5000) -> Dict[str, str]:
         """ดึงเนื้อหาจากเว็บไซต์"""
         try:
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-            }
-            response = requests.get(url, headers=headers, timeout=15)
-            soup = BeautifulSoup(response.content, 'html.parser')
+            if streaming:
+                # อ่านทีละชิ้นและหยุดทันทีเมื่อได้ title และข้อความครบ max_chars
+                with self.http.stream(url, max_bytes=max_bytes, timeout=15) as body:
+                    extracted = extract_text_streaming(body, encoding=body.encoding, max_chars=max_chars)
+            else:
+                response = self.http.get(url, timeout=15)
+                # การสร้าง tree ทั้งเอกสารใช้ CPU มาก จึงทำใน process pool
+                extracted = self.executor.run(extract_text_soup, response.content, max_chars, response.encoding)
             
-            # ลบ script และ style tags
-            for script in soup(["script", "style"]):
-                script.decompose()
-            
-            # ดึงข้อความ
-            text = soup.get_text()
-            # ทำความสะอาดข้อความ
-            lines = (line.strip() for line in text.splitlines())
-            chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-            text = ' '.join(chunk for chunk in chunks if chunk)
+            return {
+                'title': extracted['title'],
+                'content': extracted['content'],  # จำกัดความยาว
+                'url': url
+            }
+        except Exception as e:
+            return {'error': f"ไม่สามารถดึงข้อมูลได้: {str(e)}"}
+    
+    async def aweb_scrape(self,
+                          url: str,
+                          streaming: bool = True,
+                          max_bytes: int = 2 * 1024 * 1024,
+                          max_chars: int = 5000) -> Dict[str, str]:
+        """ดึงเนื้อหาจากเว็บไซต์แบบ async"""
+        try:
+            if streaming:
+                async with self.ahttp.stream(url, max_bytes=max_bytes, timeout=15) as body:
+                    extracted = await aextract_text_streaming(body, encoding=body.encoding, max_chars=max_chars)
+            else:
+                response = await self.ahttp.get(url, timeout=15)
+                # การสร้าง tree ทั้งเอกสารใช้ CPU มาก จึงทำใน process pool
+                extracted = await self.executor.arun(extract_text_soup, response.content, max_chars,
+                                                     response.encoding)
             
             return {
-                'title': soup.title.string if soup.title else 'ไม่มีชื่อ',
-                'content': text[:5000],  # จำกัดความยาว
+                'title': extracted['title'],
+                'content': extracted['content'],
                 'url': url
             }
         except Exception as e:
@@ -93,33 +278,100 @@ class ToolManager:
     def calculator(self, expression: str) -> float:
         """เครื่องคิดเลข"""
         try:
-            # ใช้ eval อย่างปลอดภัย (ในการใช้งานจริงควรใช้ ast.literal_eval)
-            allowed_chars = set('0123456789+-*/.() ')
-            if not all(c in allowed_chars for c in expression):
-                raise ValueError("มีตัวอักษรที่ไม่อนุญาต")
-            
-            result = eval(expression)
-            return float(result)
+            # คำนวณด้วย AST (ไม่ใช้ eval) ใน process pool ที่จำกัด CPU time
+            return self.executor.run(evaluate, expression)
+        except Exception as e:
+            raise Exception(f"ไม่สามารถคำนวณได้: {str(e)}")
+    
+    async def acalculator(self, expression: str) -> float:
+        """เครื่องคิดเลขแบบ async"""
+        try:
+            return await self.executor.arun(evaluate, expression)
+        except Exception as e:
+            raise Exception(f"ไม่สามารถคำนวณได้: {str(e)}")
+    
+    def batch_calculator(self, expressions: List[str], variables: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+        """คำนวณหลายนิพจน์ในครั้งเดียว (รองรับรายการตัวเลขและ ชื่อ = นิพจน์)"""
+        try:
+            return self.executor.run(batch_evaluate, list(expressions), variables)
         except Exception as e:
             raise Exception(f"ไม่สามารถคำนวณได้: {str(e)}")
     
+    async def abatch_calculator(self, expressions: List[str], variables: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+        """คำนวณหลายนิพจน์แบบ async"""
+        try:
+            return await self.executor.arun(batch_evaluate, list(expressions), variables)
+        except Exception as e:
+            raise Exception(f"ไม่สามารถคำนวณได้: {str(e)}")
+    
+    def data_query(self, filename: str, **query) -> Dict[str, Any]:
+        """กรอง คำนวณ และสรุปข้อมูลจากไฟล์ CSV/Parquet ใน data/ (ดู data_tool.query_data)"""
+        try:
+            return self.executor.run(query_data, filename, **query)
+        except Exception as e:
+            raise Exception(f"ไม่สามารถประมวลผลข้อมูลได้: {str(e)}")
+    
+    async def adata_query(self, filename: str, **query) -> Dict[str, Any]:
+        """data_query แบบ async"""
+        try:
+            return await self.executor.arun(query_data, filename, **query)
+        except Exception as e:
+            raise Exception(f"ไม่สามารถประมวลผลข้อมูลได้: {str(e)}")
+    
+    def data_describe(self, filename: str) -> Dict[str, Any]:
+        """ดูคอลัมน์ ชนิดข้อมูล และตัวอย่างแถวของไฟล์ข้อมูล"""
+        try:
+            return self.executor.run(describe_data, filename)
+        except Exception as e:
+            raise Exception(f"ไม่สามารถอ่านข้อมูลได้: {str(e)}")
+    
+    async def adata_describe(self, filename: str) -> Dict[str, Any]:
+        """data_describe แบบ async"""
+        try:
+            return await self.executor.arun(describe_data, filename)
+        except Exception as e:
+            raise Exception(f"ไม่สามารถอ่านข้อมูลได้: {str(e)}")
+    
     def get_time(self) -> str:
         """ดูเวลาปัจจุบัน"""
         return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     
-    def save_note(self, filename: str, content: str) -> str:
-        """บันทึกโน๊ต"""
+    def save_note(self, filename: str, content: str, append: bool = False) -> str:
+        """บันทึกโน๊ต (append=True ต่อท้ายไฟล์เดิม)"""
         try:
-            with open(f"data/{filename}", 'w', encoding='utf-8') as f:
-                f.write(content)
+            self.files.write(filename, content, append=append)
             return f"บันทึกไฟล์ {filename} เรียบร้อย"
         except Exception as e:
             raise Exception(f"ไม่สามารถบันทึกได้: {str(e)}")
     
-    def read_file(self, filename: str) -> str:
-        """อ่านไฟล์"""
+    def read_file(self,
+                  filename: str,
+                  offset: int = None,
+                  length: int = None,
+                  start_line: int = None,
+                  end_line: int = None,
+                  pattern: str = None,
+                  ignore_case: bool = False,
+                  max_matches: int = 100) -> str:
+        """อ่านไฟล์ทั้งหมด หรือเฉพาะส่วนที่ต้องการ
+        
+        - pattern: เฉพาะบรรทัดที่ตรงกับ pattern (regex) ในรูปแบบ "เลขบรรทัด: ข้อความ"
+        - start_line/end_line: ช่วงบรรทัด (นับจาก 1)
+        - offset/length: ช่วงไบต์
+        """
         try:
-            with open(f"data/{filename}", 'r', encoding='utf-8') as f:
-                return f.read()
+            if pattern:
+                found = self.files.grep(filename, pattern, ignore_case=ignore_case, max_matches=max_matches)
+                if not found["matches"]:
+                    return f"ไม่พบบรรทัดที่ตรงกับ {pattern}"
+                lines = [f"{match['line']}: {match['text']}" for match in found["matches"]]
+                if found["truncated"]:
+                    lines.append(f"... (แสดง {len(found['matches'])} บรรทัดแรก)")
+                return "\n".join(lines)
+            if start_line is not None or end_line is not None:
+                return self.files.read_lines(filename, start_line or 1, end_line)
+            if offset is not None or length is not None:
+                return self.files.read(filename, offset or 0, length)
+            return self.files.read(filename)
         except Exception as e:
             raise Exception(f"ไม่สามารถอ่านไฟล์ได้: {str(e)}")
\ No newline at end of file
@@ -0,0 +1,318 @@
+# agent/tracing.py
+from typing import List, Dict, Any, Callable, Iterator, Optional
+from collections import deque
+from contextlib import contextmanager
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+
+from .lazy import lazy_import
+
+# ใช้เฉพาะเมื่อเปิด profiling ของคำขอที่ช้า
+cProfile = lazy_import("cProfile")
+pstats = lazy_import("pstats")
+tracemalloc = lazy_import("tracemalloc")
+
+# trace และ span ปัจจุบันของคำขอที่กำลังทำงาน (ส่งต่อไปยัง asyncio task และ asyncio.to_thread อัตโนมัติ)
+_current_trace: contextvars.ContextVar = contextvars.ContextVar('agent_trace', default=None)
+_current_span: contextvars.ContextVar = contextvars.ContextVar('agent_span', default=None)
+
+
+class Span:
+    """ช่วงเวลาของขั้นตอนหนึ่งในคำขอ พร้อม attribute เช่น จำนวน token และขนาดข้อมูล"""
+    __slots__ = ('name', 'span_id', 'parent_id', 'start', 'duration_ms', 'attributes', 'error')
+
+    def __init__(self, name: str, parent_id: Optional[str] = None, **attributes):
+        self.name = name
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.start = time.time()
+        self.duration_ms = None
+        self.attributes = attributes
+        self.error = None
+
+    def set(self, **attributes):
+        """เพิ่ม attribute ระหว่างทำงาน"""
+        self.attributes.update(attributes)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'start': self.start,
+            'duration_ms': self.duration_ms,
+            'attributes': self.attributes,
+            'error': self.error
+        }
+
+
+class Trace:
+    """span ทั้งหมดของคำขอหนึ่งครั้ง"""
+
+    def __init__(self, name: str, **attributes):
+        self.trace_id = uuid.uuid4().hex
+        self.root = Span(name, **attributes)
+        self.spans: List[Span] = []
+        self.profile_paths: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def add(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+
+    @property
+    def duration_ms(self) -> Optional[float]:
+        return self.root.duration_ms
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            spans = [span.to_dict() for span in self.spans]
+        return {
+            'trace_id': self.trace_id,
+            'name': self.root.name,
+            'duration_ms': self.root.duration_ms,
+            'attributes': self.root.attributes,
+            'spans': spans,
+            'profile': dict(self.profile_paths)
+        }
+
+
+class Histogram:
+    """เก็บค่าล่าสุด max_samples ค่า และคำนวณ percentile เมื่อถูกเรียกดู"""
+
+    def __init__(self, max_samples: int = 2048):
+        self.samples = deque(maxlen=max_samples)
+        self.count = 0
+        self.total = 0.0
+
+    def record(self, value: float):
+        self.samples.append(value)
+        self.count += 1
+        self.total += value
+
+    def summary(self) -> Dict[str, float]:
+        ordered = sorted(self.samples)
+
+        def percentile(p: float) -> float:
+            if not ordered:
+                return 0.0
+            return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+        return {
+            'count': self.count,
+            'mean': self.total / self.count if self.count else 0.0,
+            'p50': percentile(0.50),
+            'p95': percentile(0.95),
+            'p99': percentile(0.99),
+            'max': ordered[-1] if ordered else 0.0
+        }
+
+
+class JsonlExporter:
+    """ส่งออก span เป็น JSON หนึ่งบรรทัดต่อ span (มี trace_id กำกับ)"""
+
+    def __init__(self, path: str = "data/traces.jsonl"):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def __call__(self, trace: Trace):
+        record = trace.to_dict()
+        lines = [json.dumps({'trace_id': trace.trace_id, **trace.root.to_dict()}, ensure_ascii=False, default=str)]
+        lines.extend(json.dumps({'trace_id': trace.trace_id, **span}, ensure_ascii=False, default=str)
+                     for span in record['spans'])
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write('\n'.join(lines) + '\n')
+
+
+class SlowRequestProfiler:
+    """เก็บ cProfile และ tracemalloc ของคำขอที่ช้ากว่า threshold_ms
+
+    profiler ทำงานกับทุกคำขอ (ตาม sample_rate) แต่บันทึกไฟล์เฉพาะคำขอที่ช้า
+    cProfile ทำงานได้ทีละตัวต่อ process คำขอที่ซ้อนกันจึงได้เฉพาะ tracemalloc
+    """
+
+    def __init__(self,
+                 threshold_ms: float = 2000.0,
+                 directory: str = "data/profiles",
+                 use_cprofile: bool = True,
+                 use_tracemalloc: bool = True,
+                 top_allocations: int = 25):
+        self.threshold_ms = threshold_ms
+        self.directory = directory
+        self.use_cprofile = use_cprofile
+        self.use_tracemalloc = use_tracemalloc
+        self.top_allocations = top_allocations
+        self._active = False
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def start(self) -> Optional["cProfile.Profile"]:
+        if self.use_tracemalloc and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        if not self.use_cprofile:
+            return None
+        with self._lock:
+            if self._active:
+                return None
+            self._active = True
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # มี profiler ตัวอื่นทำงานอยู่แล้ว
+            with self._lock:
+                self._active = False
+            return None
+        return profile
+
+    def finish(self, trace: Trace, profile: Optional["cProfile.Profile"]):
+        if profile is not None:
+            profile.disable()
+            with self._lock:
+                self._active = False
+
+        if trace.duration_ms is None or trace.duration_ms < self.threshold_ms:
+            return
+
+        base = os.path.join(self.directory, trace.trace_id)
+        if profile is not None:
+            profile.dump_stats(base + '.prof')
+            trace.profile_paths['cprofile'] = base + '.prof'
+            with open(base + '.txt', 'w', encoding='utf-8') as f:
+                pstats.Stats(profile, stream=f).sort_stats('cumulative').print_stats(40)
+            trace.profile_paths['cprofile_text'] = base + '.txt'
+        if self.use_tracemalloc and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            top = tracemalloc.take_snapshot().statistics('lineno')[:self.top_allocations]
+            with open(base + '.tracemalloc.txt', 'w', encoding='utf-8') as f:
+                f.write(f"current={current} peak={peak}\n")
+                for stat in top:
+                    f.write(f"{stat}\n")
+            trace.profile_paths['tracemalloc'] = base + '.tracemalloc.txt'
+
+
+class Tracer:
+    """สร้าง trace ต่อคำขอ รวม histogram ของแต่ละขั้นตอน/เครื่องมือ และส่งออกผ่าน exporters
+
+    exporters คือ callable ที่รับ Trace (เช่น JsonlExporter) ถูกเรียกเมื่อคำขอจบ
+    """
+
+    def __init__(self,
+                 exporters: List[Callable[[Trace], None]] = None,
+                 profiler: SlowRequestProfiler = None,
+                 histogram_size: int = 2048):
+        self.exporters = list(exporters or [])
+        self.profiler = profiler
+        self.histogram_size = histogram_size
+        self._histograms: Dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def trace(self, name: str, **attributes) -> Iterator[Trace]:
+        """เริ่ม trace ของคำขอ span ภายใน (ดู span()) จะถูกเก็บไว้ใน trace นี้"""
+        trace = Trace(name, **attributes)
+        trace_token = _current_trace.set(trace)
+        span_token = _current_span.set(trace.root)
+        profile = self.profiler.start() if self.profiler is not None else None
+        started = time.perf_counter()
+        try:
+            yield trace
+        except BaseException as e:
+            trace.root.error = repr(e)
+            raise
+        finally:
+            trace.root.duration_ms = (time.perf_counter() - started) * 1000
+            _reset(_current_span, span_token, None)
+            _reset(_current_trace, trace_token, None)
+            if self.profiler is not None:
+                self.profiler.finish(trace, profile)
+            self._record(trace)
+            for exporter in self.exporters:
+                try:
+                    exporter(trace)
+                except Exception as e:
+                    print(f"ส่งออก trace ไม่สำเร็จ: {e}")
+
+    def get_metrics(self) -> Dict[str, Dict[str, float]]:
+        """p50/p95/p99 (มิลลิวินาที) ของแต่ละขั้นตอนและเครื่องมือ"""
+        with self._lock:
+            return {name: histogram.summary() for name, histogram in sorted(self._histograms.items())}
+
+    def reset_metrics(self):
+        with self._lock:
+            self._histograms.clear()
+
+    def _record(self, trace: Trace):
+        with self._lock:
+            self._observe(trace.root.name, trace.root.duration_ms)
+            for span in trace.spans:
+                if span.duration_ms is None:
+                    continue
+                self._observe(span.name, span.duration_ms)
+                if 'tool' in span.attributes:
+                    self._observe(f"tool:{span.attributes['tool']}", span.duration_ms)
+
+    def _observe(self, name: str, value: float):
+        histogram = self._histograms.get(name)
+        if histogram is None:
+            histogram = self._histograms[name] = Histogram(self.histogram_size)
+        histogram.record(value)
+
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[Span]:
+    """วัดเวลาของขั้นตอนหนึ่งใน trace ปัจจุบัน (ถ้าไม่มี trace จะวัดแต่ไม่บันทึก)"""
+    trace = _current_trace.get()
+    parent = _current_span.get()
+    current = Span(name, parent.span_id if parent is not None else None, **attributes)
+    token = _current_span.set(current)
+    started = time.perf_counter()
+    try:
+        yield current
+    except BaseException as e:
+        current.error = repr(e)
+        raise
+    finally:
+        current.duration_ms = (time.perf_counter() - started) * 1000
+        _reset(_current_span, token, parent)
+        if trace is not None:
+            trace.add(current)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+def token_usage(response: Any) -> Dict[str, int]:
+    """จำนวน token จาก response ของ LLM (usage_metadata หรือ response_metadata ของ langchain)"""
+    usage = getattr(response, 'usage_metadata', None)
+    if usage:
+        return {'input_tokens': usage.get('input_tokens', 0), 'output_tokens': usage.get('output_tokens', 0)}
+    metadata = getattr(response, 'response_metadata', None) or {}
+    usage = metadata.get('token_usage') or {}
+    if usage:
+        return {'input_tokens': usage.get('prompt_tokens', 0), 'output_tokens': usage.get('completion_tokens', 0)}
+    return {}
+
+
+def payload_bytes(value: Any) -> int:
+    """ขนาดของข้อมูล (ไบต์ของข้อความ UTF-8)"""
+    if isinstance(value, (list, tuple)):
+        return sum(payload_bytes(getattr(item, 'content', item)) for item in value)
+    return len(str(value).encode('utf-8'))
+
+
+def _reset(variable: contextvars.ContextVar, token, previous):
+    try:
+        variable.reset(token)
+    except ValueError:
+        # generator ถูกปิดใน context อื่น
+        variable.set(previous)
@@ -0,0 +1,374 @@
+# agent/vector_memory.py
+from typing import List, Dict, Any, Optional
+from array import array
+from datetime import datetime
+import uuid
+import zlib
+
+import numpy as np
+
+from .memory_store import MemoryStore, MemoryRecord
+from .persistence import atomic_write, iter_json_array, json_array_chunks
+from .simple_memory import extract_keywords, extract_keywords_many
+from .retention import RetentionPolicy, ColdTier
+from .thai_tokenizer import tokenize
+
+
+class HashingEmbedder:
+    """embedding แบบ local และ deterministic จาก hashed n-gram features
+
+    ใช้คำ (unigram) และ character n-gram ของแต่ละคำ hash ด้วย crc32 ลงเวกเตอร์ขนาด dim
+    พร้อมเครื่องหมาย +/- เพื่อลดผลของ hash collision แล้ว normalize เป็นความยาว 1
+    """
+
+    def __init__(self, dim: int = 512, ngram_sizes: tuple = (3, 4)):
+        self.dim = dim
+        self.ngram_sizes = ngram_sizes
+
+    def _features(self, text: str) -> List[str]:
+        features = []
+        for word in tokenize(text.lower()):
+            features.append(word)
+            padded = f" {word} "
+            for n in self.ngram_sizes:
+                features.extend(padded[i:i + n] for i in range(len(padded) - n + 1))
+        return features
+
+    def embed(self, text: str) -> np.ndarray:
+        """แปลงข้อความเป็นเวกเตอร์ float32 (ความยาว 1 หรือเวกเตอร์ศูนย์)"""
+        return self.embed_many([text])[0]
+
+    def embed_many(self, texts: List[str]) -> np.ndarray:
+        """แปลงหลายข้อความพร้อมกันเป็นเมทริกซ์ (len(texts), dim)"""
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            hashes = np.fromiter(
+                (zlib.crc32(feature.encode('utf-8')) for feature in self._features(text)),
+                dtype=np.uint32
+            )
+            if not len(hashes):
+                continue
+            signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+            np.add.at(matrix[row], hashes % self.dim, signs)
+
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        np.divide(matrix, norms, out=matrix, where=norms > 0)
+        return matrix
+
+
+class IVFIndex:
+    """ดัชนีแบบ inverted file (แบ่งเวกเตอร์เป็นกลุ่มด้วย k-means) สำหรับค้นหาแบบ sub-linear
+
+    ตอนค้นหาจะเทียบเฉพาะเวกเตอร์ใน n_probe กลุ่มที่ centroid ใกล้ query ที่สุด
+    """
+
+    def __init__(self, n_lists: int = 256, n_probe: int = 8, iterations: int = 10, seed: int = 0):
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.iterations = iterations
+        self.seed = seed
+        self.centroids: Optional[np.ndarray] = None
+        self._lists: List[array] = []
+
+    @property
+    def trained(self) -> bool:
+        return self.centroids is not None
+
+    def train(self, vectors: np.ndarray, sample_size: int = 100000):
+        """สร้าง centroid ด้วย spherical k-means จากตัวอย่างของเวกเตอร์"""
+        rng = np.random.default_rng(self.seed)
+        if len(vectors) > sample_size:
+            sample = vectors[rng.choice(len(vectors), sample_size, replace=False)]
+        else:
+            sample = vectors
+        n_lists = min(self.n_lists, len(sample))
+
+        centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+        for _ in range(self.iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            for cluster in range(n_lists):
+                members = sample[assignment == cluster]
+                if len(members):
+                    centroids[cluster] = members.sum(axis=0)
+            norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+            np.divide(centroids, norms, out=centroids, where=norms > 0)
+
+        self.centroids = centroids
+        self._lists = [array('I') for _ in range(n_lists)]
+
+    def add(self, vectors: np.ndarray, first_row: int):
+        """จัดเวกเตอร์ใหม่เข้ากลุ่มที่ใกล้ที่สุด"""
+        assignment = np.argmax(vectors @ self.centroids.T, axis=1)
+        for offset, cluster in enumerate(assignment):
+            self._lists[cluster].append(first_row + offset)
+
+    def candidates(self, query: np.ndarray) -> np.ndarray:
+        """เลขแถวของเวกเตอร์ในกลุ่มที่ใกล้ query ที่สุด"""
+        n_probe = min(self.n_probe, len(self._lists))
+        similarities = self.centroids @ query
+        probes = np.argpartition(-similarities, n_probe - 1)[:n_probe]
+        rows = [np.frombuffer(self._lists[cluster], dtype=np.uint32)
+                for cluster in probes if len(self._lists[cluster])]
+        if not rows:
+            return np.empty(0, dtype=np.int64)
+        return np.sort(np.concatenate(rows)).astype(np.int64)
+
+
+class NumpyVectorMemory:
+    """หน่วยความจำแบบเวกเตอร์ในโปรเซส (API เดียวกับ SimpleVectorMemory)
+
+    เวกเตอร์ทั้งหมดอยู่ในเมทริกซ์ float32 ต่อเนื่อง ค้นหาด้วย cosine similarity
+    แบบ vectorized และเลือก top-k ด้วย argpartition หากเปิด use_ivf
+    จะสร้าง IVFIndex อัตโนมัติเมื่อจำนวนความจำถึง ivf_threshold
+    """
+
+    def __init__(self,
+                 dim: int = 512,
+                 use_ivf: bool = False,
+                 ivf_threshold: int = 50000,
+                 n_lists: int = 256,
+                 n_probe: int = 8,
+                 retention: RetentionPolicy = None,
+                 cold_tier: ColdTier = None,
+                 summarizer=None):
+        self.embedder = HashingEmbedder(dim=dim)
+        self.use_ivf = use_ivf
+        self.ivf_threshold = ivf_threshold
+        self._ivf_params = (n_lists, n_probe)
+
+        # นโยบายการเก็บและที่เก็บความจำที่ถูกคัดออก (ดู retention.py)
+        self.retention = retention
+        self.cold_tier = cold_tier
+        self.summarizer = summarizer
+        self._reset()
+
+    def add_memory(self,
+                   content: str,
+                   metadata: Dict[str, Any] = None) -> str:
+        """เพิ่มความจำใหม่"""
+        memory_id = str(uuid.uuid4())
+
+        self._append_memories([{
+            'id': memory_id,
+            'content': content,
+            'metadata': metadata or {},
+            'timestamp': datetime.now().isoformat(),
+            'keywords': extract_keywords(content)
+        }])
+
+        if self.retention is not None and self.retention.needs_eviction(
+                len(self.memories), self._content_bytes,
+                self.memories.timestamp_micros(0) if self.memories else None):
+            self.enforce_retention()
+        return memory_id
+
+    def search_memory(self,
+                      query: str,
+                      n_results: int = 5,
+                      namespace: str = None) -> List[Dict[str, Any]]:
+        """ค้นหาความจำที่เกี่ยวข้องด้วย cosine similarity เฉพาะ metadata["namespace"] ที่ระบุ (ถ้ามี)"""
+        if not query.strip():
+            return self.get_recent_memories(n_results, namespace)
+
+        if n_results <= 0:
+            return []
+        results = self._search_hot(query, n_results, namespace) if self.memories else []
+
+        # ค้นใน cold tier เฉพาะเมื่อ hot tier ได้ผลลัพธ์ไม่พอ (รวมถึงเมื่อทุกความจำถูกคัดออกแล้ว)
+        if self.cold_tier is not None and len(results) < n_results:
+            results.extend(self.cold_tier.search(extract_keywords(query.lower()), n_results - len(results), namespace))
+        return results
+
+    def _search_hot(self, query: str, n_results: int, namespace: str = None) -> List[Dict[str, Any]]:
+        """top-k ของความจำใน hot tier (self.memories ต้องไม่ว่าง)"""
+        count = len(self.memories)
+        query_vector = self.embedder.embed(query)
+        if self._ivf is not None:
+            rows = self._ivf.candidates(query_vector)
+        else:
+            rows = None
+        if namespace is not None:
+            # กรองแถวด้วย id ของ namespace แบบ vectorized ก่อนคำนวณ similarity
+            namespace_rows = self._namespace_rows(namespace)
+            rows = namespace_rows if rows is None else np.intersect1d(rows, namespace_rows)
+        scores = self._vectors[rows] @ query_vector if rows is not None else self._vectors[:count] @ query_vector
+
+        # เลือก top-k ด้วย argpartition แล้วเรียงเฉพาะ k รายการ
+        k = min(n_results, len(scores))
+        if not k:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+        top = top[np.lexsort((top, -scores[top]))]
+
+        results = []
+        for index in top:
+            score = float(scores[index])
+            if score <= 0:
+                break
+            row = int(rows[index]) if rows is not None else int(index)
+            self._hits[row] += 1
+            results.append(MemoryRecord(self.memories, row, 1 - score))
+        return results
+
+    def get_recent_memories(self, limit: int = 10, namespace: str = None) -> List[Dict[str, Any]]:
+        """ดึงความจำล่าสุด"""
+        if limit <= 0 or not self.memories:
+            return []
+        if namespace is None:
+            return self.memories[-limit:]
+        return [self.memories[int(row)] for row in self._namespace_rows(namespace)[-limit:]]
+
+    def _namespace_rows(self, namespace: str) -> np.ndarray:
+        """เลขแถวทั้งหมดของ namespace"""
+        namespace_id = self.memories.namespace_id(namespace)
+        if namespace_id is None:
+            return np.empty(0, dtype=np.int64)
+        namespace_ids = np.frombuffer(self.memories.namespace_ids(), dtype=np.uint32)
+        return np.flatnonzero(namespace_ids == namespace_id)
+
+    def clear_memory(self):
+        """ล้างความจำทั้งหมด"""
+        self._reset()
+        if self.cold_tier is not None:
+            self.cold_tier.clear()
+        print("ล้างความจำเรียบร้อยแล้ว")
+
+    def get_collection_info(self):
+        """ดูข้อมูลของ memory"""
+        return {
+            "name": "numpy_vector_memory",
+            "count": len(self.memories),
+            "dim": self.embedder.dim,
+            "ivf": self._ivf is not None
+        }
+
+    def enforce_retention(self) -> int:
+        """คัดความจำออกตาม retention policy คืนค่าจำนวนที่ถูกคัดออก"""
+        if self.retention is None or not self.memories:
+            return 0
+
+        entries = (
+            (row,
+             self.memories.timestamp_micros(row),
+             len(self.memories.get_field(row, 'content').encode('utf-8')),
+             self._hits[row])
+            for row in range(len(self.memories))
+        )
+        victims = set(self.retention.select(entries))
+        if not victims:
+            return 0
+
+        evicted = [dict(self.memories[row]) for row in sorted(victims)]
+        if self.cold_tier is not None:
+            self.cold_tier.append(evicted)
+
+        # สร้าง store ใหม่จากแถวที่เหลือ โดยใช้เวกเตอร์เดิม (ไม่ต้อง embed ใหม่)
+        kept = [row for row in range(len(self.memories)) if row not in victims]
+        old_store, old_hits, had_ivf = self.memories, self._hits, self._ivf is not None
+        vectors = self._vectors[kept].copy()
+        self._reset()
+        self._append_memories([dict(old_store[row]) for row in kept], vectors=vectors)
+        self._hits = array('I', (old_hits[row] for row in kept))
+        if had_ivf:
+            self.build_ivf_index()
+
+        # สรุปความจำที่ถูกคัดออกเป็นความจำใหม่หนึ่งรายการ (ถ้ามี summarizer)
+        if self.summarizer is not None:
+            content = self.summarizer(evicted)
+            self._append_memories([{
+                'id': str(uuid.uuid4()),
+                'content': content,
+                'metadata': {'type': 'summary', 'summarized_count': len(evicted)},
+                'timestamp': datetime.now().isoformat(),
+                'keywords': extract_keywords(content)
+            }])
+
+        return len(evicted)
+
+    def build_ivf_index(self):
+        """สร้าง (หรือสร้างใหม่) IVF index จากเวกเตอร์ทั้งหมด"""
+        count = len(self.memories)
+        if not count:
+            return
+        n_lists, n_probe = self._ivf_params
+        ivf = IVFIndex(n_lists=n_lists, n_probe=n_probe)
+        ivf.train(self._vectors[:count])
+        ivf.add(self._vectors[:count], 0)
+        self._ivf = ivf
+
+    def save_to_file(self, filename: str = "memory_backup.json"):
+        """บันทึกความจำลงไฟล์ (รูปแบบเดียวกับ SimpleVectorMemory)"""
+        try:
+            atomic_write(f"data/{filename}", json_array_chunks(self.memories))
+            print(f"บันทึกความจำลงไฟล์ {filename} แล้ว")
+        except Exception as e:
+            print(f"บันทึกไฟล์ไม่สำเร็จ: {e}")
+
+    def load_from_file(self, filename: str = "memory_backup.json", batch_size: int = 1024, reindex: bool = False):
+        """โหลดความจำจากไฟล์ (embedding คำนวณใหม่แบบ deterministic เป็นชุด)
+
+        reindex=True แยกคำสำคัญใหม่ทุกรายการ (เช่น ไฟล์ที่บันทึกก่อนมีการตัดคำภาษาไทย)
+        """
+        previous = (self.memories, self._vectors, self._ivf, self._hits, self._content_bytes)
+        try:
+            with open(f"data/{filename}", 'r', encoding='utf-8') as f:
+                self._reset()
+                batch = []
+                for memory in iter_json_array(f):
+                    batch.append(memory)
+                    if len(batch) >= batch_size:
+                        self._append_memories(batch, reindex=reindex)
+                        batch = []
+                self._append_memories(batch, reindex=reindex)
+        except Exception as e:
+            # ไฟล์ไม่มี/เสีย/ไม่ครบ: คงความจำเดิมไว้
+            self.memories, self._vectors, self._ivf, self._hits, self._content_bytes = previous
+            print(f"โหลดไฟล์ไม่สำเร็จ: {e}")
+            return
+        print(f"โหลดความจำจากไฟล์ {filename} แล้ว ({len(self.memories)} รายการ)")
+
+    def _reset(self):
+        """ล้าง store, เมทริกซ์เวกเตอร์ และ IVF index"""
+        self.memories = MemoryStore()
+        self._vectors = np.zeros((1024, self.embedder.dim), dtype=np.float32)
+        self._ivf = None
+        self._hits = array('I')
+        self._content_bytes = 0
+
+    def _append_memories(self, memories: List[Dict[str, Any]], vectors: np.ndarray = None, reindex: bool = False):
+        """เพิ่มความจำหลายรายการลง store และเมทริกซ์เวกเตอร์"""
+        if not memories:
+            return
+        first_row = len(self.memories)
+        if vectors is None:
+            vectors = self.embedder.embed_many([memory.get('content', '') for memory in memories])
+
+        # แยกคำสำคัญของรายการที่ยังไม่มี (หรือทั้งหมดเมื่อ reindex) ในครั้งเดียว
+        pending = [memory for memory in memories if reindex or memory.get('keywords') is None]
+        extracted = dict(zip(map(id, pending), extract_keywords_many([memory.get('content', '') for memory in pending])))
+
+        for memory in memories:
+            keywords = extracted.get(id(memory), memory.get('keywords'))
+            self.memories.append(
+                memory_id=memory['id'],
+                content=memory.get('content', ''),
+                metadata=memory.get('metadata') or {},
+                timestamp=memory.get('timestamp', ''),
+                keywords=dict.fromkeys(keywords)
+            )
+            self._hits.append(0)
+            self._content_bytes += len(memory.get('content', '').encode('utf-8'))
+
+        # ขยายเมทริกซ์แบบเท่าตัวเพื่อให้การเพิ่มมีต้นทุนเฉลี่ยคงที่
+        needed = first_row + len(vectors)
+        if needed > len(self._vectors):
+            capacity = max(needed, 2 * len(self._vectors))
+            grown = np.zeros((capacity, self.embedder.dim), dtype=np.float32)
+            grown[:first_row] = self._vectors[:first_row]
+            self._vectors = grown
+        self._vectors[first_row:needed] = vectors
+
+        if self._ivf is not None:
+            self._ivf.add(vectors, first_row)
+        elif self.use_ivf and needed >= self.ivf_threshold:
+            self.build_ivf_index()